@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Concurrent multi-account executor
+Runs per-account work (credentials, discovery, costs) on a bounded thread pool, isolates
+failures to the account that raised them, and returns results in the order accounts were given.
+"""
+
+import os
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Accounts processed at the same time
+ACCOUNT_PARALLELISM = int(os.environ.get('ACCOUNT_PARALLELISM', '8'))
+
+_in_account_worker = contextvars.ContextVar('in_account_worker', default=False)
+
+
+def live_progress_enabled() -> bool:
+    """Rich allows one live display at a time, so per-account spinners are off inside concurrent workers"""
+    return not _in_account_worker.get()
+
+
+def account_label(account: Any) -> str:
+    """Display name for an SSO account dict, (name, session) tuple or plain id"""
+    if isinstance(account, dict):
+        return account.get('accountName', account.get('accountId', '?'))
+    if isinstance(account, tuple):
+        return str(account[0])
+    return str(account)
+
+
+def run_for_accounts(accounts: Sequence, worker: Callable[[Any], Any], max_workers: int = None,
+                     description: str = 'Account processing',
+                     on_done: Callable[[Dict], None] = None) -> List[Dict]:
+    """Call worker(account) for every account, at most max_workers at a time
+    
+    Returns [{'account', 'result', 'error'}] in the order of accounts. An
+    exception in one account is logged and recorded in 'error' without
+    stopping the others. on_done is called from the calling thread as each
+    account finishes. Metering scopes and other context variables of the
+    caller are visible inside the workers.
+    """
+    accounts = list(accounts)
+    max_workers = max(1, min(max_workers or ACCOUNT_PARALLELISM, len(accounts) or 1))
+    
+    def run_one(account) -> Dict:
+        try:
+            outcome = {'account': account, 'result': worker(account), 'error': None}
+        except Exception as e:
+            logger.error(f"{description} failed for {account_label(account)}: {e}")
+            outcome = {'account': account, 'result': None, 'error': str(e)}
+        return outcome
+    
+    if max_workers == 1:
+        outcomes = []
+        for account in accounts:
+            outcomes.append(run_one(account))
+            if on_done:
+                on_done(outcomes[-1])
+        return outcomes
+    
+    def run_as_worker(account) -> Dict:
+        _in_account_worker.set(True)
+        return run_one(account)
+    
+    outcomes = [None] * len(accounts)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='account') as executor:
+        # Each task gets its own copy of the caller's context
+        futures = {
+            executor.submit(contextvars.copy_context().run, run_as_worker, account): index
+            for index, account in enumerate(accounts)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            outcomes[index] = future.result()
+            if on_done:
+                on_done(outcomes[index])
+    
+    return outcomes
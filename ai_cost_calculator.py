@@ -13,7 +13,13 @@ from datetime import datetime, timedelta
 from decimal import Decimal
 import time
 import os
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
+
+from cost_explorer_cache import CachedCostExplorerClient
+from cost_explorer_fetcher import sum_total_cost, sum_costs_by_group
+from rate_limiter import rate_limited_client, call_with_backoff
+from cost_ingestion import IncrementalCostIngestor, account_breakdown_request, project_breakdown_request, query_shape_key
+from cost_explorer_meter import metered_ce_client, metering_scope, get_meter
 
 # Configure logging
 logging.basicConfig(
@@ -23,7 +29,8 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class AIProjectCostCalculator:
-    def __init__(self, sandbox_account_id: str = None, nonprod_account_id: str = None):
+    def __init__(self, sandbox_account_id: str = None, nonprod_account_id: str = None,
+                 use_incremental_ingestion: bool = None):
         """Initialize the cost calculator with AWS account IDs"""
         self.sandbox_account_id = sandbox_account_id or os.environ.get('AWS_SANDBOX_ACCOUNT_ID')
         self.nonprod_account_id = nonprod_account_id or os.environ.get('AWS_NONPROD_ACCOUNT_ID')
@@ -37,8 +44,14 @@ class AIProjectCostCalculator:
         
         # Initialize boto3 clients with session token support
         self.session = self._create_boto3_session()
-        self.ce_client = self.session.client('ce')
-        self.lambda_client = self.session.client('lambda')
+        self.ce_client = CachedCostExplorerClient(metered_ce_client(self.session), session=self.session)
+        self.lambda_client = rate_limited_client(self.session, 'lambda')
+        
+        # Keep daily account breakdowns locally and only fetch days after the last settled one
+        if use_incremental_ingestion is None:
+            use_incremental_ingestion = os.environ.get('COST_INGESTION_MODE', '').lower() == 'incremental'
+        self.use_incremental_ingestion = use_incremental_ingestion
+        self._ingested_totals = {}
         
         # Load project configuration
         self.projects = self.load_project_config()
@@ -164,19 +177,50 @@ class AIProjectCostCalculator:
         end_date = (today + timedelta(days=1)).strftime('%Y-%m-%d')
         return start_date, end_date
     
-    def retry_api_call(self, func, max_retries: int = 3, **kwargs):
-        """Retry API calls with exponential backoff"""
-        for attempt in range(max_retries):
-            try:
-                return func(**kwargs)
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    logger.error(f"API call failed after {max_retries} attempts: {str(e)}")
-                    return None
-                wait_time = 2 ** attempt
-                logger.warning(f"API call failed, retrying in {wait_time} seconds... Error: {str(e)}")
-                time.sleep(wait_time)
-        return None
+    def retry_api_call(self, func, max_retries: int = 3, family: str = None, **kwargs):
+        """Retry throttled or transient API failures with jittered backoff"""
+        try:
+            return call_with_backoff(func, max_retries=max_retries, family=family, **kwargs)
+        except Exception as e:
+            logger.error(f"API call failed: {str(e)}")
+            return None
+    
+    def _get_cost_and_usage(self, **kwargs):
+        """Run one Cost Explorer get_cost_and_usage request
+        
+        The client already retries with botocore's standard mode and feeds
+        throttles to the 'ce' limiter, so no second retry layer runs here.
+        """
+        return self.retry_api_call(self.ce_client.get_cost_and_usage, max_retries=1, **kwargs)
+    
+    def _get_ingested_totals(self, request: Dict, start_date: str, end_date: str,
+                             account_id: str) -> Dict[Tuple[str, ...], Decimal]:
+        """Totals of a query shape from the warehouse, ingesting the unsettled days once per run"""
+        key = (account_id, query_shape_key(request), start_date, end_date)
+        if key not in self._ingested_totals:
+            ingestor = IncrementalCostIngestor(self.ce_client, account_id)
+            self._ingested_totals[key] = ingestor.get_totals(request, start_date, end_date)
+        return self._ingested_totals[key]
+    
+    def _get_account_service_cost(self, aws_service_name: str, start_date: str, end_date: str,
+                                  account_id: str) -> Decimal:
+        """Total cost of one AWS service in one account"""
+        if self.use_incremental_ingestion:
+            totals = self._get_ingested_totals(account_breakdown_request(account_id), start_date, end_date, account_id)
+            return sum((amount for (service, _), amount in totals.items() if service == aws_service_name), Decimal('0'))
+        
+        return sum_total_cost(
+            self._get_cost_and_usage,
+            TimePeriod={'Start': start_date, 'End': end_date},
+            Granularity='MONTHLY',
+            Metrics=['UnblendedCost'],
+            Filter={
+                'And': [
+                    {'Dimensions': {'Key': 'SERVICE', 'Values': [aws_service_name]}},
+                    {'Dimensions': {'Key': 'LINKED_ACCOUNT', 'Values': [account_id]}}
+                ]
+            }
+        )
     
     def get_ai_lambda_functions(self) -> Dict[str, List[str]]:
         """List all Lambda functions and categorize by AI project"""
@@ -225,41 +269,24 @@ class AIProjectCostCalculator:
         """Get Lambda costs using percentage-based allocation"""
         try:
             # Get total Lambda costs for the account
-            response = self.retry_api_call(
-                self.ce_client.get_cost_and_usage,
-                TimePeriod={'Start': start_date, 'End': end_date},
-                Granularity='MONTHLY',
-                Metrics=['UnblendedCost'],
-                Filter={
-                    'And': [
-                        {'Dimensions': {'Key': 'SERVICE', 'Values': ['AWS Lambda']}},
-                        {'Dimensions': {'Key': 'LINKED_ACCOUNT', 'Values': [account_id]}}
-                    ]
-                }
-            )
+            total_lambda_cost = self._get_account_service_cost('AWS Lambda', start_date, end_date, account_id)
             
-            if response and 'ResultsByTime' in response:
-                total_lambda_cost = Decimal('0')
-                for result in response['ResultsByTime']:
-                    amount = result['Total']['UnblendedCost']['Amount']
-                    total_lambda_cost += Decimal(amount)
+            # Calculate AI percentage if we have function counts
+            if hasattr(self, 'lambda_function_counts') and 'total' in self.lambda_function_counts:
+                total_functions = self.lambda_function_counts.get('total', 0)
+                project_functions = self.lambda_function_counts.get(project_id, 0)
                 
-                # Calculate AI percentage if we have function counts
-                if hasattr(self, 'lambda_function_counts') and 'total' in self.lambda_function_counts:
-                    total_functions = self.lambda_function_counts.get('total', 0)
-                    project_functions = self.lambda_function_counts.get(project_id, 0)
-                    
-                    if total_functions > 0 and project_functions > 0:
-                        ai_percentage = Decimal(project_functions) / Decimal(total_functions)
-                        ai_cost = total_lambda_cost * ai_percentage
-                        logger.info(f"Lambda cost for {project_id}: ${ai_cost:.2f} ({project_functions}/{total_functions} functions = {ai_percentage:.1%})")
-                        return ai_cost
-                
-                # Fallback: use configured percentage
-                default_percentage = Decimal('0.2')  # 20% default
-                ai_cost = total_lambda_cost * default_percentage
-                logger.info(f"Lambda cost for {project_id}: ${ai_cost:.2f} (estimated {default_percentage:.0%})")
-                return ai_cost
+                if total_functions > 0 and project_functions > 0:
+                    ai_percentage = Decimal(project_functions) / Decimal(total_functions)
+                    ai_cost = total_lambda_cost * ai_percentage
+                    logger.info(f"Lambda cost for {project_id}: ${ai_cost:.2f} ({project_functions}/{total_functions} functions = {ai_percentage:.1%})")
+                    return ai_cost
+            
+            # Fallback: use configured percentage
+            default_percentage = Decimal('0.2')  # 20% default
+            ai_cost = total_lambda_cost * default_percentage
+            logger.info(f"Lambda cost for {project_id}: ${ai_cost:.2f} (estimated {default_percentage:.0%})")
+            return ai_cost
                 
         except Exception as e:
             logger.error(f"Error getting Lambda costs: {str(e)}")
@@ -295,14 +322,6 @@ class AIProjectCostCalculator:
         aws_service_name = service_mapping.get(service, service)
         
         try:
-            # Build filter
-            filter_dict = {
-                'And': [
-                    {'Dimensions': {'Key': 'SERVICE', 'Values': [aws_service_name]}},
-                    {'Dimensions': {'Key': 'LINKED_ACCOUNT', 'Values': [account_id]}}
-                ]
-            }
-            
             # Add project-specific filters if available
             if service == 's3' and 's3_buckets' in project_config:
                 # For S3, we'll get all costs and filter later
@@ -311,34 +330,22 @@ class AIProjectCostCalculator:
                 # For DynamoDB, we'll get all costs and filter later
                 pass
                 
-            response = self.retry_api_call(
-                self.ce_client.get_cost_and_usage,
-                TimePeriod={'Start': start_date, 'End': end_date},
-                Granularity='MONTHLY',
-                Metrics=['UnblendedCost'],
-                Filter=filter_dict
-            )
+            total_cost = self._get_account_service_cost(aws_service_name, start_date, end_date, account_id)
             
-            if response and 'ResultsByTime' in response:
-                total_cost = Decimal('0')
-                for result in response['ResultsByTime']:
-                    amount = result.get('Total', {}).get('UnblendedCost', {}).get('Amount', '0')
-                    total_cost += Decimal(amount)
-                
-                # Handle different service types
-                if service in ai_only_services:
-                    # 100% of costs for AI-only services
-                    logger.info(f"{service.upper()} cost (100% AI): ${total_cost:.2f}")
-                    return total_cost
-                elif service in ['s3', 'dynamodb'] and total_cost > 0:
-                    # Estimate based on project allocation
-                    ai_percentage = Decimal('0.2')  # 20% default
-                    ai_cost = total_cost * ai_percentage
-                    logger.info(f"{service.upper()} cost (estimated {ai_percentage:.0%} AI): ${ai_cost:.2f}")
-                    return ai_cost
-                else:
-                    # Other services - return full cost for now
-                    return total_cost
+            # Handle different service types
+            if service in ai_only_services:
+                # 100% of costs for AI-only services
+                logger.info(f"{service.upper()} cost (100% AI): ${total_cost:.2f}")
+                return total_cost
+            elif service in ['s3', 'dynamodb'] and total_cost > 0:
+                # Estimate based on project allocation
+                ai_percentage = Decimal('0.2')  # 20% default
+                ai_cost = total_cost * ai_percentage
+                logger.info(f"{service.upper()} cost (estimated {ai_percentage:.0%} AI): ${ai_cost:.2f}")
+                return ai_cost
+            else:
+                # Other services - return full cost for now
+                return total_cost
             
         except Exception as e:
             logger.error(f"Error getting {service} costs: {str(e)}")
@@ -349,8 +356,19 @@ class AIProjectCostCalculator:
                         end_date: str, account_id: str) -> Dict[str, Decimal]:
         """Get costs filtered by specific tag"""
         try:
-            response = self.retry_api_call(
-                self.ce_client.get_cost_and_usage,
+            if self.use_incremental_ingestion:
+                # Cost Explorer tag group keys read 'TagKey$value'
+                totals = self._get_ingested_totals(
+                    project_breakdown_request(account_id, tag_key), start_date, end_date, account_id
+                )
+                tag_costs = {}
+                for (service_name, tag), amount in totals.items():
+                    if tag.split('$', 1)[-1] == tag_value:
+                        tag_costs[service_name] = tag_costs.get(service_name, Decimal('0')) + amount
+                return tag_costs
+            
+            grouped_costs = sum_costs_by_group(
+                self._get_cost_and_usage,
                 TimePeriod={'Start': start_date, 'End': end_date},
                 Granularity='MONTHLY',
                 Metrics=['UnblendedCost'],
@@ -365,17 +383,7 @@ class AIProjectCostCalculator:
                 ]
             )
             
-            service_costs = {}
-            if response and 'ResultsByTime' in response:
-                for result in response['ResultsByTime']:
-                    for group in result.get('Groups', []):
-                        service = group['Keys'][0]
-                        amount = group['Metrics']['UnblendedCost']['Amount']
-                        if service not in service_costs:
-                            service_costs[service] = Decimal('0')
-                        service_costs[service] += Decimal(amount)
-                        
-            return service_costs
+            return {keys[0]: amount for keys, amount in grouped_costs.items()}
             
         except Exception as e:
             logger.warning(f"Could not get costs by tag {tag_key}={tag_value}: {str(e)}")
@@ -384,6 +392,7 @@ class AIProjectCostCalculator:
     def calculate_all_costs(self):
         """Calculate costs for all AI projects"""
         start_date, end_date = self.get_date_range()
+        self._ingested_totals = {}
         logger.info(f"Calculating costs from {start_date} to {end_date}")
         
         # First, get Lambda function inventory
@@ -522,7 +531,12 @@ class AIProjectCostCalculator:
         logger.info(f"Session authenticated: {'Yes' if os.environ.get('AWS_SESSION_TOKEN') else 'No'}")
         
         # Calculate costs
-        self.calculate_all_costs()
+        with metering_scope(route='ai_cost_calculator') as scope:
+            self.calculate_all_costs()
+        
+        ce_usage = get_meter().get_stats(scope)['run']
+        logger.info(f"Cost Explorer requests this run: {ce_usage['requests']} "
+                    f"(~${ce_usage['estimated_cost']:.2f}, {ce_usage['served_stale']} served from stale cache)")
         
         # Export results
         if self.cost_data:
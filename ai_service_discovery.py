@@ -12,6 +12,15 @@ from rich.console import Console
 from rich.table import Table
 from rich.progress import Progress, SpinnerColumn, TextColumn
 
+from rate_limiter import rate_limited_client
+from pattern_matcher import get_matcher
+from tag_index import get_tag_index, tag_list_to_dict
+from account_executor import live_progress_enabled
+from pagination import iter_items, map_pipelined
+from inventory_snapshot import account_id_for
+from discovery_cache import config_hash, discovery_key, get_discovery_cache
+from attribution_cache import get_attribution_cache, rules_version
+
 console = Console()
 
 class AIServiceDiscovery:
@@ -74,9 +83,27 @@ class AIServiceDiscovery:
             'resume-scoring': 'Resume Scoring',
             'financial-aid': 'Financial Aid'
         }
+        self._rules_version = rules_version(self.projects)
+    
+    def discover_all_services(self, session: boto3.Session, account_name: str, additional_services: List[str] = None,
+                              use_cache: bool = True) -> Dict:
+        """Discover all AI-related services in an account, reusing a cached discovery when there is one"""
+        cache = get_discovery_cache()
+        account_id = account_id_for(session) if use_cache and cache.enabled else None
+        if account_id is None:
+            return self._discover_all_services(session, account_name, additional_services)
+        
+        key = discovery_key(
+            account_id, [session.region_name or 'us-east-1'], sorted(set(additional_services or [])),
+            config_hash({'patterns': self.ai_patterns, 'projects': self.projects}), discoverer='basic'
+        )
+        discoveries = cache.get_or_discover(
+            account_id, key, lambda: self._discover_all_services(session, account_name, additional_services)
+        )
+        discoveries['account'] = account_name
+        return discoveries
     
-    def discover_all_services(self, session: boto3.Session, account_name: str, additional_services: List[str] = None) -> Dict:
-        """Discover all AI-related services in an account"""
+    def _discover_all_services(self, session: boto3.Session, account_name: str, additional_services: List[str] = None) -> Dict:
         discoveries = {
             'account': account_name,
             'timestamp': datetime.now().isoformat(),
@@ -90,7 +117,8 @@ class AIServiceDiscovery:
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
-            console=console
+            console=console,
+            disable=not live_progress_enabled()
         ) as progress:
             
             # Lambda Functions
@@ -166,21 +194,24 @@ class AIServiceDiscovery:
     
     def _matches_patterns(self, name: str, patterns: List[str]) -> bool:
         """Check if name matches any AI patterns"""
-        name_lower = name.lower()
-        for pattern in patterns:
-            if re.match(pattern, name_lower):
-                return True
-        return False
+        return get_matcher(patterns).matches(name)
     
     def _identify_project(self, name: str, tags: Dict = None) -> str:
         """Identify which AI project a resource belongs to"""
+        project_tags = tuple(
+            (tag_key, tag_value) for tag_key, tag_value in tags.items() if tag_key in ['Project', 'project']
+        ) if tags else ()
+        return get_attribution_cache().get_or_compute(
+            ('service_discovery', self._rules_version, None, name, project_tags),
+            lambda: self._evaluate_project_rules(name, project_tags)
+        )
+    
+    def _evaluate_project_rules(self, name: str, project_tags: tuple) -> str:
         name_lower = name.lower()
         
         # Check tags first
-        if tags:
-            for tag_key, tag_value in tags.items():
-                if tag_key in ['Project', 'project']:
-                    return tag_value
+        if project_tags:
+            return project_tags[0][1]
         
         # Check name patterns
         for project_key, project_name in self.projects.items():
@@ -191,7 +222,8 @@ class AIServiceDiscovery:
     
     def discover_lambda_functions(self, session: boto3.Session) -> List[Dict]:
         """Discover AI-related Lambda functions"""
-        lambda_client = session.client('lambda')
+        lambda_client = rate_limited_client(session, 'lambda')
+        tag_index = get_tag_index(session)
         ai_functions = []
         
         try:
@@ -204,12 +236,10 @@ class AIServiceDiscovery:
                     # Check if it matches AI patterns
                     if self._matches_patterns(function_name, self.ai_patterns['lambda']):
                         # Get tags
-                        tags = {}
-                        try:
-                            tag_response = lambda_client.list_tags(Resource=function['FunctionArn'])
-                            tags = tag_response.get('Tags', {})
-                        except:
-                            pass
+                        tags = tag_index.lookup(
+                            function['FunctionArn'],
+                            lambda: lambda_client.list_tags(Resource=function['FunctionArn']).get('Tags', {})
+                        )
                         
                         ai_functions.append({
                             'name': function_name,
@@ -227,7 +257,8 @@ class AIServiceDiscovery:
     
     def discover_s3_buckets(self, session: boto3.Session) -> List[Dict]:
         """Discover AI-related S3 buckets"""
-        s3_client = session.client('s3')
+        s3_client = rate_limited_client(session, 's3')
+        tag_index = get_tag_index(session)
         ai_buckets = []
         
         try:
@@ -238,12 +269,11 @@ class AIServiceDiscovery:
                 
                 if self._matches_patterns(bucket_name, self.ai_patterns['s3']):
                     # Get bucket tags
-                    tags = {}
-                    try:
-                        tag_response = s3_client.get_bucket_tagging(Bucket=bucket_name)
-                        tags = {tag['Key']: tag['Value'] for tag in tag_response.get('TagSet', [])}
-                    except:
-                        pass
+                    tags = tag_index.lookup(
+                        f"arn:aws:s3:::{bucket_name}",
+                        lambda: tag_list_to_dict(s3_client.get_bucket_tagging(Bucket=bucket_name).get('TagSet', [])),
+                        region=bucket.get('BucketRegion')
+                    )
                     
                     # Get bucket size (approximate)
                     size_bytes = 0
@@ -269,45 +299,46 @@ class AIServiceDiscovery:
     
     def discover_dynamodb_tables(self, session: boto3.Session) -> List[Dict]:
         """Discover AI-related DynamoDB tables"""
-        dynamodb_client = session.client('dynamodb')
+        dynamodb_client = rate_limited_client(session, 'dynamodb')
+        tag_index = get_tag_index(session)
         ai_tables = []
         
-        try:
-            paginator = dynamodb_client.get_paginator('list_tables')
+        def matched_tables():
+            for table_name in iter_items(dynamodb_client, 'list_tables', 'TableNames'):
+                if self._matches_patterns(table_name, self.ai_patterns['dynamodb']):
+                    yield table_name
+        
+        def table_details(table_name: str) -> Dict:
+            description = dynamodb_client.describe_table(TableName=table_name)['Table']
             
-            for page in paginator.paginate():
-                for table_name in page.get('TableNames', []):
-                    if self._matches_patterns(table_name, self.ai_patterns['dynamodb']):
-                        # Get table details
-                        try:
-                            table_info = dynamodb_client.describe_table(TableName=table_name)
-                            table_details = table_info['Table']
-                            
-                            # Get tags
-                            tags = {}
-                            try:
-                                tag_response = dynamodb_client.list_tags_of_resource(
-                                    ResourceArn=table_details['TableArn']
-                                )
-                                tags = {tag['Key']: tag['Value'] for tag in tag_response.get('Tags', [])}
-                            except:
-                                pass
-                            
-                            ai_tables.append({
-                                'name': table_name,
-                                'arn': table_details['TableArn'],
-                                'status': table_details['TableStatus'],
-                                'item_count': table_details.get('ItemCount', 0),
-                                'size_bytes': table_details.get('TableSizeBytes', 0),
-                                'project': self._identify_project(table_name, tags),
-                                'tags': tags
-                            })
-                        except:
-                            ai_tables.append({
-                                'name': table_name,
-                                'project': self._identify_project(table_name),
-                                'error': 'Could not get table details'
-                            })
+            # Get tags
+            tags = tag_index.lookup(
+                description['TableArn'],
+                lambda: tag_list_to_dict(dynamodb_client.list_tags_of_resource(
+                    ResourceArn=description['TableArn']
+                ).get('Tags', []))
+            )
+            
+            return {
+                'name': table_name,
+                'arn': description['TableArn'],
+                'status': description['TableStatus'],
+                'item_count': description.get('ItemCount', 0),
+                'size_bytes': description.get('TableSizeBytes', 0),
+                'project': self._identify_project(table_name, tags),
+                'tags': tags
+            }
+        
+        try:
+            # Tables are described on a worker pool while list_tables keeps paging
+            for table_name, table, error in map_pipelined(table_details, matched_tables()):
+                if error:
+                    table = {
+                        'name': table_name,
+                        'project': self._identify_project(table_name),
+                        'error': 'Could not get table details'
+                    }
+                ai_tables.append(table)
         
         except Exception as e:
             console.print(f"[yellow]Warning: Could not list DynamoDB tables: {e}[/yellow]")
@@ -323,13 +354,12 @@ class AIServiceDiscovery:
         }
         
         try:
-            bedrock_client = session.client('bedrock', region_name='us-east-1')
-            bedrock_agent_client = session.client('bedrock-agent', region_name='us-east-1')
+            bedrock_client = rate_limited_client(session, 'bedrock', region_name='us-east-1')
+            bedrock_agent_client = rate_limited_client(session, 'bedrock-agent', region_name='us-east-1')
             
             # List custom models
             try:
-                response = bedrock_client.list_custom_models()
-                for model in response.get('modelSummaries', []):
+                for model in iter_items(bedrock_client, 'list_custom_models', 'modelSummaries'):
                     bedrock_resources['models'].append({
                         'name': model['modelName'],
                         'arn': model['modelArn'],
@@ -340,8 +370,7 @@ class AIServiceDiscovery:
             
             # List knowledge bases
             try:
-                response = bedrock_agent_client.list_knowledge_bases()
-                for kb in response.get('knowledgeBaseSummaries', []):
+                for kb in iter_items(bedrock_agent_client, 'list_knowledge_bases', 'knowledgeBaseSummaries'):
                     bedrock_resources['knowledge_bases'].append({
                         'name': kb['name'],
                         'id': kb['knowledgeBaseId'],
@@ -353,8 +382,7 @@ class AIServiceDiscovery:
             
             # List agents
             try:
-                response = bedrock_agent_client.list_agents()
-                for agent in response.get('agentSummaries', []):
+                for agent in iter_items(bedrock_agent_client, 'list_agents', 'agentSummaries'):
                     bedrock_resources['agents'].append({
                         'name': agent['agentName'],
                         'id': agent['agentId'],
@@ -371,7 +399,7 @@ class AIServiceDiscovery:
     
     def discover_api_gateway(self, session: boto3.Session) -> List[Dict]:
         """Discover AI-related API Gateway endpoints"""
-        api_client = session.client('apigateway')
+        api_client = rate_limited_client(session, 'apigateway')
         ai_apis = []
         
         try:
@@ -395,7 +423,8 @@ class AIServiceDiscovery:
     
     def discover_sns_topics(self, session: boto3.Session) -> List[Dict]:
         """Discover AI-related SNS topics"""
-        sns_client = session.client('sns')
+        sns_client = rate_limited_client(session, 'sns')
+        tag_index = get_tag_index(session)
         ai_topics = []
         
         try:
@@ -409,12 +438,10 @@ class AIServiceDiscovery:
                     
                     if self._matches_patterns(topic_name, self.ai_patterns['lambda']):  # Use same patterns
                         # Get topic attributes and tags
-                        tags = {}
-                        try:
-                            tag_response = sns_client.list_tags_for_resource(ResourceArn=topic_arn)
-                            tags = {tag['Key']: tag['Value'] for tag in tag_response.get('Tags', [])}
-                        except:
-                            pass
+                        tags = tag_index.lookup(
+                            topic_arn,
+                            lambda: tag_list_to_dict(sns_client.list_tags_for_resource(ResourceArn=topic_arn).get('Tags', []))
+                        )
                         
                         ai_topics.append({
                             'name': topic_name,
@@ -430,15 +457,16 @@ class AIServiceDiscovery:
     
     def discover_eventbridge_rules(self, session: boto3.Session) -> List[Dict]:
         """Discover AI-related EventBridge rules"""
-        events_client = session.client('events')
+        events_client = rate_limited_client(session, 'events')
+        tag_index = get_tag_index(session)
         ai_rules = []
         
         try:
             # List all event buses
             buses = ['default']  # Start with default bus
             try:
-                bus_response = events_client.list_event_buses()
-                buses.extend([bus['Name'] for bus in bus_response.get('EventBuses', []) if bus['Name'] != 'default'])
+                buses.extend([bus['Name'] for bus in iter_items(events_client, 'list_event_buses', 'EventBuses')
+                              if bus['Name'] != 'default'])
             except:
                 pass
             
@@ -451,12 +479,10 @@ class AIServiceDiscovery:
                             
                             if self._matches_patterns(rule_name, self.ai_patterns['lambda']):
                                 # Get rule details and tags
-                                tags = {}
-                                try:
-                                    tag_response = events_client.list_tags_for_resource(ResourceArn=rule['Arn'])
-                                    tags = {tag['Key']: tag['Value'] for tag in tag_response.get('Tags', [])}
-                                except:
-                                    pass
+                                tags = tag_index.lookup(
+                                    rule['Arn'],
+                                    lambda: tag_list_to_dict(events_client.list_tags_for_resource(ResourceArn=rule['Arn']).get('Tags', []))
+                                )
                                 
                                 ai_rules.append({
                                     'name': rule_name,
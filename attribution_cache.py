@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Process-wide project attribution cache
+Remembers which project a resource was attributed to, keyed by its type, name, the tags the
+rules look at and a digest of the rule set, so recalculations over a stable inventory skip
+rule evaluation. A changed config or pattern table yields a new digest and fresh entries.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable
+
+# Attributions kept before the least recently used one is dropped (0 = no caching)
+ATTRIBUTION_CACHE_SIZE = int(os.environ.get('ATTRIBUTION_CACHE_SIZE', '50000'))
+
+
+def rules_version(*tables) -> str:
+    """Stable digest of the rule tables an attribution depends on"""
+    return hashlib.sha256(json.dumps(tables, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class AttributionCache:
+    """Thread-safe LRU of attribution results with hit/miss counters"""
+    
+    def __init__(self, max_size: int = None):
+        self.max_size = ATTRIBUTION_CACHE_SIZE if max_size is None else max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+    
+    def get_or_compute(self, key: Hashable, compute: Callable[[], str]) -> str:
+        """Return the cached attribution for key, or compute and remember it"""
+        if self.max_size <= 0:
+            return compute()
+        
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return self._entries[key]
+            self.stats['misses'] += 1
+        
+        project = compute()
+        
+        with self._lock:
+            self._entries[key] = project
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+        return project
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self.stats, size=len(self._entries), max_size=self.max_size)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_attribution_cache() -> AttributionCache:
+    """Return the process-wide attribution cache"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = AttributionCache()
+        return _default_cache
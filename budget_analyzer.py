@@ -11,16 +11,15 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Any
 import logging
 
+from client_pool import pooled_client
+
 logger = logging.getLogger(__name__)
 
 class AIBudgetAnalyzer:
     def __init__(self, boto_session=None):
         """Initialize the AI Budget Analyzer with Bedrock client"""
         self.session = boto_session or boto3.Session()
-        self.bedrock_runtime = self.session.client(
-            service_name='bedrock-runtime',
-            region_name='us-east-1'
-        )
+        self.bedrock_runtime = pooled_client(self.session, 'bedrock-runtime', region_name='us-east-1')
         
         # Cost optimization knowledge base
         self.optimization_strategies = {
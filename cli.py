@@ -9,6 +9,7 @@ from rich.panel import Panel
 from rich.markdown import Markdown
 
 from sso_cost_calculator import SSOCostCalculator
+from discovery_cache import get_discovery_cache
 
 console = Console()
 
@@ -32,7 +33,8 @@ The tool will then automatically discover all AI services and calculate costs.
 @click.command()
 @click.option('--export', is_flag=True, help='Export results to CSV/JSON')
 @click.option('--all-accounts', is_flag=True, help='Automatically select all available accounts')
-def main(export, all_accounts):
+@click.option('--refresh-discovery', is_flag=True, help='Ignore cached discovery results and rescan every account')
+def main(export, all_accounts, refresh_discovery):
     """AWS AI Cost Calculator with SSO Authentication"""
     
     console.print(Panel.fit(
@@ -51,6 +53,9 @@ def main(export, all_accounts):
         console.print("[yellow]Cancelled by user[/yellow]")
         return
     
+    if refresh_discovery:
+        get_discovery_cache().invalidate()
+    
     # Run the calculator
     try:
         calculator = SSOCostCalculator()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Process-wide boto3 client pool
+Reuses clients across discovery workers, calculations and web requests, keyed by credentials,
+region and service. Clients are built from one shared session, so botocore service models are
+loaded once, and each client keeps its HTTP connection pool (and TLS connections) alive.
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import boto3
+import botocore.session
+from botocore.config import Config
+from botocore.credentials import RefreshableCredentials
+
+logger = logging.getLogger(__name__)
+
+# Clients kept before the least recently used one is dropped
+CLIENT_POOL_SIZE = int(os.environ.get('CLIENT_POOL_SIZE', '256'))
+
+# HTTP connections per client; one client is shared by every worker of a discovery
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '32'))
+
+POOL_CONFIG = Config(max_pool_connections=AWS_MAX_POOL_CONNECTIONS, tcp_keepalive=True)
+
+
+def _identity(credentials) -> Optional[Tuple[str, str]]:
+    """Access key plus a digest of the token, so re-issued role credentials get new clients"""
+    if credentials is None:
+        return None
+    frozen = credentials.get_frozen_credentials()
+    token_digest = hashlib.sha256(frozen.token.encode()).hexdigest()[:16] if frozen.token else ''
+    return frozen.access_key, token_digest
+
+
+class ClientPool:
+    """Thread-safe LRU of boto3 clients
+    
+    Static credentials (SSO role credentials, access keys) get clients from
+    one shared boto3 session. Refreshable credentials (profiles) are built
+    from the caller's session so they keep refreshing.
+    """
+    
+    def __init__(self, max_size: int = None):
+        self.max_size = CLIENT_POOL_SIZE if max_size is None else max_size
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        # boto3 sessions are not thread-safe, so clients are created one at a time
+        self._create_lock = threading.Lock()
+        self._shared_session = None
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+    
+    def _session(self) -> boto3.Session:
+        if self._shared_session is None:
+            self._shared_session = boto3.Session(botocore_session=botocore.session.get_session())
+        return self._shared_session
+    
+    def _create(self, session: boto3.Session, credentials, service_name: str, region_name: Optional[str],
+                endpoint_url: Optional[str], config: Config):
+        with self._create_lock:
+            if credentials is None or isinstance(credentials, RefreshableCredentials):
+                return session.client(service_name, region_name=region_name,
+                                      endpoint_url=endpoint_url, config=config)
+            frozen = credentials.get_frozen_credentials()
+            return self._session().client(
+                service_name,
+                region_name=region_name,
+                endpoint_url=endpoint_url,
+                config=config,
+                aws_access_key_id=frozen.access_key,
+                aws_secret_access_key=frozen.secret_key,
+                aws_session_token=frozen.token
+            )
+    
+    def get(self, session: boto3.Session, service_name: str, region_name: str = None,
+            endpoint_url: str = None, config: Config = None):
+        """Return the pooled client for the session's credentials, region and service
+        
+        Configs are told apart by identity, so pass a module-level Config
+        rather than building one per call.
+        """
+        region_name = region_name or session.region_name
+        credentials = session.get_credentials()
+        key = (_identity(credentials), region_name, service_name, endpoint_url, id(config))
+        config = POOL_CONFIG.merge(config) if config is not None else POOL_CONFIG
+        
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                self.stats['hits'] += 1
+                return client
+            self.stats['misses'] += 1
+        
+        client = self._create(session, credentials, service_name, region_name, endpoint_url, config)
+        
+        with self._lock:
+            # Another thread may have created the same client meanwhile; keep the first
+            client = self._clients.setdefault(key, client)
+            self._clients.move_to_end(key)
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+                self.stats['evictions'] += 1
+        return client
+    
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self.stats, size=len(self._clients))
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> ClientPool:
+    """Return the process-wide client pool"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ClientPool()
+        return _default_pool
+
+
+def pooled_client(session: boto3.Session, service_name: str, **kwargs):
+    """Shorthand for get_client_pool().get(session, service_name, ...)"""
+    return get_client_pool().get(session, service_name, **kwargs)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Fixed-point cost allocation
+Splits each service's cost over projects in proportion to their resource counts using integer
+micro-dollar arithmetic, so every service's shares add up exactly to its cost. The whole
+project x service matrix is allocated with NumPy array operations when NumPy is installed,
+and with the same integer arithmetic in plain Python otherwise.
+"""
+
+from decimal import Decimal, ROUND_HALF_EVEN
+from typing import List, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Fixed-point units per dollar (micro-dollars; Cost Explorer reports amounts to 1e-6 and finer)
+UNITS_PER_DOLLAR = 10 ** 6
+_UNIT = Decimal(1) / UNITS_PER_DOLLAR
+
+# Keep count x amount products inside int64
+_INT64_LIMIT = 2 ** 62
+
+
+def to_units(amount) -> int:
+    """Dollars (Decimal, float or str) as whole fixed-point units"""
+    if not isinstance(amount, Decimal):
+        amount = Decimal(str(amount))
+    return int((amount * UNITS_PER_DOLLAR).to_integral_value(rounding=ROUND_HALF_EVEN))
+
+
+def from_units(units: int) -> Decimal:
+    """Whole fixed-point units as dollars"""
+    return Decimal(units) * _UNIT
+
+
+def _allocate_python(counts: Sequence[Sequence[int]], amounts: Sequence[int]) -> List[List[int]]:
+    shares = [[0] * len(amounts) for _ in counts]
+    for column, amount in enumerate(amounts):
+        total = sum(row[column] for row in counts)
+        if total <= 0:
+            continue
+        remainders = []
+        allocated = 0
+        for index, row in enumerate(counts):
+            share, remainder = divmod(amount * row[column], total)
+            shares[index][column] = share
+            allocated += share
+            remainders.append((-remainder, index))
+        # Largest remainders get the units lost to rounding down, earlier rows first on ties
+        for _, index in sorted(remainders)[:amount - allocated]:
+            shares[index][column] += 1
+    return shares
+
+
+def _allocate_numpy(counts: Sequence[Sequence[int]], amounts: Sequence[int]) -> List[List[int]]:
+    counts = np.asarray(counts, dtype=np.int64).reshape(len(counts), len(amounts))
+    amounts = np.asarray(amounts, dtype=np.int64)
+    totals = counts.sum(axis=0)
+    divisors = np.where(totals > 0, totals, 1)
+    
+    weighted = counts * amounts
+    shares = weighted // divisors
+    remainders = weighted % divisors
+    leftover = np.where(totals > 0, amounts - shares.sum(axis=0), 0)
+    
+    # Rank rows by remainder within each column (stable, so earlier rows win ties)
+    order = np.argsort(-remainders, axis=0, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(counts.shape[0])[:, None], axis=0)
+    shares += ranks < leftover
+    return shares.tolist()
+
+
+def allocate(counts: Sequence[Sequence[int]], amounts: Sequence[int]) -> List[List[int]]:
+    """Split each column's amount over the rows in proportion to counts
+    
+    counts is a rows x columns matrix of non-negative integers and amounts
+    holds one whole number of units per column. Columns without counts are
+    left at zero. Shares are rounded down and the units left over go to the
+    largest remainders, so each allocated column sums exactly to its amount.
+    """
+    if not counts or not amounts:
+        return [[0] * len(amounts) for _ in counts]
+    if np is not None:
+        largest_count = max(max(row) for row in counts)
+        largest_amount = max(abs(amount) for amount in amounts)
+        if largest_count * largest_amount * len(counts) < _INT64_LIMIT:
+            return _allocate_numpy(counts, amounts)
+    return _allocate_python(counts, amounts)
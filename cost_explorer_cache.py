@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Persistent Cost Explorer response cache
+Stores get_cost_and_usage responses on disk, keyed by the normalized request.
+Closed billing periods never expire; the open month is re-fetched after a short TTL.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from client_pool import pooled_client
+from cost_explorer_meter import QueryBudgetExceeded, get_meter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'CE_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.ce-cache')
+)
+
+# Previous month's bill keeps settling for a few days after it ends
+MONTH_CLOSE_GRACE_DAYS = 3
+
+
+def _caching_enabled() -> bool:
+    """Check the ENABLE_CACHING environment flag (defaults to enabled)"""
+    return os.environ.get('ENABLE_CACHING', 'True').lower() not in ('false', '0', 'no')
+
+
+def normalize_request(value):
+    """Normalize a request fragment so equivalent requests produce the same key"""
+    if isinstance(value, dict):
+        normalized = {k: normalize_request(v) for k, v in value.items()}
+        # Filter value lists are unordered sets
+        if isinstance(normalized.get('Values'), list):
+            normalized['Values'] = sorted(normalized['Values'], key=str)
+        # And/Or operands are unordered too
+        for operator in ('And', 'Or'):
+            if isinstance(normalized.get(operator), list):
+                normalized[operator] = sorted(
+                    normalized[operator], key=lambda v: json.dumps(v, sort_keys=True)
+                )
+        return normalized
+    if isinstance(value, list):
+        return [normalize_request(v) for v in value]
+    return value
+
+
+def is_closed_period(time_period: Dict, today: Optional[datetime] = None) -> bool:
+    """Check whether a Cost Explorer TimePeriod lies entirely in a closed billing month"""
+    today = today or datetime.now()
+    try:
+        end = datetime.strptime(time_period['End'], '%Y-%m-%d')
+    except (KeyError, TypeError, ValueError):
+        return False
+    
+    month_start = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if end > month_start:
+        return False
+    
+    previous_month_start = (month_start - timedelta(days=1)).replace(day=1)
+    if end <= previous_month_start:
+        return True
+    
+    # Period ends inside last month, which is only final once its bill settles
+    return today.day > MONTH_CLOSE_GRACE_DAYS
+
+
+class CostExplorerCache:
+    """On-disk cache of Cost Explorer responses shared by all calculators"""
+    
+    def __init__(self, cache_dir: str = None, ttl_seconds: int = None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(
+            os.environ.get('CACHE_TTL_SECONDS', '300')
+        )
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0}
+    
+    def make_key(self, operation: str, request: Dict, account_id: Optional[str]) -> str:
+        """Build a stable cache key from the operation, normalized request and account"""
+        payload = {
+            'operation': operation,
+            'account': account_id,
+            'request': normalize_request(request)
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+    
+    def get(self, key: str, allow_stale: bool = False) -> Optional[Dict]:
+        """Return a cached response, or None if missing or expired (unless allow_stale)"""
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.stats['misses'] += 1
+            return None
+        
+        expired = not entry.get('closed') and time.time() - entry.get('stored_at', 0) > self.ttl_seconds
+        if expired and not allow_stale:
+            with self._lock:
+                self.stats['misses'] += 1
+            return None
+        
+        with self._lock:
+            self.stats['hits'] += 1
+        return entry['response']
+    
+    def put(self, key: str, response: Dict, time_period: Optional[Dict] = None):
+        """Store a response; closed periods are marked as never expiring"""
+        response = {k: v for k, v in response.items() if k != 'ResponseMetadata'}
+        entry = {
+            'stored_at': time.time(),
+            'closed': is_closed_period(time_period or {}),
+            'response': response
+        }
+        
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump(entry, f, default=str)
+            os.replace(tmp_path, path)
+            with self._lock:
+                self.stats['writes'] += 1
+        except OSError as e:
+            logger.warning(f"Could not write Cost Explorer cache entry: {e}")
+    
+    def clear(self):
+        """Remove every cached response"""
+        import shutil
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+class CachedCostExplorerClient:
+    """Cost Explorer client wrapper that serves get_cost_and_usage from the cache
+    
+    Every other attribute is passed through to the wrapped boto3 client.
+    Responses are keyed by the caller's account so payer and member
+    views never collide; the account is resolved with STS when not given.
+    Once the Cost Explorer query budget is spent, expired entries are
+    served instead of raising QueryBudgetExceeded.
+    """
+    
+    def __init__(self, client, cache: CostExplorerCache = None,
+                 account_id: str = None, session=None):
+        self._client = client
+        self._cache = cache or get_default_cache()
+        self._account_id = account_id
+        self._session = session
+    
+    def _resolve_account_id(self) -> Optional[str]:
+        if self._account_id is None and self._session is not None:
+            try:
+                self._account_id = pooled_client(self._session, 'sts').get_caller_identity()['Account']
+            except Exception as e:
+                logger.debug(f"Could not resolve account for Cost Explorer cache: {e}")
+            self._session = None
+        return self._account_id
+    
+    def get_cost_and_usage(self, **kwargs) -> Dict:
+        account_id = self._resolve_account_id()
+        if account_id is None or not _caching_enabled():
+            return self._client.get_cost_and_usage(**kwargs)
+        
+        key = self._cache.make_key('get_cost_and_usage', kwargs, account_id)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        
+        try:
+            response = self._client.get_cost_and_usage(**kwargs)
+        except QueryBudgetExceeded:
+            stale = self._cache.get(key, allow_stale=True)
+            if stale is None:
+                raise
+            get_meter().record_stale()
+            logger.info("Cost Explorer query budget spent, serving expired cache entry")
+            return stale
+        
+        self._cache.put(key, response, kwargs.get('TimePeriod'))
+        return response
+    
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> CostExplorerCache:
+    """Return the process-wide cache instance"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = CostExplorerCache()
+        return _default_cache
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Streaming Cost Explorer fetcher
+Follows NextPageToken across get_cost_and_usage pages and folds results as they arrive,
+so wide GroupBy queries are never truncated or held in memory all at once.
+"""
+
+from decimal import Decimal
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+
+class CostExplorerFetchError(Exception):
+    """Raised when a get_cost_and_usage page could not be retrieved"""
+    pass
+
+
+def _metric_name(request: Dict, metric: Optional[str]) -> str:
+    """Pick the metric to read, defaulting to the first requested one"""
+    if metric:
+        return metric
+    return request.get('Metrics', ['UnblendedCost'])[0]
+
+
+def iter_cost_pages(get_cost_and_usage: Callable, **request) -> Iterator[Dict]:
+    """Yield get_cost_and_usage responses one page at a time
+    
+    get_cost_and_usage is any callable taking the request keyword arguments,
+    e.g. ce_client.get_cost_and_usage or a retrying wrapper around it.
+    """
+    request = dict(request)
+    request.pop('NextPageToken', None)
+    
+    while True:
+        response = get_cost_and_usage(**request)
+        if response is None:
+            raise CostExplorerFetchError(
+                f"No response for Cost Explorer page (token: {request.get('NextPageToken')})"
+            )
+        
+        yield response
+        
+        next_token = response.get('NextPageToken')
+        if not next_token:
+            return
+        request['NextPageToken'] = next_token
+
+
+def iter_results_by_time(get_cost_and_usage: Callable, **request) -> Iterator[Dict]:
+    """Yield every ResultsByTime entry across all pages"""
+    for page in iter_cost_pages(get_cost_and_usage, **request):
+        for result in page.get('ResultsByTime', []):
+            yield result
+
+
+def iter_cost_groups(get_cost_and_usage: Callable, metric: str = None,
+                     **request) -> Iterator[Tuple[Dict, List[str], Decimal]]:
+    """Yield (time period, group keys, amount) for every group across all pages"""
+    metric = _metric_name(request, metric)
+    
+    for result in iter_results_by_time(get_cost_and_usage, **request):
+        time_period = result.get('TimePeriod', {})
+        for group in result.get('Groups', []):
+            amount = group.get('Metrics', {}).get(metric, {}).get('Amount', '0')
+            yield time_period, group['Keys'], Decimal(amount)
+
+
+def sum_total_cost(get_cost_and_usage: Callable, metric: str = None, **request) -> Decimal:
+    """Sum the ungrouped Total of a request across all periods and pages"""
+    metric = _metric_name(request, metric)
+    
+    total_cost = Decimal('0')
+    for result in iter_results_by_time(get_cost_and_usage, **request):
+        amount = result.get('Total', {}).get(metric, {}).get('Amount', '0')
+        total_cost += Decimal(amount)
+    
+    return total_cost
+
+
+def sum_costs_by_group(get_cost_and_usage: Callable, metric: str = None,
+                       **request) -> Dict[Tuple[str, ...], Decimal]:
+    """Fold a grouped request into {group keys: total amount} across all periods and pages"""
+    totals = {}
+    for _, keys, amount in iter_cost_groups(get_cost_and_usage, metric, **request):
+        key = tuple(keys)
+        totals[key] = totals.get(key, Decimal('0')) + amount
+    
+    return totals
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Cost Explorer API spend meter
+Counts every billed Cost Explorer request per run, route and session, estimates what the
+calculator itself costs, and enforces per-run and per-session query budgets.
+"""
+
+import os
+import uuid
+import logging
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Dict, Optional
+
+from rate_limiter import rate_limited_client
+
+logger = logging.getLogger(__name__)
+
+# Cost Explorer bills each API request
+PRICE_PER_REQUEST = Decimal(os.environ.get('CE_PRICE_PER_REQUEST', '0.01'))
+
+# Maximum billed requests per run / per web session (0 = unlimited)
+DEFAULT_RUN_BUDGET = int(os.environ.get('CE_QUERY_BUDGET_PER_RUN', '0'))
+DEFAULT_SESSION_BUDGET = int(os.environ.get('CE_QUERY_BUDGET_PER_SESSION', '0'))
+
+# Runs / web sessions kept before the least recently metered one is dropped
+MAX_RUNS = int(os.environ.get('CE_METER_MAX_RUNS', '1000'))
+MAX_SESSIONS = int(os.environ.get('CE_METER_MAX_SESSIONS', '1000'))
+
+# Most recent runs and sessions listed by get_stats()
+RECENT_RUNS = int(os.environ.get('CE_METER_RECENT_RUNS', '20'))
+
+# Operations Cost Explorer does not bill for
+FREE_OPERATIONS = {'ListCostAllocationTags', 'ListCostCategoryDefinitions'}
+
+_current_scope = contextvars.ContextVar('ce_meter_scope', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised instead of issuing a Cost Explorer request once a budget is spent"""
+    pass
+
+
+def _new_counter() -> Dict:
+    return {'requests': 0, 'served_stale': 0, 'denied': 0}
+
+
+class CostExplorerMeter:
+    """Process-wide Cost Explorer request counters and budgets
+    
+    Runs and sessions are kept in LRU tables bounded by max_runs and
+    max_sessions, so a long-lived web process does not grow with every
+    request. A dropped session starts its budget afresh if it returns.
+    """
+    
+    def __init__(self, run_budget: int = None, session_budget: int = None,
+                 max_runs: int = None, max_sessions: int = None):
+        self.run_budget = DEFAULT_RUN_BUDGET if run_budget is None else run_budget
+        self.session_budget = DEFAULT_SESSION_BUDGET if session_budget is None else session_budget
+        self.max_runs = MAX_RUNS if max_runs is None else max_runs
+        self.max_sessions = MAX_SESSIONS if max_sessions is None else max_sessions
+        self._lock = threading.Lock()
+        self.total = _new_counter()
+        self.runs = OrderedDict()
+        self.routes = {}
+        self.sessions = OrderedDict()
+        self.stats = {'runs_seen': 0, 'sessions_seen': 0, 'evictions': 0}
+    
+    def _lru_counter(self, table: OrderedDict, key: str, max_size: int, seen: str) -> Dict:
+        counter = table.get(key)
+        if counter is None:
+            counter = table[key] = _new_counter()
+            self.stats[seen] += 1
+            while len(table) > max(max_size, 1):
+                table.popitem(last=False)
+                self.stats['evictions'] += 1
+        else:
+            table.move_to_end(key)
+        return counter
+    
+    def _counters(self, scope: Optional[Dict]):
+        counters = [self.total]
+        if scope:
+            if scope.get('run'):
+                counters.append(self._lru_counter(self.runs, scope['run'], self.max_runs, 'runs_seen'))
+            if scope.get('route'):
+                counters.append(self.routes.setdefault(scope['route'], _new_counter()))
+            if scope.get('session'):
+                counters.append(self._lru_counter(self.sessions, scope['session'], self.max_sessions, 'sessions_seen'))
+        return counters
+    
+    def _budget_exceeded(self, scope: Optional[Dict]) -> Optional[str]:
+        if not scope:
+            return None
+        run_budget = scope.get('run_budget', self.run_budget)
+        if run_budget and scope.get('run') and self.runs.get(scope['run'], {}).get('requests', 0) >= run_budget:
+            return f"run budget of {run_budget} Cost Explorer requests"
+        if self.session_budget and scope.get('session') and \
+                self.sessions.get(scope['session'], {}).get('requests', 0) >= self.session_budget:
+            return f"session budget of {self.session_budget} Cost Explorer requests"
+        return None
+    
+    def reserve(self, operation: str = None):
+        """Count one billed request in the current scope, or raise if a budget is spent"""
+        if operation in FREE_OPERATIONS:
+            return
+        
+        scope = _current_scope.get()
+        with self._lock:
+            exceeded = self._budget_exceeded(scope)
+            counters = self._counters(scope)
+            if exceeded:
+                for counter in counters:
+                    counter['denied'] += 1
+            else:
+                for counter in counters:
+                    counter['requests'] += 1
+        
+        if exceeded:
+            raise QueryBudgetExceeded(f"Cost Explorer query denied: {exceeded} spent")
+    
+    def record_stale(self):
+        """Count a request answered from stale data because the budget was spent"""
+        with self._lock:
+            for counter in self._counters(_current_scope.get()):
+                counter['served_stale'] += 1
+    
+    def budget_remaining(self) -> Optional[int]:
+        """Requests left in the current run, or None when unlimited"""
+        scope = _current_scope.get()
+        if not scope or not scope.get('run'):
+            return None
+        run_budget = scope.get('run_budget', self.run_budget)
+        if not run_budget:
+            return None
+        with self._lock:
+            used = self.runs.get(scope['run'], {}).get('requests', 0)
+        return max(0, run_budget - used)
+    
+    def get_stats(self, scope: Dict = None, recent: int = None) -> Dict:
+        """Counters with estimated spend for one scope, or overall
+        
+        Without a scope this returns the totals, every route, and the most
+        recent runs and sessions (newest first, `recent` of each).
+        """
+        recent = RECENT_RUNS if recent is None else recent
+        def with_cost(counter: Dict) -> Dict:
+            result = dict(counter)
+            result['estimated_cost'] = float(PRICE_PER_REQUEST * counter['requests'])
+            return result
+        
+        with self._lock:
+            if scope:
+                return {
+                    key: with_cost(table.get(scope[key], _new_counter()))
+                    for key, table in (('run', self.runs), ('route', self.routes), ('session', self.sessions))
+                    if scope.get(key)
+                }
+            return {
+                'price_per_request': float(PRICE_PER_REQUEST),
+                'run_budget': self.run_budget,
+                'session_budget': self.session_budget,
+                'total': with_cost(self.total),
+                'routes': {k: with_cost(v) for k, v in self.routes.items()},
+                'tracked': dict(self.stats, runs=len(self.runs), sessions=len(self.sessions),
+                                max_runs=self.max_runs, max_sessions=self.max_sessions),
+                'sessions': {k: with_cost(self.sessions[k]) for k in list(reversed(self.sessions))[:recent]},
+                'runs': {k: with_cost(self.runs[k]) for k in list(reversed(self.runs))[:recent]}
+            }
+
+
+_default_meter = CostExplorerMeter()
+
+
+def get_meter() -> CostExplorerMeter:
+    """Return the process-wide meter"""
+    return _default_meter
+
+
+def current_scope() -> Optional[Dict]:
+    return _current_scope.get()
+
+
+@contextmanager
+def metering_scope(run: str = None, route: str = None, session: str = None, run_budget: int = None):
+    """Attribute Cost Explorer requests made inside the block to a run, route and session"""
+    scope = {'run': run or uuid.uuid4().hex[:12], 'route': route, 'session': session}
+    if run_budget is not None:
+        scope['run_budget'] = run_budget
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+
+def install_spend_meter(client, meter: CostExplorerMeter = None):
+    """Hook a boto3 Cost Explorer client into the meter
+    
+    The check runs before the request is signed, so a spent budget
+    raises QueryBudgetExceeded without reaching AWS.
+    """
+    if getattr(client, '_spend_meter_installed', False):
+        return client
+    
+    meter = meter or get_meter()
+    
+    def before_call(model=None, **kwargs):
+        meter.reserve(model.name if model is not None else None)
+    
+    client.meta.events.register('before-call', before_call)
+    client._spend_meter_installed = True
+    return client
+
+
+def metered_ce_client(session, **kwargs):
+    """Create a rate limited, metered Cost Explorer client
+    
+    CE_BACKEND=local returns the in-process stand-in from local_cost_explorer
+    (it meters itself); CE_ENDPOINT_URL points a real client at another endpoint.
+    """
+    from local_cost_explorer import get_local_client, is_local_backend
+    if is_local_backend():
+        return get_local_client()
+    
+    kwargs.setdefault('region_name', 'us-east-1')
+    if os.environ.get('CE_ENDPOINT_URL'):
+        kwargs.setdefault('endpoint_url', os.environ['CE_ENDPOINT_URL'])
+    return install_spend_meter(rate_limited_client(session, 'ce', **kwargs))
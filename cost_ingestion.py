@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Incremental daily Cost Explorer ingestion
+Keeps per-account, per-query-shape daily costs in the local cost warehouse with a
+watermark for the last settled day, so month-to-date refreshes only fetch the days after it.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Tuple
+
+from cost_explorer_cache import normalize_request
+from cost_explorer_fetcher import iter_results_by_time
+from cost_warehouse import get_default_warehouse, group_dimensions
+
+logger = logging.getLogger(__name__)
+
+# Days before today that are re-fetched on every run to pick up late adjustments
+RESETTLE_DAYS = int(os.environ.get('COST_RESETTLE_DAYS', '3'))
+
+# Group key used for ungrouped (Total only) query shapes
+TOTAL_KEY = ()
+
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def _parse_date(value: str) -> datetime:
+    return datetime.strptime(value, DATE_FORMAT)
+
+
+def _format_date(value: datetime) -> str:
+    return value.strftime(DATE_FORMAT)
+
+
+def query_shape_key(request: Dict) -> str:
+    """Identify a query by everything except its time period and granularity"""
+    shape = {
+        k: v for k, v in request.items()
+        if k not in ('TimePeriod', 'Granularity', 'NextPageToken')
+    }
+    encoded = json.dumps(normalize_request(shape), sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:32]
+
+
+def account_breakdown_request(account_id: str) -> Dict:
+    """Service x usage type query for one account, shared by every calculator"""
+    return {
+        'Metrics': ['UnblendedCost'],
+        'Filter': {'Dimensions': {'Key': 'LINKED_ACCOUNT', 'Values': [account_id]}},
+        'GroupBy': [
+            {'Type': 'DIMENSION', 'Key': 'SERVICE'},
+            {'Type': 'DIMENSION', 'Key': 'USAGE_TYPE'}
+        ]
+    }
+
+
+def project_breakdown_request(account_id: str, tag_key: str = 'Project') -> Dict:
+    """Service x project tag query for one account"""
+    return {
+        'Metrics': ['UnblendedCost'],
+        'Filter': {'Dimensions': {'Key': 'LINKED_ACCOUNT', 'Values': [account_id]}},
+        'GroupBy': [
+            {'Type': 'DIMENSION', 'Key': 'SERVICE'},
+            {'Type': 'TAG', 'Key': tag_key}
+        ]
+    }
+
+
+class IncrementalCostIngestor:
+    """Fetches only the unsettled or missing days of a query and serves totals locally"""
+    
+    def __init__(self, ce_client, account_id: str, store=None, resettle_days: int = None):
+        self.ce_client = ce_client
+        self.account_id = account_id
+        self.store = store or get_default_warehouse()
+        self.resettle_days = RESETTLE_DAYS if resettle_days is None else resettle_days
+        self.queries_made = 0
+    
+    def _fetch_days(self, request: Dict, start_date: str,
+                    end_date: str) -> Dict[str, Dict[Tuple[str, ...], Decimal]]:
+        """Fetch [start_date, end_date) at DAILY granularity"""
+        request = dict(request)
+        request['TimePeriod'] = {'Start': start_date, 'End': end_date}
+        request['Granularity'] = 'DAILY'
+        metric = request.get('Metrics', ['UnblendedCost'])[0]
+        grouped = bool(request.get('GroupBy'))
+        
+        days = {}
+        for result in iter_results_by_time(self._counting_get_cost_and_usage, **request):
+            day = result['TimePeriod']['Start']
+            groups = days.setdefault(day, {})
+            if grouped:
+                for group in result.get('Groups', []):
+                    keys = tuple(group['Keys'])
+                    amount = Decimal(group.get('Metrics', {}).get(metric, {}).get('Amount', '0'))
+                    groups[keys] = groups.get(keys, Decimal('0')) + amount
+            else:
+                amount = result.get('Total', {}).get(metric, {}).get('Amount', '0')
+                groups[TOTAL_KEY] = Decimal(amount)
+        
+        return days
+    
+    def _counting_get_cost_and_usage(self, **kwargs):
+        self.queries_made += 1
+        return self.ce_client.get_cost_and_usage(**kwargs)
+    
+    def ingest(self, request: Dict, start_date: str, end_date: str, today: datetime = None) -> int:
+        """Bring stored data for [start_date, end_date) up to date; returns days fetched"""
+        today = (today or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+        shape_key = query_shape_key(request)
+        state = self.store.get_state(self.account_id, shape_key)
+        
+        # Cost Explorer has no data past today
+        fetch_end = min(end_date, _format_date(today + timedelta(days=1)))
+        settled_through = _format_date(today - timedelta(days=self.resettle_days))
+        
+        windows = []
+        first_day, watermark = state['first_day'], state['watermark']
+        if first_day is None or watermark is None:
+            windows.append((start_date, fetch_end))
+        else:
+            # Backfill anything requested before the stored range
+            if start_date < first_day:
+                windows.append((start_date, first_day))
+            # Everything after the last settled day, including the re-settlement window
+            resume_from = _format_date(_parse_date(watermark) + timedelta(days=1))
+            windows.append((resume_from, fetch_end))
+        
+        fetched = 0
+        for window_start, window_end in windows:
+            if window_start >= window_end:
+                continue
+            days = self._fetch_days(request, window_start, window_end)
+            last_settled = min(settled_through, _format_date(_parse_date(window_end) - timedelta(days=1)))
+            # A backfill that stops at first_day must not move the watermark backwards
+            self.store.merge_days(
+                self.account_id, shape_key, window_start, window_end, days,
+                last_settled if window_end == fetch_end else None,
+                dimensions=group_dimensions(request),
+                metric=request.get('Metrics', ['UnblendedCost'])[0]
+            )
+            fetched += len(days)
+        
+        return fetched
+    
+    def get_totals(self, request: Dict, start_date: str, end_date: str,
+                   today: datetime = None) -> Dict[Tuple[str, ...], Decimal]:
+        """Ingest what is missing, then fold the stored days into {group keys: amount}"""
+        self.ingest(request, start_date, end_date, today)
+        return self.store.sum_range(self.account_id, query_shape_key(request), start_date, end_date)
+
+
+def ingest_account_costs(ce_client, account_id: str, start_date: str, end_date: str,
+                         project_tag_key: str = 'Project', store=None) -> int:
+    """Bring the standard warehouse facts for an account up to date; returns days fetched
+    
+    Every tag grouping covers the account's full spend, so only one project
+    tag key is ingested to keep project reports from double counting.
+    """
+    ingestor = IncrementalCostIngestor(ce_client, account_id, store)
+    fetched = ingestor.ingest(account_breakdown_request(account_id), start_date, end_date)
+    if project_tag_key:
+        fetched += ingestor.ingest(project_breakdown_request(account_id, project_tag_key), start_date, end_date)
+    return fetched
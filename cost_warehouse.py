@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Local SQLite cost warehouse
+Daily cost facts (account, service, usage type, project tag, metric, amount) ingested
+from Cost Explorer, so historical and cross-period reports run without touching AWS.
+Amounts are stored as integer micro-dollars, so sums are exact.
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from decimal import Decimal
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from cost_allocation import UNITS_PER_DOLLAR, from_units, to_units
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WAREHOUSE_PATH = os.environ.get(
+    'COST_WAREHOUSE_PATH',
+    os.path.join(
+        os.environ.get('COST_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cost-data')),
+        'warehouse.db'
+    )
+)
+
+# Cost Explorer GroupBy dimensions that map onto fact columns
+DIMENSION_COLUMNS = {
+    'SERVICE': 'service',
+    'USAGE_TYPE': 'usage_type',
+    'LINKED_ACCOUNT': 'account_id'
+}
+# Any TAG GroupBy is stored in the project column
+TAG_COLUMN = 'project'
+
+REPORT_COLUMNS = ('usage_date', 'account_id', 'service', 'usage_type', 'project', 'metric')
+
+# Fact sets reports are answered from; other query shapes are stored but not reported
+USAGE_TYPE_DIMENSIONS = 'service,usage_type'
+PROJECT_DIMENSIONS = 'service,project'
+
+FACTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cost_facts (
+    usage_date TEXT NOT NULL,
+    account_id TEXT NOT NULL,
+    service TEXT NOT NULL DEFAULT '',
+    usage_type TEXT NOT NULL DEFAULT '',
+    project TEXT NOT NULL DEFAULT '',
+    metric TEXT NOT NULL,
+    amount_units INTEGER NOT NULL,
+    group_key TEXT NOT NULL,
+    source_account_id TEXT NOT NULL,
+    shape_key TEXT NOT NULL,
+    dimensions TEXT NOT NULL
+)"""
+
+SCHEMA = FACTS_SCHEMA + """;
+CREATE INDEX IF NOT EXISTS idx_cost_facts_date ON cost_facts (usage_date);
+CREATE INDEX IF NOT EXISTS idx_cost_facts_account_date ON cost_facts (account_id, usage_date);
+CREATE INDEX IF NOT EXISTS idx_cost_facts_shape ON cost_facts (source_account_id, shape_key, usage_date);
+
+CREATE TABLE IF NOT EXISTS ingestion_state (
+    account_id TEXT NOT NULL,
+    shape_key TEXT NOT NULL,
+    dimensions TEXT NOT NULL,
+    first_day TEXT,
+    watermark TEXT,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (account_id, shape_key)
+);
+"""
+
+
+def group_dimensions(request: Dict) -> Tuple[str, ...]:
+    """Column names for a request's GroupBy keys, in order"""
+    dimensions = []
+    for group in request.get('GroupBy', []):
+        if group.get('Type') == 'TAG':
+            dimensions.append(TAG_COLUMN)
+        else:
+            key = group.get('Key', '')
+            dimensions.append(DIMENSION_COLUMNS.get(key, key.lower()))
+    return tuple(dimensions)
+
+
+def _tag_value(value: str) -> str:
+    """Strip the 'TagKey$' prefix Cost Explorer puts on tag group keys"""
+    return value.split('$', 1)[1] if '$' in value else value
+
+
+class CostWarehouse:
+    """Embedded SQLite store of daily cost facts"""
+    
+    def __init__(self, path: str = None):
+        self.path = path or DEFAULT_WAREHOUSE_PATH
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._migrate_float_amounts()
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+    
+    def _migrate_float_amounts(self):
+        """Convert warehouses written with REAL amounts to integer micro-dollars"""
+        columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(cost_facts)')}
+        if 'amount' not in columns:
+            return
+        logger.info(f"Converting cost warehouse {self.path} to integer micro-dollar amounts")
+        with self._conn:
+            self._conn.execute('ALTER TABLE cost_facts RENAME TO cost_facts_real')
+            self._conn.execute(FACTS_SCHEMA)
+            self._conn.execute(
+                'INSERT INTO cost_facts (usage_date, account_id, service, usage_type, project, metric, '
+                'amount_units, group_key, source_account_id, shape_key, dimensions) '
+                'SELECT usage_date, account_id, service, usage_type, project, metric, '
+                f'CAST(ROUND(amount * {UNITS_PER_DOLLAR}) AS INTEGER), group_key, source_account_id, '
+                'shape_key, dimensions FROM cost_facts_real'
+            )
+            # Dropping the old table also drops its indexes; SCHEMA recreates them
+            self._conn.execute('DROP TABLE cost_facts_real')
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+    
+    # Ingestion store interface (see cost_ingestion.IncrementalCostIngestor)
+    
+    def get_state(self, account_id: str, shape_key: str) -> Dict:
+        """Return {'first_day', 'watermark'} for a query shape"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT first_day, watermark FROM ingestion_state WHERE account_id = ? AND shape_key = ?',
+                (account_id, shape_key)
+            ).fetchone()
+        if row is None:
+            return {'first_day': None, 'watermark': None}
+        return {'first_day': row['first_day'], 'watermark': row['watermark']}
+    
+    def merge_days(self, account_id: str, shape_key: str, start_date: str, end_date: str,
+                   days: Dict[str, Dict[Tuple[str, ...], Decimal]], watermark: Optional[str],
+                   dimensions: Sequence[str] = (), metric: str = 'UnblendedCost'):
+        """Replace facts in [start_date, end_date) for a query shape with freshly fetched days
+        
+        account_id is the account the query ran as; facts grouped by
+        LINKED_ACCOUNT are attributed to the linked account instead.
+        """
+        dimensions = tuple(dimensions)
+        rows = []
+        for day, groups in days.items():
+            for keys, amount in groups.items():
+                fact = {'account_id': account_id, 'service': '', 'usage_type': '', 'project': ''}
+                for column, value in zip(dimensions, keys):
+                    if column == TAG_COLUMN:
+                        value = _tag_value(value)
+                    if column in fact:
+                        fact[column] = value
+                rows.append((
+                    day, fact['account_id'], fact['service'], fact['usage_type'], fact['project'],
+                    metric, to_units(amount), '|'.join(keys), account_id, shape_key, ','.join(dimensions)
+                ))
+        
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    'DELETE FROM cost_facts WHERE source_account_id = ? AND shape_key = ? '
+                    'AND usage_date >= ? AND usage_date < ?',
+                    (account_id, shape_key, start_date, end_date)
+                )
+                self._conn.executemany(
+                    'INSERT INTO cost_facts (usage_date, account_id, service, usage_type, project, metric, '
+                    'amount_units, group_key, source_account_id, shape_key, dimensions) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    rows
+                )
+                self._conn.execute(
+                    'INSERT INTO ingestion_state (account_id, shape_key, dimensions, first_day, watermark) '
+                    'VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT (account_id, shape_key) DO UPDATE SET '
+                    'first_day = MIN(COALESCE(first_day, excluded.first_day), excluded.first_day), '
+                    'watermark = MAX(COALESCE(watermark, excluded.watermark), COALESCE(excluded.watermark, watermark)), '
+                    'updated_at = CURRENT_TIMESTAMP',
+                    (account_id, shape_key, ','.join(dimensions), start_date, watermark)
+                )
+    
+    def sum_range(self, account_id: str, shape_key: str, start_date: str,
+                  end_date: str) -> Dict[Tuple[str, ...], Decimal]:
+        """Fold a query shape's facts in [start_date, end_date) into {group keys: amount}"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT group_key, SUM(amount_units) AS amount_units FROM cost_facts '
+                'WHERE source_account_id = ? AND shape_key = ? AND usage_date >= ? AND usage_date < ? '
+                'GROUP BY group_key',
+                (account_id, shape_key, start_date, end_date)
+            ).fetchall()
+        
+        return {
+            tuple(row['group_key'].split('|')) if row['group_key'] else (): from_units(row['amount_units'])
+            for row in rows
+        }
+    
+    # Reporting
+    
+    def query_costs(self, start_date: str, end_date: str, group_by: Sequence[str] = ('service',),
+                    account_ids: List[str] = None, services: List[str] = None,
+                    projects: List[str] = None, metric: str = 'UnblendedCost') -> List[Dict]:
+        """Sum facts in [start_date, end_date) grouped by any of REPORT_COLUMNS
+        
+        Facts ingested with a project tag grouping are used when grouping or
+        filtering by project; the service/usage type breakdown otherwise.
+        """
+        group_by = [column for column in group_by if column in REPORT_COLUMNS]
+        use_projects = 'project' in group_by or bool(projects)
+        dimensions = PROJECT_DIMENSIONS if use_projects else USAGE_TYPE_DIMENSIONS
+        
+        conditions = ['dimensions = ?', 'usage_date >= ?', 'usage_date < ?', 'metric = ?']
+        params = [dimensions, start_date, end_date, metric]
+        for column, values in (('account_id', account_ids), ('service', services), ('project', projects)):
+            if values:
+                conditions.append(f"{column} IN ({', '.join('?' for _ in values)})")
+                params.extend(values)
+        
+        select_columns = ', '.join(group_by)
+        sql = (
+            f"SELECT {select_columns + ', ' if group_by else ''}SUM(amount_units) AS amount_units FROM cost_facts "
+            f"WHERE {' AND '.join(conditions)}"
+        )
+        if group_by:
+            sql += f" GROUP BY {select_columns} ORDER BY amount_units DESC"
+        
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        
+        results = []
+        for row in rows:
+            if row['amount_units'] is None:
+                continue
+            result = {column: row[column] for column in group_by}
+            result['amount'] = from_units(row['amount_units'])
+            results.append(result)
+        return results
+    
+    def get_coverage(self) -> List[Dict]:
+        """Ingested date range per account and query shape"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT account_id, dimensions, first_day, watermark, updated_at FROM ingestion_state '
+                'ORDER BY account_id, dimensions'
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+_default_warehouse = None
+_default_warehouse_lock = threading.Lock()
+
+
+def get_default_warehouse() -> CostWarehouse:
+    """Return the process-wide warehouse"""
+    global _default_warehouse
+    with _default_warehouse_lock:
+        if _default_warehouse is None:
+            _default_warehouse = CostWarehouse()
+        return _default_warehouse
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Shared discovery result cache
+Keeps each account's discovery results in memory and on disk, keyed by account, region set,
+services and discovery configuration, so the CLI and every web session reuse one discovery of
+the same account until it expires or is invalidated.
+"""
+
+import os
+import copy
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, Optional, Sequence
+
+from resource_record import json_default
+
+logger = logging.getLogger(__name__)
+
+# Seconds a discovery result is reused (0 = no caching)
+DISCOVERY_CACHE_TTL = int(os.environ.get('DISCOVERY_CACHE_TTL', '900'))
+
+DISCOVERY_CACHE_DIR = os.environ.get(
+    'DISCOVERY_CACHE_DIR',
+    os.path.join(
+        os.environ.get('COST_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cost-data')),
+        'discovery'
+    )
+)
+
+
+def config_hash(config) -> str:
+    """Stable hash of the settings that shape discovery results"""
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def discovery_key(account_id: str, regions: Sequence[str], services: Sequence[str],
+                  config_digest: str, **variant) -> str:
+    """Cache key for one account, region set, service list and configuration"""
+    key_data = {
+        'account_id': account_id,
+        'regions': sorted(regions),
+        'services': sorted(services),
+        'config': config_digest,
+        'variant': variant
+    }
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class DiscoveryCache:
+    """Discovery results shared across sessions and processes
+    
+    Reads return a private copy, so concurrent readers never see each
+    other's changes. Concurrent misses for the same key run one discovery
+    and share its result.
+    """
+    
+    def __init__(self, cache_dir: str = None, ttl_seconds: int = None):
+        self.cache_dir = cache_dir or DISCOVERY_CACHE_DIR
+        self.ttl_seconds = DISCOVERY_CACHE_TTL if ttl_seconds is None else ttl_seconds
+        self._entries = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0}
+    
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+    
+    def _path(self, account_id: str, key: str) -> str:
+        return os.path.join(self.cache_dir, str(account_id), f"{key}.json")
+    
+    def get(self, account_id: str, key: str) -> Optional[Dict]:
+        """Return a copy of a cached result, or None if missing or expired"""
+        if not self.enabled:
+            return None
+        
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            try:
+                with open(self._path(account_id, key), 'r') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                entry = None
+        
+        if entry is None or time.time() - entry['stored_at'] > self.ttl_seconds:
+            with self._lock:
+                self.stats['misses'] += 1
+            return None
+        
+        with self._lock:
+            self._entries[key] = entry
+            self.stats['hits'] += 1
+        return copy.deepcopy(entry['result'])
+    
+    def put(self, account_id: str, key: str, result: Dict):
+        """Store a discovery result for every session and process"""
+        if not self.enabled:
+            return
+        
+        # Round-trip through JSON so the memory and disk copies are identical
+        entry = json.loads(json.dumps({
+            'stored_at': time.time(),
+            'account_id': account_id,
+            'result': result
+        }, default=json_default))
+        with self._lock:
+            self._entries[key] = entry
+            self.stats['writes'] += 1
+        
+        path = self._path(account_id, key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write discovery cache entry: {e}")
+    
+    def get_or_discover(self, account_id: str, key: str, discover: Callable[[], Dict],
+                        cacheable: Callable[[Dict], bool] = None) -> Dict:
+        """Return the cached result, or run discover() once and cache what it returns
+        
+        Results rejected by cacheable(result) are returned without being stored.
+        """
+        if not self.enabled or account_id is None:
+            return discover()
+        
+        cached = self.get(account_id, key)
+        if cached is not None:
+            return cached
+        
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # Another session may have finished the same discovery while we waited
+            cached = self.get(account_id, key)
+            if cached is not None:
+                return cached
+            result = discover()
+            if cacheable is None or cacheable(result):
+                self.put(account_id, key, result)
+            return result
+    
+    def invalidate(self, account_id: str = None):
+        """Drop cached results for one account, or for every account"""
+        with self._lock:
+            if account_id is None:
+                self._entries.clear()
+            else:
+                self._entries = {
+                    key: entry for key, entry in self._entries.items()
+                    if entry.get('account_id') != account_id
+                }
+        
+        path = self.cache_dir if account_id is None else os.path.join(self.cache_dir, str(account_id))
+        shutil.rmtree(path, ignore_errors=True)
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self.stats)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_discovery_cache() -> DiscoveryCache:
+    """Return the process-wide discovery cache"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = DiscoveryCache()
+        return _default_cache
@@ -4,9 +4,13 @@ Enhanced AI Service Discovery Module
 Discovers ALL AWS AI/ML services and maps them to projects
 """
 
+import os
 import json
 import re
-from typing import Dict, List, Set, Tuple, Optional
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Set, Tuple, Optional
 from datetime import datetime
 import boto3
 from botocore.exceptions import ClientError
@@ -15,8 +19,71 @@ from rich.table import Table
 from rich.progress import Progress, SpinnerColumn, TextColumn
 from decimal import Decimal
 
+from rate_limiter import rate_limited_client
+from tag_index import get_tag_index, tag_list_to_dict
+from region_fanout import discovery_grid, enabled_regions, tag_with_region
+from pattern_matcher import get_matcher
+from account_executor import live_progress_enabled
+from pagination import (
+    iter_items, iter_pages, listing_budget, listing_complete, listing_window, map_pipelined,
+    record_listing_error, window_start
+)
+from inventory_snapshot import account_id_for, fingerprint, open_snapshot, pop_changes, summarize_changes
+from discovery_cache import config_hash, discovery_key, get_discovery_cache
+from resource_record import to_records
+from attribution_cache import get_attribution_cache, rules_version
+
 console = Console()
 
+# Region x service cells scanned concurrently per account, and how long one may take
+DISCOVERY_MAX_WORKERS = int(os.environ.get('DISCOVERY_MAX_WORKERS', '16'))
+DISCOVERY_SERVICE_TIMEOUT = float(os.environ.get('DISCOVERY_SERVICE_TIMEOUT', '120'))
+
+# AI naming patterns for Lambda functions, S3 buckets and DynamoDB tables
+LAMBDA_AI_MATCHER = get_matcher([
+    r'.*-ai-.*', r'.*ask-eva.*', r'.*iep.*', r'.*resume-.*',
+    r'.*knockout.*', r'.*scoring.*', r'.*financial-aid.*',
+    r'sa-ai-.*', r'.*querykb.*', r'.*bedrock.*', r'.*sagemaker.*',
+    r'.*comprehend.*', r'.*textract.*', r'.*rekognition.*'
+])
+S3_AI_MATCHER = get_matcher([
+    r'sa-ai-.*', r'.*-ai-.*', r'.*-modeltraining.*',
+    r'.*modeltraining.*', r'.*ask-eva.*', r'.*resume-.*',
+    r'.*iep.*', r'.*sagemaker.*', r'.*bedrock.*'
+])
+DYNAMODB_AI_MATCHER = get_matcher([
+    r'.*_ai_.*', r'.*-ai-.*', r'.*conversation.*',
+    r'.*chat.*', r'sa_ai_.*', r'.*ask_eva.*', r'.*iep.*'
+])
+
+# Non-AI services scanned for AI naming patterns
+TRADITIONAL_SERVICES = {
+    'lambda': {'category': 'Compute', 'description': 'AI-related Lambda functions'},
+    's3': {'category': 'Storage', 'description': 'AI-related S3 buckets'},
+    'dynamodb': {'category': 'Database', 'description': 'AI-related DynamoDB tables'}
+}
+
+
+def worker_session(session: boto3.Session, region: str = None) -> boto3.Session:
+    """Build a separate session with the same credentials for a worker thread, optionally in another region"""
+    region = region or session.region_name
+    credentials = session.get_credentials()
+    if credentials is None:
+        return boto3.Session(profile_name=session.profile_name, region_name=region)
+    frozen = credentials.get_frozen_credentials()
+    return boto3.Session(
+        aws_access_key_id=frozen.access_key,
+        aws_secret_access_key=frozen.secret_key,
+        aws_session_token=frozen.token,
+        region_name=region
+    )
+
+
+def degrades_result(issue: Dict) -> bool:
+    """True for scan issues that make a discovery unfit to share (not e.g. a stable AccessDenied)"""
+    return issue['kind'] != 'error' or bool(issue.get('retryable'))
+
+
 class EnhancedAIDiscovery:
     def __init__(self):
         # Load AI services configuration
@@ -26,10 +93,65 @@ class EnhancedAIDiscovery:
         self.ai_services = self.config['ai_services']
         self.project_mappings = self.config['project_mappings']
         self.tag_keys = self.config['tag_keys']
+        self._rules_version = rules_version(self.tag_keys['project'], self.project_mappings)
+        
+    def _discovery_service_keys(self, additional_services: List[str] = None) -> List[str]:
+        """Enabled AI services plus any requested ones, then Lambda, S3 and DynamoDB"""
+        enabled_services = []
+        for service_key, service_info in self.ai_services.items():
+            if service_info.get('enabled_by_default', False):
+                enabled_services.append(service_key)
         
+        # Add any additional services requested
+        if additional_services:
+            for service in additional_services:
+                if service in self.ai_services and service not in enabled_services:
+                    enabled_services.append(service)
+        
+        # Lambda, S3 and DynamoDB are scanned for AI naming patterns alongside the AI services
+        return enabled_services + list(TRADITIONAL_SERVICES)
+    
+    def _service_info(self, service_key: str) -> Dict:
+        return TRADITIONAL_SERVICES.get(service_key) or self.ai_services[service_key]
+    
+    def _discovery_cache_key(self, session: boto3.Session, service_keys: List[str],
+                             since: str = None) -> Tuple[Optional[str], Optional[str]]:
+        """(account id, key) for the shared discovery cache, or (None, None) when caching is off"""
+        if not get_discovery_cache().enabled:
+            return None, None
+        account_id = account_id_for(session)
+        if account_id is None:
+            return None, None
+        return account_id, discovery_key(
+            account_id, enabled_regions(session), service_keys, config_hash(self.config),
+            discoverer='enhanced', since=since
+        )
+    
     def discover_all_ai_resources(self, session: boto3.Session, account_name: str, 
-                                 additional_services: List[str] = None) -> Dict:
-        """Discover all AI resources across all AI services"""
+                                 additional_services: List[str] = None, since: str = None,
+                                 use_cache: bool = True) -> Dict:
+        """Discover all AI resources across all AI services
+        
+        since (YYYY-MM-DD, usually the reporting period start) limits job
+        listings such as SageMaker training jobs; DISCOVERY_LOOKBACK_DAYS
+        applies when it is not given. Results are shared with other sessions
+        through the discovery cache unless use_cache is False.
+        """
+        service_keys = self._discovery_service_keys(additional_services)
+        account_id, key = self._discovery_cache_key(session, service_keys, since) if use_cache else (None, None)
+        if account_id is None:
+            return self._discover_all_ai_resources(session, account_name, service_keys, since)
+        
+        # A discovery with failed or partial scans is not shared, so the next request retries them
+        discoveries = get_discovery_cache().get_or_discover(
+            account_id, key, lambda: self._discover_all_ai_resources(session, account_name, service_keys, since),
+            cacheable=lambda result: not any(degrades_result(issue) for issue in result['summary']['errors'])
+        )
+        discoveries['account'] = account_name
+        return discoveries
+    
+    def _discover_all_ai_resources(self, session: boto3.Session, account_name: str,
+                                   service_keys: List[str], since: str = None) -> Dict:
         discoveries = {
             'account': account_name,
             'timestamp': datetime.now().isoformat(),
@@ -39,97 +161,69 @@ class EnhancedAIDiscovery:
                 'total_ai_resources': 0,
                 'services_found': set(),
                 'projects_found': set(),
-                'untagged_resources': 0
+                'untagged_resources': 0,
+                'errors': []
             }
         }
         
-        # Get enabled services
-        enabled_services = []
-        for service_key, service_info in self.ai_services.items():
-            if service_info.get('enabled_by_default', False):
-                enabled_services.append(service_key)
-        
-        # Add any additional services requested
-        if additional_services:
-            for service in additional_services:
-                if service in self.ai_services and service not in enabled_services:
-                    enabled_services.append(service)
+        labels = {'lambda': 'Lambda functions', 's3': 'S3 buckets', 'dynamodb': 'DynamoDB tables'}
+        tasks = [
+            (service_key, f"Scanning {labels[service_key]} for AI resources..." if service_key in labels
+             else f"Scanning {self.ai_services[service_key]['cost_explorer_name']} in {account_name}...")
+            for service_key in service_keys
+        ]
         
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
-            console=console
+            console=console,
+            disable=not live_progress_enabled()
         ) as progress:
+            progress_tasks = {
+                service_key: progress.add_task(f"[cyan]{description}", total=None)
+                for service_key, description in tasks
+            }
+            results = self._run_discovery_methods(
+                session, service_keys,
+                lambda service_key: progress.update(progress_tasks[service_key], completed=True),
+                since=since
+            )
+        
+        # Merge in the original service order so the output does not depend on completion order
+        for service_key in service_keys:
+            resources, issues = results.get(service_key, (None, []))
+            discoveries['summary']['errors'].extend(issues)
+            failures = [issue for issue in issues if issue['kind'] in ('failed', 'timeout')]
+            if failures:
+                error = '; '.join(f"{issue['region']}: {issue['message']}" for issue in failures)
+                console.print(f"[red]Error discovering {service_key}: {error}[/red]")
+                discoveries.setdefault('errors', {})[service_key] = error
+            for issue in issues:
+                if issue['kind'] in ('deadline', 'truncated'):
+                    console.print(f"[yellow]{service_key} in {issue['region']}: {issue['operation']} "
+                                  f"{issue['message']}, results are partial[/yellow]")
+            if not resources:
+                continue
             
-            # Discover resources for each enabled AI service
-            for service_key in enabled_services:
-                service_info = self.ai_services[service_key]
-                task = progress.add_task(
-                    f"[cyan]Scanning {service_info['cost_explorer_name']} in {account_name}...", 
-                    total=None
-                )
-                
-                try:
-                    # Call the appropriate discovery method
-                    discovery_method = getattr(self, f'discover_{service_key}', None)
-                    if discovery_method:
-                        resources = discovery_method(session)
-                        if resources:
-                            discoveries['services'][service_key] = {
-                                'resources': resources,
-                                'count': len(resources),
-                                'service_info': service_info
-                            }
-                            discoveries['summary']['total_ai_resources'] += len(resources)
-                            discoveries['summary']['services_found'].add(service_key)
-                            
-                            # Map resources to projects
-                            self._map_resources_to_projects(service_key, resources, discoveries)
-                    else:
-                        # Fallback to generic resource discovery
-                        console.print(f"[yellow]No specific discovery for {service_key}, using generic method[/yellow]")
-                        
-                except Exception as e:
-                    console.print(f"[red]Error discovering {service_key}: {str(e)}[/red]")
-                
-                progress.update(task, completed=True)
-            
-            # Also discover traditional resources (Lambda, S3, DynamoDB) with AI patterns
-            task = progress.add_task(f"[cyan]Scanning Lambda functions for AI resources...", total=None)
-            lambda_resources = self.discover_lambda_ai_resources(session)
-            if lambda_resources:
-                discoveries['services']['lambda'] = {
-                    'resources': lambda_resources,
-                    'count': len(lambda_resources),
-                    'service_info': {'category': 'Compute', 'description': 'AI-related Lambda functions'}
-                }
-                discoveries['summary']['total_ai_resources'] += len(lambda_resources)
-                self._map_resources_to_projects('lambda', lambda_resources, discoveries)
-            progress.update(task, completed=True)
-            
-            task = progress.add_task(f"[cyan]Scanning S3 buckets for AI resources...", total=None)
-            s3_resources = self.discover_s3_ai_resources(session)
-            if s3_resources:
-                discoveries['services']['s3'] = {
-                    'resources': s3_resources,
-                    'count': len(s3_resources),
-                    'service_info': {'category': 'Storage', 'description': 'AI-related S3 buckets'}
-                }
-                discoveries['summary']['total_ai_resources'] += len(s3_resources)
-                self._map_resources_to_projects('s3', s3_resources, discoveries)
-            progress.update(task, completed=True)
+            if service_key not in TRADITIONAL_SERVICES:
+                discoveries['summary']['services_found'].add(service_key)
+            discoveries['services'][service_key] = {
+                'resources': resources,
+                'count': len(resources),
+                'service_info': self._service_info(service_key),
+                'partial': any(degrades_result(issue) for issue in issues)
+            }
+            discoveries['summary']['total_ai_resources'] += len(resources)
             
-            task = progress.add_task(f"[cyan]Scanning DynamoDB tables for AI resources...", total=None)
-            dynamodb_resources = self.discover_dynamodb_ai_resources(session)
-            if dynamodb_resources:
-                discoveries['services']['dynamodb'] = {
-                    'resources': dynamodb_resources,
-                    'count': len(dynamodb_resources),
-                    'service_info': {'category': 'Database', 'description': 'AI-related DynamoDB tables'}
-                }
-                discoveries['summary']['total_ai_resources'] += len(dynamodb_resources)
-                self._map_resources_to_projects('dynamodb', dynamodb_resources, discoveries)
-            progress.update(task, completed=True)
+            # Map resources to projects
+            self._map_resources_to_projects(service_key, resources, discoveries)
+        
+        # What changed since the previous discovery of this account
+        discoveries['inventory_changes'] = pop_changes(session)
+        if discoveries['inventory_changes']:
+            totals = summarize_changes(discoveries['inventory_changes'])
+            console.print(f"[dim]Inventory: {totals['added']} new, {totals['changed']} changed, "
+                          f"{totals['removed']} removed, {totals['reused']} reused from the last snapshot[/dim]")
         
         # Convert sets to lists for JSON serialization
         discoveries['summary']['services_found'] = list(discoveries['summary']['services_found'])
@@ -137,6 +231,215 @@ class EnhancedAIDiscovery:
         
         return discoveries
     
+    def iter_ai_resources(self, session: boto3.Session, account_name: str,
+                          additional_services: List[str] = None, since: str = None,
+                          use_cache: bool = True) -> Iterator[Dict]:
+        """Yield discovery events as each region x service scan finishes
+        
+        'resource' events carry the service, region, project and resource;
+        'error' events carry one issue of a scan (a failed listing, a listing
+        stopped at its deadline, or a failed or timed out scan). The last event
+        is a 'summary' with the totals discover_all_ai_resources reports.
+        A cached discovery of the account is replayed instead of scanning;
+        with use_cache=False resources are not kept once yielded. Closing the
+        iterator early cancels the scans that have not started.
+        """
+        service_keys = self._discovery_service_keys(additional_services)
+        account_id, key = self._discovery_cache_key(session, service_keys, since) if use_cache else (None, None)
+        if account_id is None:
+            yield from self._iter_live_events(session, account_name, service_keys, since)
+            return
+        
+        cache = get_discovery_cache()
+        cached = cache.get(account_id, key)
+        if cached is not None:
+            yield from self._replay_discovery_events(cached, account_name)
+            return
+        
+        events = []
+        for event in self._iter_live_events(session, account_name, service_keys, since):
+            events.append(event)
+            yield event
+        if not any(event['event'] == 'error' and degrades_result(event) for event in events):
+            cache.put(account_id, key, self.collect_discovery_events(events, account_name))
+    
+    def _replay_discovery_events(self, discoveries: Dict, account_name: str) -> Iterator[Dict]:
+        for service_key, service in discoveries['services'].items():
+            for resource in service['resources']:
+                yield {'event': 'resource', 'account': account_name, 'service': service_key,
+                       'region': resource.get('region'), 'project': resource.get('project', 'Unknown'),
+                       'resource': resource}
+        yield {'event': 'summary', 'account': account_name, 'timestamp': discoveries['timestamp'],
+               'summary': discoveries['summary'], 'inventory_changes': {}, 'cached': True}
+    
+    def _iter_live_events(self, session: boto3.Session, account_name: str, service_keys: List[str],
+                          since: str = None) -> Iterator[Dict]:
+        summary = {
+            'total_ai_resources': 0,
+            'services_found': set(),
+            'projects_found': set(),
+            'untagged_resources': 0,
+            'errors': []
+        }
+        
+        for (service_key, region), resources, issues in self._iter_discovery_cells(session, service_keys, since=since):
+            for issue in issues:
+                summary['errors'].append(issue)
+                yield dict(issue, event='error', account=account_name, error=issue['message'])
+            for resource in resources or []:
+                project = resource.get('project', 'Unknown')
+                summary['total_ai_resources'] += 1
+                if service_key not in TRADITIONAL_SERVICES:
+                    summary['services_found'].add(service_key)
+                if project != 'Unknown':
+                    summary['projects_found'].add(project)
+                else:
+                    summary['untagged_resources'] += 1
+                yield {'event': 'resource', 'account': account_name, 'service': service_key,
+                       'region': region, 'project': project, 'resource': resource}
+        
+        summary['services_found'] = list(summary['services_found'])
+        summary['projects_found'] = list(summary['projects_found'])
+        yield {'event': 'summary', 'account': account_name, 'timestamp': datetime.now().isoformat(),
+               'summary': summary, 'inventory_changes': pop_changes(session)}
+    
+    def collect_discovery_events(self, events: Iterable[Dict], account_name: str) -> Dict:
+        """Build the discover_all_ai_resources result from one account's iter_ai_resources events"""
+        discoveries = {
+            'account': account_name,
+            'timestamp': datetime.now().isoformat(),
+            'services': {},
+            'projects': {},
+            'summary': {
+                'total_ai_resources': 0,
+                'services_found': set(),
+                'projects_found': set(),
+                'untagged_resources': 0,
+                'errors': []
+            }
+        }
+        
+        for event in events:
+            if event['event'] == 'resource':
+                service_key = event['service']
+                service = discoveries['services'].setdefault(service_key, {
+                    'resources': [], 'count': 0, 'service_info': self._service_info(service_key)
+                })
+                service['resources'].append(event['resource'])
+                service['count'] += 1
+                self._map_resources_to_projects(service_key, [event['resource']], discoveries)
+            elif event['event'] == 'summary':
+                discoveries['timestamp'] = event['timestamp']
+                discoveries['summary'] = event['summary']
+                discoveries['inventory_changes'] = event['inventory_changes']
+        
+        for key in ('services_found', 'projects_found'):
+            discoveries['summary'][key] = list(discoveries['summary'][key])
+        degraded = {issue['service'] for issue in discoveries['summary'].get('errors', []) if degrades_result(issue)}
+        for service_key, service in discoveries['services'].items():
+            service['partial'] = service_key in degraded
+        return discoveries
+    
+    def _discovery_method(self, service_key: str):
+        if service_key in TRADITIONAL_SERVICES:
+            return getattr(self, f'discover_{service_key}_ai_resources')
+        return getattr(self, f'discover_{service_key}', None)
+    
+    def _discovery_cells(self, session: boto3.Session, service_keys: List[str]) -> List[Tuple[str, str]]:
+        runnable = []
+        for service_key in service_keys:
+            if self._discovery_method(service_key) is None:
+                # Fallback to generic resource discovery
+                console.print(f"[yellow]No specific discovery for {service_key}, using generic method[/yellow]")
+                continue
+            runnable.append(service_key)
+        return discovery_grid(session, runnable)
+    
+    def _iter_discovery_cells(self, session: boto3.Session, service_keys: List[str], since: str = None,
+                              cells: List[Tuple[str, str]] = None) -> Iterator[Tuple[Tuple[str, str], Optional[List[Dict]], List[Dict]]]:
+        """Run discovery methods over the region x service grid on a bounded worker pool
+        
+        Yields ((service_key, region), resources, issues) as each cell
+        finishes. Listings stop paging after DISCOVERY_SERVICE_DEADLINE
+        seconds and the cell returns what it found so far; a cell still
+        running after DISCOVERY_SERVICE_TIMEOUT seconds (e.g. a hung call)
+        is reported as timed out and left to finish in the background.
+        """
+        started = {}
+        if cells is None:
+            cells = self._discovery_cells(session, service_keys)
+        
+        def issue(cell: Tuple[str, str], kind: str, message: str) -> Dict:
+            return {'kind': kind, 'operation': None, 'message': message, 'service': cell[0], 'region': cell[1]}
+        
+        def run(cell: Tuple[str, str]):
+            started[cell] = time.monotonic()
+            service_key, region = cell
+            # boto3 sessions are not thread-safe, so each worker builds clients from its own
+            with listing_window(since), listing_budget() as budget:
+                resources = self._discovery_method(service_key)(worker_session(session, region))
+            issues = [dict(found, service=service_key, region=region) for found in budget.issues]
+            return to_records(service_key, tag_with_region(resources, region)), issues
+        
+        executor = ThreadPoolExecutor(max_workers=DISCOVERY_MAX_WORKERS, thread_name_prefix='discovery')
+        # Each cell gets its own copy of the caller's context (e.g. the metering scope)
+        pending = {executor.submit(contextvars.copy_context().run, run, cell): cell for cell in cells}
+        try:
+            while pending:
+                done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    cell = pending.pop(future)
+                    try:
+                        resources, issues = future.result()
+                    except Exception as e:
+                        resources, issues = None, [issue(cell, 'failed', str(e))]
+                    yield cell, resources, issues
+                
+                now = time.monotonic()
+                for future, cell in list(pending.items()):
+                    if cell in started and now - started[cell] > DISCOVERY_SERVICE_TIMEOUT:
+                        pending.pop(future)
+                        yield cell, None, [issue(cell, 'timeout', f"timed out after {DISCOVERY_SERVICE_TIMEOUT:.0f}s")]
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _run_discovery_methods(self, session: boto3.Session, service_keys: List[str],
+                               on_done: Callable[[str], None] = None,
+                               since: str = None) -> Dict[str, Tuple[Optional[List[Dict]], List[Dict]]]:
+        """Run every discovery cell and merge each service's regions, home region first
+        
+        Returns {service_key: (resources, issues)}. on_done(service_key) is
+        called once all of a service's regions have finished.
+        """
+        cells = self._discovery_cells(session, service_keys)
+        
+        # A service is done once all of its regions are
+        remaining = {service_key: 0 for service_key in service_keys}
+        for service_key, _ in cells:
+            remaining[service_key] += 1
+        
+        if on_done:
+            for service_key, count in remaining.items():
+                if count == 0:
+                    on_done(service_key)
+        
+        cell_results = {}
+        for cell, resources, issues in self._iter_discovery_cells(session, service_keys, since=since, cells=cells):
+            cell_results[cell] = (resources, issues)
+            remaining[cell[0]] -= 1
+            if remaining[cell[0]] == 0 and on_done:
+                on_done(cell[0])
+        
+        results = {}
+        for cell in cells:
+            service_key = cell[0]
+            resources, issues = cell_results.get(cell, (None, []))
+            merged_resources, merged_issues = results.get(service_key, (None, []))
+            if resources:
+                merged_resources = (merged_resources or []) + resources
+            results[service_key] = (merged_resources, merged_issues + issues)
+        return results
+    
     def _map_resources_to_projects(self, service_key: str, resources: List[Dict], discoveries: Dict):
         """Map resources to projects based on tags and naming patterns"""
         for resource in resources:
@@ -164,17 +467,26 @@ class EnhancedAIDiscovery:
         """Generic method to get resource tags"""
         try:
             response = getattr(client, method_name)(**kwargs)
-            return response.get('Tags', {})
+            tags = response.get('Tags', {})
+            # Most services return [{'Key': ..., 'Value': ...}]
+            return tag_list_to_dict(tags) if isinstance(tags, list) else tags
         except:
             return {}
     
     def _identify_project(self, resource_name: str, tags: Dict = None) -> str:
         """Identify project from tags or resource name"""
+        project_tags = tuple(
+            (tag_category, tags[tag_category]) for tag_category in self.tag_keys['project'] if tag_category in tags
+        ) if tags else ()
+        return get_attribution_cache().get_or_compute(
+            ('enhanced_discovery', self._rules_version, None, resource_name, project_tags),
+            lambda: self._evaluate_project_rules(resource_name, project_tags)
+        )
+    
+    def _evaluate_project_rules(self, resource_name: str, project_tags: tuple) -> str:
         # Check tags first
-        if tags:
-            for tag_category in self.tag_keys['project']:
-                if tag_category in tags:
-                    return tags[tag_category]
+        if project_tags:
+            return project_tags[0][1]
         
         # Check resource name patterns
         name_lower = resource_name.lower()
@@ -186,49 +498,45 @@ class EnhancedAIDiscovery:
     
     # Bedrock Discovery
     def discover_bedrock(self, session: boto3.Session) -> List[Dict]:
-        """Discover Bedrock agents and knowledge bases"""
+        """Discover Bedrock agents and knowledge bases in the session's region"""
         resources = []
+        region = session.region_name
         
-        # Try multiple regions as Bedrock might be regional
-        regions = ['us-east-1', 'us-west-2']
-        
-        for region in regions:
+        try:
+            bedrock_agent = rate_limited_client(session, 'bedrock-agent')
+            
+            # List knowledge bases
             try:
-                bedrock_agent = session.client('bedrock-agent', region_name=region)
-                
-                # List knowledge bases
-                try:
-                    kb_response = bedrock_agent.list_knowledge_bases()
-                    for kb in kb_response.get('knowledgeBaseSummaries', []):
-                        resources.append({
-                            'type': 'knowledge_base',
-                            'name': kb['name'],
-                            'id': kb['knowledgeBaseId'],
-                            'status': kb['status'],
-                            'region': region,
-                            'project': self._identify_project(kb['name'])
-                        })
-                except:
-                    pass
-                
-                # List agents
-                try:
-                    agents_response = bedrock_agent.list_agents()
-                    for agent in agents_response.get('agentSummaries', []):
-                        resources.append({
-                            'type': 'agent',
-                            'name': agent['agentName'],
-                            'id': agent['agentId'],
-                            'status': agent['agentStatus'],
-                            'region': region,
-                            'project': self._identify_project(agent['agentName'])
-                        })
-                except:
-                    pass
-                
+                for kb in iter_items(bedrock_agent, 'list_knowledge_bases', 'knowledgeBaseSummaries'):
+                    resources.append({
+                        'type': 'knowledge_base',
+                        'name': kb['name'],
+                        'id': kb['knowledgeBaseId'],
+                        'status': kb['status'],
+                        'region': region,
+                        'project': self._identify_project(kb['name'])
+                    })
             except Exception as e:
-                if 'AccessDeniedException' not in str(e):
-                    console.print(f"[yellow]Could not access Bedrock in {region}: {str(e)}[/yellow]")
+                record_listing_error('list_knowledge_bases', e)
+            
+            # List agents
+            try:
+                for agent in iter_items(bedrock_agent, 'list_agents', 'agentSummaries'):
+                    resources.append({
+                        'type': 'agent',
+                        'name': agent['agentName'],
+                        'id': agent['agentId'],
+                        'status': agent['agentStatus'],
+                        'region': region,
+                        'project': self._identify_project(agent['agentName'])
+                    })
+            except Exception as e:
+                record_listing_error('list_agents', e)
+        
+        except Exception as e:
+            record_listing_error('bedrock-agent', e)
+            if 'AccessDeniedException' not in str(e):
+                console.print(f"[yellow]Could not access Bedrock in {region}: {str(e)}[/yellow]")
         
         return resources
     
@@ -236,16 +544,16 @@ class EnhancedAIDiscovery:
     def discover_sagemaker(self, session: boto3.Session) -> List[Dict]:
         """Discover SageMaker resources"""
         resources = []
-        sagemaker = session.client('sagemaker')
+        sagemaker = rate_limited_client(session, 'sagemaker')
+        tag_index = get_tag_index(session)
         
         # List endpoints
         try:
-            endpoints = sagemaker.list_endpoints()
-            for endpoint in endpoints.get('Endpoints', []):
-                tags = self._get_resource_tags(
+            for endpoint in iter_items(sagemaker, 'list_endpoints', 'Endpoints'):
+                tags = tag_index.lookup(endpoint['EndpointArn'], lambda: self._get_resource_tags(
                     sagemaker, 'list_tags',
                     ResourceArn=endpoint['EndpointArn']
-                )
+                ))
                 resources.append({
                     'type': 'endpoint',
                     'name': endpoint['EndpointName'],
@@ -254,17 +562,16 @@ class EnhancedAIDiscovery:
                     'created': endpoint['CreationTime'].isoformat(),
                     'project': self._identify_project(endpoint['EndpointName'], tags)
                 })
-        except:
-            pass
+        except Exception as e:
+            record_listing_error('list_endpoints', e)
         
         # List notebook instances
         try:
-            notebooks = sagemaker.list_notebook_instances()
-            for notebook in notebooks.get('NotebookInstances', []):
-                tags = self._get_resource_tags(
+            for notebook in iter_items(sagemaker, 'list_notebook_instances', 'NotebookInstances'):
+                tags = tag_index.lookup(notebook['NotebookInstanceArn'], lambda: self._get_resource_tags(
                     sagemaker, 'list_tags',
                     ResourceArn=notebook['NotebookInstanceArn']
-                )
+                ))
                 resources.append({
                     'type': 'notebook_instance',
                     'name': notebook['NotebookInstanceName'],
@@ -273,17 +580,16 @@ class EnhancedAIDiscovery:
                     'instance_type': notebook['InstanceType'],
                     'project': self._identify_project(notebook['NotebookInstanceName'], tags)
                 })
-        except:
-            pass
+        except Exception as e:
+            record_listing_error('list_notebook_instances', e)
         
-        # List training jobs (recent ones)
+        # List training jobs created in the reporting period
         try:
-            training_jobs = sagemaker.list_training_jobs(MaxResults=50)
-            for job in training_jobs.get('TrainingJobSummaries', []):
-                tags = self._get_resource_tags(
+            for job in iter_items(sagemaker, 'list_training_jobs', 'TrainingJobSummaries', CreationTimeAfter=window_start()):
+                tags = tag_index.lookup(job['TrainingJobArn'], lambda: self._get_resource_tags(
                     sagemaker, 'list_tags',
                     ResourceArn=job['TrainingJobArn']
-                )
+                ))
                 resources.append({
                     'type': 'training_job',
                     'name': job['TrainingJobName'],
@@ -292,8 +598,8 @@ class EnhancedAIDiscovery:
                     'created': job['CreationTime'].isoformat(),
                     'project': self._identify_project(job['TrainingJobName'], tags)
                 })
-        except:
-            pass
+        except Exception as e:
+            record_listing_error('list_training_jobs', e)
         
         return resources
     
@@ -301,12 +607,11 @@ class EnhancedAIDiscovery:
     def discover_comprehend(self, session: boto3.Session) -> List[Dict]:
         """Discover Comprehend resources"""
         resources = []
-        comprehend = session.client('comprehend')
+        comprehend = rate_limited_client(session, 'comprehend')
         
         # List document classifiers
         try:
-            classifiers = comprehend.list_document_classifiers()
-            for classifier in classifiers.get('DocumentClassifierPropertiesList', []):
+            for classifier in iter_items(comprehend, 'list_document_classifiers', 'DocumentClassifierPropertiesList'):
                 resources.append({
                     'type': 'document_classifier',
                     'name': classifier.get('DocumentClassifierArn', '').split('/')[-1],
@@ -314,13 +619,12 @@ class EnhancedAIDiscovery:
                     'status': classifier['Status'],
                     'project': self._identify_project(classifier.get('DocumentClassifierArn', ''))
                 })
-        except:
-            pass
+        except Exception as e:
+            record_listing_error('list_document_classifiers', e)
         
         # List entity recognizers
         try:
-            recognizers = comprehend.list_entity_recognizers()
-            for recognizer in recognizers.get('EntityRecognizerPropertiesList', []):
+            for recognizer in iter_items(comprehend, 'list_entity_recognizers', 'EntityRecognizerPropertiesList'):
                 resources.append({
                     'type': 'entity_recognizer',
                     'name': recognizer.get('EntityRecognizerArn', '').split('/')[-1],
@@ -328,8 +632,8 @@ class EnhancedAIDiscovery:
                     'status': recognizer['Status'],
                     'project': self._identify_project(recognizer.get('EntityRecognizerArn', ''))
                 })
-        except:
-            pass
+        except Exception as e:
+            record_listing_error('list_entity_recognizers', e)
         
         return resources
     
@@ -344,33 +648,31 @@ class EnhancedAIDiscovery:
     def discover_rekognition(self, session: boto3.Session) -> List[Dict]:
         """Discover Rekognition resources"""
         resources = []
-        rekognition = session.client('rekognition')
+        rekognition = rate_limited_client(session, 'rekognition')
         
         # List collections
         try:
-            collections = rekognition.list_collections()
-            for collection_id in collections.get('CollectionIds', []):
+            for collection_id in iter_items(rekognition, 'list_collections', 'CollectionIds'):
                 resources.append({
                     'type': 'collection',
                     'name': collection_id,
                     'id': collection_id,
                     'project': self._identify_project(collection_id)
                 })
-        except:
-            pass
+        except Exception as e:
+            record_listing_error('list_collections', e)
         
         # List stream processors
         try:
-            processors = rekognition.list_stream_processors()
-            for processor in processors.get('StreamProcessors', []):
+            for processor in iter_items(rekognition, 'list_stream_processors', 'StreamProcessors'):
                 resources.append({
                     'type': 'stream_processor',
                     'name': processor['Name'],
                     'status': processor.get('Status', 'Unknown'),
                     'project': self._identify_project(processor['Name'])
                 })
-        except:
-            pass
+        except Exception as e:
+            record_listing_error('list_stream_processors', e)
         
         return resources
     
@@ -378,20 +680,19 @@ class EnhancedAIDiscovery:
     def discover_polly(self, session: boto3.Session) -> List[Dict]:
         """Discover Polly resources"""
         resources = []
-        polly = session.client('polly')
+        polly = rate_limited_client(session, 'polly')
         
         # List lexicons
         try:
-            lexicons = polly.list_lexicons()
-            for lexicon in lexicons.get('Lexicons', []):
+            for lexicon in iter_items(polly, 'list_lexicons', 'Lexicons'):
                 resources.append({
                     'type': 'lexicon',
                     'name': lexicon['Name'],
                     'language': lexicon.get('LanguageCode', 'Unknown'),
                     'project': self._identify_project(lexicon['Name'])
                 })
-        except:
-            pass
+        except Exception as e:
+            record_listing_error('list_lexicons', e)
         
         return resources
     
@@ -399,12 +700,11 @@ class EnhancedAIDiscovery:
     def discover_transcribe(self, session: boto3.Session) -> List[Dict]:
         """Discover Transcribe resources"""
         resources = []
-        transcribe = session.client('transcribe')
+        transcribe = rate_limited_client(session, 'transcribe')
         
         # List vocabularies
         try:
-            vocabularies = transcribe.list_vocabularies()
-            for vocab in vocabularies.get('Vocabularies', []):
+            for vocab in iter_items(transcribe, 'list_vocabularies', 'Vocabularies'):
                 resources.append({
                     'type': 'vocabulary',
                     'name': vocab['VocabularyName'],
@@ -412,13 +712,12 @@ class EnhancedAIDiscovery:
                     'state': vocab['VocabularyState'],
                     'project': self._identify_project(vocab['VocabularyName'])
                 })
-        except:
-            pass
+        except Exception as e:
+            record_listing_error('list_vocabularies', e)
         
         # List language models
         try:
-            models = transcribe.list_language_models()
-            for model in models.get('Models', []):
+            for model in iter_items(transcribe, 'list_language_models', 'Models'):
                 resources.append({
                     'type': 'language_model',
                     'name': model['ModelName'],
@@ -426,8 +725,8 @@ class EnhancedAIDiscovery:
                     'status': model['ModelStatus'],
                     'project': self._identify_project(model['ModelName'])
                 })
-        except:
-            pass
+        except Exception as e:
+            record_listing_error('list_language_models', e)
         
         return resources
     
@@ -435,12 +734,11 @@ class EnhancedAIDiscovery:
     def discover_translate(self, session: boto3.Session) -> List[Dict]:
         """Discover Translate resources"""
         resources = []
-        translate = session.client('translate')
+        translate = rate_limited_client(session, 'translate')
         
         # List terminologies
         try:
-            terminologies = translate.list_terminologies()
-            for term in terminologies.get('TerminologyPropertiesList', []):
+            for term in iter_items(translate, 'list_terminologies', 'TerminologyPropertiesList'):
                 resources.append({
                     'type': 'terminology',
                     'name': term['Name'],
@@ -448,8 +746,8 @@ class EnhancedAIDiscovery:
                     'source_language': term.get('SourceLanguageCode', 'Unknown'),
                     'project': self._identify_project(term['Name'])
                 })
-        except:
-            pass
+        except Exception as e:
+            record_listing_error('list_terminologies', e)
         
         return resources
     
@@ -457,12 +755,11 @@ class EnhancedAIDiscovery:
     def discover_forecast(self, session: boto3.Session) -> List[Dict]:
         """Discover Forecast resources"""
         resources = []
-        forecast = session.client('forecast')
+        forecast = rate_limited_client(session, 'forecast')
         
         # List datasets
         try:
-            datasets = forecast.list_datasets()
-            for dataset in datasets.get('Datasets', []):
+            for dataset in iter_items(forecast, 'list_datasets', 'Datasets'):
                 resources.append({
                     'type': 'dataset',
                     'name': dataset['DatasetName'],
@@ -470,13 +767,12 @@ class EnhancedAIDiscovery:
                     'domain': dataset.get('Domain', 'Unknown'),
                     'project': self._identify_project(dataset['DatasetName'])
                 })
-        except:
-            pass
+        except Exception as e:
+            record_listing_error('list_datasets', e)
         
         # List predictors
         try:
-            predictors = forecast.list_predictors()
-            for predictor in predictors.get('Predictors', []):
+            for predictor in iter_items(forecast, 'list_predictors', 'Predictors'):
                 resources.append({
                     'type': 'predictor',
                     'name': predictor['PredictorName'],
@@ -484,8 +780,8 @@ class EnhancedAIDiscovery:
                     'status': predictor.get('Status', 'Unknown'),
                     'project': self._identify_project(predictor['PredictorName'])
                 })
-        except:
-            pass
+        except Exception as e:
+            record_listing_error('list_predictors', e)
         
         return resources
     
@@ -493,12 +789,11 @@ class EnhancedAIDiscovery:
     def discover_personalize(self, session: boto3.Session) -> List[Dict]:
         """Discover Personalize resources"""
         resources = []
-        personalize = session.client('personalize')
+        personalize = rate_limited_client(session, 'personalize')
         
         # List dataset groups
         try:
-            dataset_groups = personalize.list_dataset_groups()
-            for group in dataset_groups.get('datasetGroups', []):
+            for group in iter_items(personalize, 'list_dataset_groups', 'datasetGroups'):
                 resources.append({
                     'type': 'dataset_group',
                     'name': group['name'],
@@ -506,13 +801,12 @@ class EnhancedAIDiscovery:
                     'status': group['status'],
                     'project': self._identify_project(group['name'])
                 })
-        except:
-            pass
+        except Exception as e:
+            record_listing_error('list_dataset_groups', e)
         
         # List campaigns
         try:
-            campaigns = personalize.list_campaigns()
-            for campaign in campaigns.get('campaigns', []):
+            for campaign in iter_items(personalize, 'list_campaigns', 'campaigns'):
                 resources.append({
                     'type': 'campaign',
                     'name': campaign['name'],
@@ -520,8 +814,8 @@ class EnhancedAIDiscovery:
                     'status': campaign['status'],
                     'project': self._identify_project(campaign['name'])
                 })
-        except:
-            pass
+        except Exception as e:
+            record_listing_error('list_campaigns', e)
         
         return resources
     
@@ -529,12 +823,11 @@ class EnhancedAIDiscovery:
     def discover_lex(self, session: boto3.Session) -> List[Dict]:
         """Discover Lex resources"""
         resources = []
-        lex = session.client('lexv2-models')
+        lex = rate_limited_client(session, 'lexv2-models')
         
         # List bots
         try:
-            bots = lex.list_bots()
-            for bot in bots.get('botSummaries', []):
+            for bot in iter_items(lex, 'list_bots', 'botSummaries'):
                 resources.append({
                     'type': 'bot',
                     'name': bot['botName'],
@@ -542,8 +835,8 @@ class EnhancedAIDiscovery:
                     'status': bot['botStatus'],
                     'project': self._identify_project(bot['botName'])
                 })
-        except:
-            pass
+        except Exception as e:
+            record_listing_error('list_bots', e)
         
         return resources
     
@@ -551,16 +844,20 @@ class EnhancedAIDiscovery:
     def discover_kendra(self, session: boto3.Session) -> List[Dict]:
         """Discover Kendra resources"""
         resources = []
-        kendra = session.client('kendra')
+        kendra = rate_limited_client(session, 'kendra')
+        tag_index = get_tag_index(session)
         
         # List indexes
         try:
-            indexes = kendra.list_indices()
-            for index in indexes.get('IndexConfigurationSummaryItems', []):
-                tags = self._get_resource_tags(
+            account_id = None
+            for index in iter_items(kendra, 'list_indices', 'IndexConfigurationSummaryItems'):
+                if account_id is None:
+                    account_id = account_id_for(session)
+                index_arn = f"arn:aws:kendra:{session.region_name}:{account_id}:index/{index['Id']}"
+                tags = tag_index.lookup(index_arn, lambda: self._get_resource_tags(
                     kendra, 'list_tags_for_resource',
-                    ResourceARN=f"arn:aws:kendra:{session.region_name}:{session.client('sts').get_caller_identity()['Account']}:index/{index['Id']}"
-                )
+                    ResourceARN=index_arn
+                ))
                 resources.append({
                     'type': 'index',
                     'name': index['Name'],
@@ -569,158 +866,166 @@ class EnhancedAIDiscovery:
                     'created': index['CreatedAt'].isoformat(),
                     'project': self._identify_project(index['Name'], tags)
                 })
-        except:
-            pass
+        except Exception as e:
+            record_listing_error('list_indices', e)
         
         return resources
     
     # Traditional resource discovery with AI patterns
     def discover_lambda_ai_resources(self, session: boto3.Session) -> List[Dict]:
         """Discover AI-related Lambda functions"""
-        lambda_client = session.client('lambda')
+        lambda_client = rate_limited_client(session, 'lambda')
+        snapshot = open_snapshot(session, 'lambda')
         ai_functions = []
         
-        # AI patterns for Lambda functions
-        ai_patterns = [
-            r'.*-ai-.*', r'.*ask-eva.*', r'.*iep.*', r'.*resume-.*',
-            r'.*knockout.*', r'.*scoring.*', r'.*financial-aid.*',
-            r'sa-ai-.*', r'.*querykb.*', r'.*bedrock.*', r'.*sagemaker.*',
-            r'.*comprehend.*', r'.*textract.*', r'.*rekognition.*'
-        ]
-        
         try:
-            paginator = lambda_client.get_paginator('list_functions')
-            
-            for page in paginator.paginate():
+            for page in iter_pages(lambda_client, 'list_functions'):
                 for function in page.get('Functions', []):
                     function_name = function['FunctionName']
                     
                     # Check if it matches AI patterns
-                    is_ai = False
-                    for pattern in ai_patterns:
-                        if re.match(pattern, function_name.lower()):
-                            is_ai = True
-                            break
-                    
+                    is_ai, matched_pattern = LAMBDA_AI_MATCHER.classify(function_name)
                     if is_ai:
-                        # Get tags
-                        tags = {}
-                        try:
-                            tag_response = lambda_client.list_tags(Resource=function['FunctionArn'])
-                            tags = tag_response.get('Tags', {})
-                        except:
-                            pass
+                        function_arn = function['FunctionArn']
+                        function_fingerprint = fingerprint(function.get('LastModified'), function.get('CodeSha256'))
+                        
+                        # Unchanged functions keep the tags fetched last time
+                        previous = snapshot.reuse(function_arn, function_fingerprint)
+                        if previous:
+                            details, tags = previous
+                        else:
+                            tags = get_tag_index(session).lookup(
+                                function_arn,
+                                lambda: lambda_client.list_tags(Resource=function_arn).get('Tags', {})
+                            )
+                            details = {
+                                'type': 'function',
+                                'name': function_name,
+                                'arn': function_arn,
+                                'runtime': function.get('Runtime', 'Unknown'),
+                                'memory': function.get('MemorySize', 0),
+                                'timeout': function.get('Timeout', 0),
+                                'last_modified': function.get('LastModified', '')
+                            }
+                        snapshot.record(function_arn, function_fingerprint, details, tags)
                         
                         ai_functions.append({
-                            'type': 'function',
-                            'name': function_name,
-                            'arn': function['FunctionArn'],
-                            'runtime': function.get('Runtime', 'Unknown'),
-                            'memory': function.get('MemorySize', 0),
-                            'timeout': function.get('Timeout', 0),
-                            'last_modified': function.get('LastModified', ''),
+                            **details,
+                            'matched_pattern': matched_pattern,
                             'project': self._identify_project(function_name, tags)
                         })
+            if listing_complete():
+                snapshot.commit()
         except Exception as e:
             console.print(f"[yellow]Warning: Could not list Lambda functions: {e}[/yellow]")
+            record_listing_error('list_functions', e)
         
         return ai_functions
     
     def discover_s3_ai_resources(self, session: boto3.Session) -> List[Dict]:
         """Discover AI-related S3 buckets"""
-        s3_client = session.client('s3')
+        s3_client = rate_limited_client(session, 's3')
+        snapshot = open_snapshot(session, 's3')
         ai_buckets = []
         
-        # AI patterns for S3 buckets
-        ai_patterns = [
-            r'sa-ai-.*', r'.*-ai-.*', r'.*-modeltraining.*',
-            r'.*modeltraining.*', r'.*ask-eva.*', r'.*resume-.*',
-            r'.*iep.*', r'.*sagemaker.*', r'.*bedrock.*'
-        ]
-        
         try:
-            response = s3_client.list_buckets()
-            
-            for bucket in response.get('Buckets', []):
+            for bucket in iter_items(s3_client, 'list_buckets', 'Buckets'):
                 bucket_name = bucket['Name']
                 
                 # Check if it matches AI patterns
-                is_ai = False
-                for pattern in ai_patterns:
-                    if re.match(pattern, bucket_name.lower()):
-                        is_ai = True
-                        break
-                
+                is_ai, matched_pattern = S3_AI_MATCHER.classify(bucket_name)
                 if is_ai:
-                    # Get bucket tags
-                    tags = {}
-                    try:
-                        tag_response = s3_client.get_bucket_tagging(Bucket=bucket_name)
-                        tags = {tag['Key']: tag['Value'] for tag in tag_response.get('TagSet', [])}
-                    except:
-                        pass
+                    # A deleted and recreated bucket gets a new creation date
+                    bucket_fingerprint = fingerprint(bucket['CreationDate'].isoformat())
+                    previous = snapshot.reuse(bucket_name, bucket_fingerprint)
+                    if previous:
+                        details, tags = previous
+                    else:
+                        tags = get_tag_index(session).lookup(
+                            f"arn:aws:s3:::{bucket_name}",
+                            lambda: tag_list_to_dict(s3_client.get_bucket_tagging(Bucket=bucket_name).get('TagSet', [])),
+                            region=bucket.get('BucketRegion')
+                        )
+                        details = {
+                            'type': 'bucket',
+                            'name': bucket_name,
+                            'created': bucket['CreationDate'].isoformat()
+                        }
+                    snapshot.record(bucket_name, bucket_fingerprint, details, tags)
                     
                     ai_buckets.append({
-                        'type': 'bucket',
-                        'name': bucket_name,
-                        'created': bucket['CreationDate'].isoformat(),
+                        **details,
+                        'matched_pattern': matched_pattern,
                         'project': self._identify_project(bucket_name, tags)
                     })
+            if listing_complete():
+                snapshot.commit()
         except Exception as e:
             console.print(f"[yellow]Warning: Could not list S3 buckets: {e}[/yellow]")
+            record_listing_error('list_buckets', e)
         
         return ai_buckets
     
     def discover_dynamodb_ai_resources(self, session: boto3.Session) -> List[Dict]:
         """Discover AI-related DynamoDB tables"""
-        dynamodb = session.client('dynamodb')
+        dynamodb = rate_limited_client(session, 'dynamodb')
+        snapshot = open_snapshot(session, 'dynamodb')
         ai_tables = []
         
-        # AI patterns for DynamoDB tables
-        ai_patterns = [
-            r'.*_ai_.*', r'.*-ai-.*', r'.*conversation.*',
-            r'.*chat.*', r'sa_ai_.*', r'.*ask_eva.*', r'.*iep.*'
-        ]
+        def matched_tables():
+            for table_name in iter_items(dynamodb, 'list_tables', 'TableNames'):
+                # Check if it matches AI patterns
+                is_ai, matched_pattern = DYNAMODB_AI_MATCHER.classify(table_name)
+                if is_ai:
+                    # list_tables only returns names, so known tables skip describe_table
+                    table_fingerprint = fingerprint(
+                        f"arn:aws:dynamodb:{session.region_name}:{snapshot.account_id}:table/{table_name}"
+                    )
+                    yield table_name, matched_pattern, table_fingerprint, snapshot.reuse(table_name, table_fingerprint)
         
-        try:
-            paginator = dynamodb.get_paginator('list_tables')
+        def table_details(table) -> Tuple[Dict, Dict]:
+            table_name, _, _, previous = table
+            if previous:
+                return previous
             
-            for page in paginator.paginate():
-                for table_name in page.get('TableNames', []):
-                    
-                    # Check if it matches AI patterns
-                    is_ai = False
-                    for pattern in ai_patterns:
-                        if re.match(pattern, table_name.lower()):
-                            is_ai = True
-                            break
-                    
-                    if is_ai:
-                        # Get table details and tags
-                        try:
-                            table_desc = dynamodb.describe_table(TableName=table_name)
-                            table_arn = table_desc['Table']['TableArn']
-                            
-                            tags = {}
-                            try:
-                                tag_response = dynamodb.list_tags_of_resource(ResourceArn=table_arn)
-                                tags = {tag['Key']: tag['Value'] for tag in tag_response.get('Tags', [])}
-                            except:
-                                pass
-                            
-                            ai_tables.append({
-                                'type': 'table',
-                                'name': table_name,
-                                'arn': table_arn,
-                                'status': table_desc['Table']['TableStatus'],
-                                'item_count': table_desc['Table'].get('ItemCount', 0),
-                                'size_bytes': table_desc['Table'].get('TableSizeBytes', 0),
-                                'project': self._identify_project(table_name, tags)
-                            })
-                        except:
-                            pass
+            # Get table details and tags
+            table_desc = dynamodb.describe_table(TableName=table_name)['Table']
+            table_arn = table_desc['TableArn']
+            tags = get_tag_index(session).lookup(
+                table_arn,
+                lambda: tag_list_to_dict(dynamodb.list_tags_of_resource(ResourceArn=table_arn).get('Tags', []))
+            )
+            return {
+                'type': 'table',
+                'name': table_name,
+                'arn': table_arn,
+                'status': table_desc['TableStatus'],
+                'item_count': table_desc.get('ItemCount', 0),
+                'size_bytes': table_desc.get('TableSizeBytes', 0)
+            }, tags
+        
+        try:
+            # Tables are described on a worker pool while list_tables keeps paging
+            for table, result, error in map_pipelined(table_details, matched_tables()):
+                if error:
+                    # Keep the last known entry so the table is not reported as removed
+                    record_listing_error('describe_table', error)
+                    snapshot.keep(table[0])
+                    continue
+                table_name, matched_pattern, table_fingerprint, _ = table
+                details, tags = result
+                snapshot.record(table_name, table_fingerprint, details, tags)
+                
+                ai_tables.append({
+                    **details,
+                    'matched_pattern': matched_pattern,
+                    'project': self._identify_project(table_name, tags)
+                })
+            if listing_complete():
+                snapshot.commit()
         except Exception as e:
             console.print(f"[yellow]Warning: Could not list DynamoDB tables: {e}[/yellow]")
+            record_listing_error('list_tables', e)
         
         return ai_tables
     
@@ -732,6 +1037,10 @@ class EnhancedAIDiscovery:
         console.print(f"Services Found: {len(discoveries['summary']['services_found'])}")
         console.print(f"Projects Identified: {len(discoveries['summary']['projects_found'])}")
         console.print(f"Untagged Resources: {discoveries['summary']['untagged_resources']}")
+        degraded = [issue for issue in discoveries['summary'].get('errors', []) if degrades_result(issue)]
+        if degraded:
+            scans = sorted({f"{issue['service']}/{issue['region']}" for issue in degraded})
+            console.print(f"[yellow]Degraded Scans: {len(scans)} ({', '.join(scans)})[/yellow]")
         
         # Service breakdown table
         if discoveries['services']:
@@ -745,7 +1054,7 @@ class EnhancedAIDiscovery:
                 service_table.add_row(
                     service_info.get('cost_explorer_name', service_key),
                     service_info.get('category', 'Unknown'),
-                    str(service_data['count'])
+                    f"{service_data['count']} (partial)" if service_data.get('partial') else str(service_data['count'])
                 )
             
             console.print(service_table)
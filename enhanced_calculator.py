@@ -12,6 +12,10 @@ from typing import Dict, List, Optional, Tuple
 import logging
 from collections import defaultdict
 from enhanced_config import AI_SERVICE_CONFIG, COST_ALLOCATION_TAGS, AI_PROJECTS, AWS_ACCOUNTS
+from cost_explorer_cache import CachedCostExplorerClient
+from cost_explorer_fetcher import sum_costs_by_group
+from rate_limiter import rate_limited_client
+from cost_explorer_meter import metered_ce_client, QueryBudgetExceeded
 
 logger = logging.getLogger(__name__)
 
@@ -21,9 +25,12 @@ class EnhancedCostCalculator:
     def __init__(self, profile_name: Optional[str] = None):
         self.profile_name = profile_name
         self.session = self._create_session()
-        self.ce_client = self.session.client('ce', region_name='us-east-1')
-        self.organizations_client = self.session.client('organizations', region_name='us-east-1')
-        self.sts_client = self.session.client('sts')
+        self.ce_client = CachedCostExplorerClient(
+            metered_ce_client(self.session),
+            session=self.session
+        )
+        self.organizations_client = rate_limited_client(self.session, 'organizations', region_name='us-east-1')
+        self.sts_client = rate_limited_client(self.session, 'sts')
         
     def _create_session(self) -> boto3.Session:
         """Create boto3 session with profile if specified"""
@@ -111,7 +118,8 @@ class EnhancedCostCalculator:
         """Get costs for specific services with detailed breakdown"""
         try:
             # Get untagged costs
-            response = self.ce_client.get_cost_and_usage(
+            grouped_costs = sum_costs_by_group(
+                self.ce_client.get_cost_and_usage,
                 TimePeriod={'Start': start_date, 'End': end_date},
                 Granularity='MONTHLY',
                 Metrics=['UnblendedCost'],
@@ -130,16 +138,14 @@ class EnhancedCostCalculator:
             total_cost = Decimal("0")
             resources = []
             
-            for result in response['ResultsByTime']:
-                for group in result.get('Groups', []):
-                    cost = Decimal(group['Metrics']['UnblendedCost']['Amount'])
-                    if cost > 0:
-                        total_cost += cost
-                        resources.append({
-                            'usage_type': group['Keys'][0],
-                            'operation': group['Keys'][1],
-                            'cost': float(cost)
-                        })
+            for keys, cost in grouped_costs.items():
+                if cost > 0:
+                    total_cost += cost
+                    resources.append({
+                        'usage_type': keys[0],
+                        'operation': keys[1],
+                        'cost': float(cost)
+                    })
             
             # Get tagged costs if available
             tagged_costs = self._get_tagged_costs(service_codes, start_date, end_date)
@@ -160,7 +166,8 @@ class EnhancedCostCalculator:
         
         for tag in COST_ALLOCATION_TAGS:
             try:
-                response = self.ce_client.get_cost_and_usage(
+                grouped_costs = sum_costs_by_group(
+                    self.ce_client.get_cost_and_usage,
                     TimePeriod={'Start': start_date, 'End': end_date},
                     Granularity='MONTHLY',
                     Metrics=['UnblendedCost'],
@@ -174,16 +181,19 @@ class EnhancedCostCalculator:
                 )
                 
                 tag_values = {}
-                for result in response['ResultsByTime']:
-                    for group in result.get('Groups', []):
-                        tag_value = group['Keys'][0] if group['Keys'][0] else 'untagged'
-                        cost = float(group['Metrics']['UnblendedCost']['Amount'])
-                        if cost > 0:
-                            tag_values[tag_value] = tag_values.get(tag_value, 0) + cost
+                for keys, amount in grouped_costs.items():
+                    tag_value = keys[0] if keys[0] else 'untagged'
+                    cost = float(amount)
+                    if cost > 0:
+                        tag_values[tag_value] = tag_values.get(tag_value, 0) + cost
                 
                 if tag_values:
                     tagged_costs[tag] = tag_values
                     
+            except QueryBudgetExceeded as e:
+                # Tag detail is optional; keep the service totals within budget
+                logger.warning(f"Skipping remaining tag breakdowns: {e}")
+                break
             except Exception as e:
                 logger.debug(f"Could not get tagged costs for {tag}: {e}")
         
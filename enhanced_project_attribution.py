@@ -7,12 +7,41 @@ Maps resources to projects based on tags and naming patterns
 import re
 import json
 from decimal import Decimal
-from typing import Dict, List, Set
+from typing import Dict, Iterable, List, Set
 from rich.console import Console
 from rich.table import Table
 
+from pattern_matcher import GroupMatcher
+from attribution_cache import get_attribution_cache, rules_version
+from cost_allocation import allocate, from_units, to_units
+
 console = Console()
 
+PROJECT_TAG_KEYS = ('project', 'projectname', 'project-name')
+
+# AI services whose whole cost is split over the projects using them
+DIRECT_COST_SERVICES = (
+    'bedrock', 'sagemaker', 'comprehend', 'textract', 'rekognition', 'polly', 'transcribe', 'translate',
+    'forecast', 'personalize', 'lex', 'kendra'
+)
+
+# Estimated AI share of shared infrastructure services
+INFRASTRUCTURE_AI_SHARE = {
+    'lambda': Decimal('0.3'),    # 30% of Lambda is AI
+    's3': Decimal('0.2'),        # 20% of S3 is AI data
+    'dynamodb': Decimal('0.25')  # 25% of DynamoDB is AI data
+}
+
+# Resource type -> project_patterns key with literal name fragments for that type
+TYPE_PATTERN_KEYS = {
+    'lambda_function': 'lambda_patterns',
+    'knowledge_base': 'knowledge_base_patterns',
+    'agent': 'agent_patterns',
+    'dynamodb_table': 'dynamodb_patterns',
+    'domain': 'opensearch_patterns',
+    'model': 'sagemaker_patterns'
+}
+
 class ProjectAttributor:
     def __init__(self):
         """Initialize with project patterns and rules"""
@@ -145,164 +174,155 @@ class ProjectAttributor:
                 'sagemaker_patterns': ['ai-image-object-detection']
             }
         }
+        self._compile_rules()
+    
+    def _compile_rules(self):
+        """Compile project_patterns into lookup tables, keeping project order as priority"""
+        self._project_ids = list(self.project_patterns)
+        self._rules_version = rules_version(self.config, self.project_patterns)
+        
+        # Tag value -> first project listing it
+        self._tag_projects = {}
+        # Exact bucket name -> rank of the first project listing it
+        self._bucket_ranks = {}
+        for rank, project_config in enumerate(self.project_patterns.values()):
+            for tag_value in project_config['tag_values']:
+                self._tag_projects.setdefault(tag_value, self._project_ids[rank])
+            for bucket_name in project_config['bucket_names']:
+                self._bucket_ranks.setdefault(bucket_name, rank)
+        
+        # One matcher per resource type: each project's regexes plus its literal patterns for that type
+        self._name_matchers = {}
+        for resource_type, patterns_key in [(None, None)] + list(TYPE_PATTERN_KEYS.items()):
+            self._name_matchers[resource_type] = GroupMatcher([
+                list(project_config['patterns']) +
+                [re.escape(literal) for literal in project_config.get(patterns_key, [])]
+                for project_config in self.project_patterns.values()
+            ])
     
     def identify_project(self, resource: Dict) -> str:
         """Identify which project a resource belongs to"""
+        # Only project tags take part in attribution, so other tags do not split cache entries
+        project_tags = tuple(
+            (tag_key, tag_value) for tag_key, tag_value in (resource.get('tags') or {}).items()
+            if tag_key.lower() in PROJECT_TAG_KEYS
+        )
+        resource_name = resource.get('name', '') or resource.get('arn', '')
+        resource_type = resource.get('type')
+        return get_attribution_cache().get_or_compute(
+            ('project_attributor', self._rules_version, resource_type, resource_name, project_tags),
+            lambda: self._evaluate_rules(resource_type, resource_name, project_tags)
+        )
+    
+    def _evaluate_rules(self, resource_type: str, resource_name: str, project_tags: tuple) -> str:
         # Check tags first (most reliable)
-        if 'tags' in resource and resource['tags']:
-            for tag_key, tag_value in resource['tags'].items():
-                if tag_key.lower() in ['project', 'projectname', 'project-name']:
-                    # Direct tag match
-                    for project_id, project_config in self.project_patterns.items():
-                        if tag_value in project_config['tag_values']:
-                            return project_id
+        for _, tag_value in project_tags:
+            # Direct tag match
+            project_id = self._tag_projects.get(tag_value)
+            if project_id is not None:
+                return project_id
         
-        # Check resource name/ARN patterns
-        resource_name = resource.get('name', '') or resource.get('arn', '')
-        resource_name_lower = resource_name.lower()
+        # Check resource name/ARN patterns, earliest project first
+        matcher = self._name_matchers.get(resource_type, self._name_matchers[None])
+        rank = matcher.first(resource_name.lower())
         
-        for project_id, project_config in self.project_patterns.items():
-            # Check regex patterns
-            for pattern in project_config['patterns']:
-                if re.search(pattern, resource_name_lower):
-                    return project_id
-            
-            # Check specific bucket names
-            if resource.get('type') == 's3_bucket':
-                bucket_name = resource.get('name', '')
-                if bucket_name in project_config['bucket_names']:
-                    return project_id
-            
-            # Check Lambda function patterns
-            if resource.get('type') == 'lambda_function':
-                for lambda_pattern in project_config['lambda_patterns']:
-                    if lambda_pattern in resource_name_lower:
-                        return project_id
-            
-            # Check Bedrock knowledge base patterns
-            if resource.get('type') == 'knowledge_base' and 'knowledge_base_patterns' in project_config:
-                for kb_pattern in project_config['knowledge_base_patterns']:
-                    if kb_pattern in resource_name_lower:
-                        return project_id
-            
-            # Check Bedrock agent patterns
-            if resource.get('type') == 'agent' and 'agent_patterns' in project_config:
-                for agent_pattern in project_config['agent_patterns']:
-                    if agent_pattern in resource_name_lower:
-                        return project_id
-            
-            # Check DynamoDB table patterns
-            if resource.get('type') == 'dynamodb_table' and 'dynamodb_patterns' in project_config:
-                for db_pattern in project_config['dynamodb_patterns']:
-                    if db_pattern in resource_name_lower:
-                        return project_id
-            
-            # Check OpenSearch domain patterns
-            if resource.get('type') == 'domain' and 'opensearch_patterns' in project_config:
-                for os_pattern in project_config['opensearch_patterns']:
-                    if os_pattern in resource_name_lower:
-                        return project_id
-            
-            # Check SageMaker model patterns
-            if resource.get('type') == 'model' and 'sagemaker_patterns' in project_config:
-                for sm_pattern in project_config['sagemaker_patterns']:
-                    if sm_pattern in resource_name_lower:
-                        return project_id
+        # Check specific bucket names
+        if resource_type == 's3_bucket':
+            bucket_rank = self._bucket_ranks.get(resource_name)
+            if bucket_rank is not None and (rank is None or bucket_rank < rank):
+                rank = bucket_rank
         
-        return 'unattributed'
+        return 'unattributed' if rank is None else self._project_ids[rank]
     
-    def attribute_costs_to_projects(self, discovered_resources: Dict, service_costs: Dict) -> Dict:
-        """Attribute costs to projects based on resource discovery"""
+    def begin_attribution(self) -> Dict:
+        """Empty attribution state for add_resource / finish_attribution"""
         project_costs = {
-            'ask-eva': {'total': Decimal('0'), 'services': {}, 'resources': []},
-            'iep-report': {'total': Decimal('0'), 'services': {}, 'resources': []},
-            'resume-knockout': {'total': Decimal('0'), 'services': {}, 'resources': []},
-            'resume-scoring': {'total': Decimal('0'), 'services': {}, 'resources': []},
-            'financial-aid': {'total': Decimal('0'), 'services': {}, 'resources': []},
-            'parent-app': {'total': Decimal('0'), 'services': {}, 'resources': []},
-            'sales-force': {'total': Decimal('0'), 'services': {}, 'resources': []},
-            'professional-development': {'total': Decimal('0'), 'services': {}, 'resources': []},
-            'infrastructure': {'total': Decimal('0'), 'services': {}, 'resources': []},
-            'unattributed': {'total': Decimal('0'), 'services': {}, 'resources': []}
+            project: {'total': Decimal('0'), 'services': {}, 'resources': []}
+            for project in list(self.project_patterns) + ['unattributed']
+        }
+        return {
+            'project_costs': project_costs,
+            'resource_counts': {p: {} for p in project_costs.keys()}
         }
+    
+    def add_resource(self, attribution: Dict, service: str, resource: Dict) -> str:
+        """Assign one discovered resource to a project and count it; returns the project"""
+        project = self.identify_project(resource)
+        project_resource_counts = attribution['resource_counts']
         
-        # Map each resource to a project
-        resource_to_project = {}
-        project_resource_counts = {p: {} for p in project_costs.keys()}
+        # Count resources by type for each project
+        if service not in project_resource_counts[project]:
+            project_resource_counts[project][service] = 0
+        project_resource_counts[project][service] += 1
         
+        # Track resource details
+        attribution['project_costs'][project]['resources'].append({
+            'service': service,
+            'name': resource.get('name', 'unknown'),
+            'type': resource.get('type', service)
+        })
+        return project
+    
+    def attribute_costs_to_projects(self, discovered_resources: Dict, service_costs: Dict) -> Dict:
+        """Attribute costs to projects based on resource discovery"""
+        attribution = self.begin_attribution()
+        
+        # Map each resource to a project
         for service, service_data in discovered_resources.items():
             if 'resources' in service_data:
                 for resource in service_data['resources']:
-                    project = self.identify_project(resource)
-                    resource_id = resource.get('arn', resource.get('name', 'unknown'))
-                    resource_to_project[resource_id] = project
-                    
-                    # Count resources by type for each project
-                    if service not in project_resource_counts[project]:
-                        project_resource_counts[project][service] = 0
-                    project_resource_counts[project][service] += 1
-                    
-                    # Track resource details
-                    project_costs[project]['resources'].append({
-                        'service': service,
-                        'name': resource.get('name', 'unknown'),
-                        'type': resource.get('type', service)
-                    })
+                    self.add_resource(attribution, service, resource)
         
-        # Distribute costs based on resource allocation
+        return self.finish_attribution(attribution, service_costs)
+    
+    def attribute_costs_from_events(self, events: Iterable[Dict], service_costs: Dict) -> Dict:
+        """Attribute costs while consuming EnhancedAIDiscovery.iter_ai_resources events"""
+        attribution = self.begin_attribution()
+        for event in events:
+            if event.get('event') == 'resource':
+                self.add_resource(attribution, event['service'], event['resource'])
+        return self.finish_attribution(attribution, service_costs)
+    
+    def finish_attribution(self, attribution: Dict, service_costs: Dict) -> Dict:
+        """Distribute service costs over the projects counted so far
+        
+        All services are allocated at once over a project x service count
+        matrix in fixed-point units, so each service's project shares add up
+        exactly to the cost allocated for it.
+        """
+        project_costs = attribution['project_costs']
+        project_resource_counts = attribution['resource_counts']
+        projects = list(project_costs.keys())
+        
+        allocated_services = []
+        amounts = []
         for service, cost in service_costs.items():
-            if cost > 0:
-                # For AI services with direct costs
-                if service in ['bedrock', 'sagemaker', 'comprehend', 'textract', 
-                              'rekognition', 'polly', 'transcribe', 'translate',
-                              'forecast', 'personalize', 'lex', 'kendra']:
-                    
-                    # Count total resources for this service
-                    total_resources = sum(
-                        project_resource_counts[p].get(service, 0) 
-                        for p in project_costs.keys()
-                    )
-                    
-                    if total_resources > 0:
-                        # Distribute cost proportionally
-                        for project in project_costs.keys():
-                            resource_count = project_resource_counts[project].get(service, 0)
-                            if resource_count > 0:
-                                project_share = cost * Decimal(resource_count) / Decimal(total_resources)
-                                project_costs[project]['total'] += project_share
-                                project_costs[project]['services'][service] = project_share
-                    else:
-                        # No resources found, add to unattributed
-                        project_costs['unattributed']['total'] += cost
-                        project_costs['unattributed']['services'][service] = cost
-                
-                # For infrastructure services (Lambda, S3, DynamoDB)
-                elif service in ['lambda', 's3', 'dynamodb']:
-                    # These need special handling based on the specific resources
-                    total_resources = sum(
-                        project_resource_counts[p].get(service, 0) 
-                        for p in project_costs.keys()
-                    )
-                    
-                    if total_resources > 0:
-                        for project in project_costs.keys():
-                            resource_count = project_resource_counts[project].get(service, 0)
-                            if resource_count > 0:
-                                # Apply AI workload percentage estimate
-                                ai_percentage = {
-                                    'lambda': Decimal('0.3'),  # 30% of Lambda is AI
-                                    's3': Decimal('0.2'),      # 20% of S3 is AI data
-                                    'dynamodb': Decimal('0.25') # 25% of DynamoDB is AI data
-                                }.get(service, Decimal('0.1'))
-                                
-                                project_share = cost * ai_percentage * Decimal(resource_count) / Decimal(total_resources)
-                                project_costs[project]['total'] += project_share
-                                project_costs[project]['services'][service] = project_share
-                    else:
-                        # Add small portion to unattributed
-                        unattributed_share = cost * Decimal('0.1')  # 10% unattributed
-                        project_costs['unattributed']['total'] += unattributed_share
-                        project_costs['unattributed']['services'][service] = unattributed_share
+            if cost > 0 and (service in DIRECT_COST_SERVICES or service in INFRASTRUCTURE_AI_SHARE):
+                cost = cost if isinstance(cost, Decimal) else Decimal(str(cost))
+                total_resources = sum(project_resource_counts[p].get(service, 0) for p in projects)
+                if total_resources > 0:
+                    allocated_services.append(service)
+                    # Infrastructure services only count their estimated AI workload share
+                    amounts.append(to_units(cost * INFRASTRUCTURE_AI_SHARE.get(service, Decimal('1'))))
+                elif service in DIRECT_COST_SERVICES:
+                    # No resources found, add to unattributed
+                    project_costs['unattributed']['total'] += cost
+                    project_costs['unattributed']['services'][service] = cost
+                else:
+                    # Add small portion to unattributed
+                    unattributed_share = cost * Decimal('0.1')  # 10% unattributed
+                    project_costs['unattributed']['total'] += unattributed_share
+                    project_costs['unattributed']['services'][service] = unattributed_share
+        
+        # Distribute costs based on resource allocation
+        counts = [[project_resource_counts[p].get(service, 0) for service in allocated_services] for p in projects]
+        shares = allocate(counts, amounts)
+        for project, project_counts, project_shares in zip(projects, counts, shares):
+            for service, resource_count, units in zip(allocated_services, project_counts, project_shares):
+                if resource_count > 0:
+                    project_share = from_units(units)
+                    project_costs[project]['total'] += project_share
+                    project_costs[project]['services'][service] = project_share
         
         return project_costs
     
@@ -19,37 +19,47 @@ from rich.columns import Columns
 
 from sso_auth import SSOAuthenticator
 from enhanced_ai_discovery import EnhancedAIDiscovery
+from cost_explorer_cache import CachedCostExplorerClient
+from cost_explorer_fetcher import iter_cost_groups, sum_total_cost, sum_costs_by_group
+from cost_explorer_meter import metered_ce_client, QueryBudgetExceeded
+from cost_ingestion import IncrementalCostIngestor, account_breakdown_request
+from cost_warehouse import get_default_warehouse
+from account_executor import live_progress_enabled
+from resource_record import ResourceRecord
+from client_pool import pooled_client
 
 console = Console()
 
 class EnhancedSSOCostCalculator:
-    def __init__(self):
+    def __init__(self, use_grouped_queries: bool = True, use_incremental_ingestion: bool = None):
         self.authenticator = SSOAuthenticator()
         self.discovery = EnhancedAIDiscovery()
         self.cost_data = {}
         self.discovered_resources = []
         
+        # Answer every per-service figure from one grouped Cost Explorer query per account
+        # instead of one query per service
+        self.use_grouped_queries = use_grouped_queries
+        
+        # Keep daily account breakdowns locally and only fetch days after the last settled one
+        if use_incremental_ingestion is None:
+            use_incremental_ingestion = os.environ.get('COST_INGESTION_MODE', '').lower() == 'incremental'
+        self.use_incremental_ingestion = use_incremental_ingestion
+        
         # Load AI services configuration
         with open('ai_services_config.json', 'r') as f:
             self.config = json.load(f)
         
     def calculate_costs_for_resources(self, session: boto3.Session, account_name: str, 
                                     discovered: Dict, start_date: str = None, end_date: str = None,
-                                    additional_services: List[str] = None) -> Dict:
-        """Calculate costs for discovered AI resources"""
-        ce_client = session.client('ce', region_name='us-east-1')
+                                    additional_services: List[str] = None,
+                                    breakdown: Optional[Dict] = None) -> Dict:
+        """Calculate costs for discovered AI resources
         
-        # Use provided dates or default to current month
-        if not start_date or not end_date:
-            today = datetime.now()
-            start_date = today.replace(day=1).strftime('%Y-%m-%d')
-            display_end_date = today.strftime('%Y-%m-%d')
-            ce_end_date = (today + timedelta(days=1)).strftime('%Y-%m-%d')
-        else:
-            # AWS Cost Explorer needs the day after the end date
-            display_end_date = end_date
-            end_date_obj = datetime.strptime(end_date, '%Y-%m-%d')
-            ce_end_date = (end_date_obj + timedelta(days=1)).strftime('%Y-%m-%d')
+        When a precomputed breakdown is given (e.g. from calculate_org_costs), no
+        Cost Explorer or STS calls are made and session may be None.
+        """
+        start_date, display_end_date, ce_end_date = self._resolve_period(start_date, end_date)
         
         costs = {
             'account': account_name,
@@ -60,21 +70,41 @@ class EnhancedSSOCostCalculator:
             'service_details': {}
         }
         
-        # Get account ID from session
-        try:
-            sts = session.client('sts')
-            account_id = sts.get_caller_identity()['Account']
-        except:
-            console.print(f"[yellow]Warning: Could not get account ID for {account_name}[/yellow]")
-            return costs
+        ce_client = None
+        account_id = None
+        if breakdown is None:
+            # Get account ID from session
+            try:
+                sts = pooled_client(session, 'sts')
+                account_id = sts.get_caller_identity()['Account']
+            except:
+                console.print(f"[yellow]Warning: Could not get account ID for {account_name}[/yellow]")
+                return costs
+            
+            ce_client = CachedCostExplorerClient(
+                metered_ce_client(session),
+                account_id=account_id
+            )
         
         # Calculate costs for each service type
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
-            console=console
+            console=console,
+            disable=not live_progress_enabled()
         ) as progress:
             
+            # Fetch the whole account breakdown up front; None falls back to per-service queries
+            if breakdown is None and self.use_grouped_queries:
+                task = progress.add_task(
+                    f"[cyan]Fetching cost breakdown for {account_name}...", 
+                    total=None
+                )
+                breakdown = self._get_account_cost_breakdown(
+                    ce_client, start_date, ce_end_date, account_id
+                )
+                progress.update(task, completed=True)
+            
             # Calculate costs for each discovered AI service
             for service_key, service_data in discovered.get('services', {}).items():
                 if service_key in self.config['ai_services']:
@@ -84,9 +114,9 @@ class EnhancedSSOCostCalculator:
                         total=None
                     )
                     
-                    service_cost = self._calculate_ai_service_costs(
+                    service_cost = self._get_service_total(
                         ce_client, service_info['cost_explorer_name'], 
-                        start_date, ce_end_date, account_id
+                        start_date, ce_end_date, account_id, breakdown
                     )
                     
                     if service_cost > 0:
@@ -113,17 +143,17 @@ class EnhancedSSOCostCalculator:
                     if service_key == 'lambda':
                         service_cost = self._calculate_lambda_costs(
                             ce_client, service_data.get('resources', []),
-                            start_date, ce_end_date, account_id
+                            start_date, ce_end_date, account_id, breakdown
                         )
                     elif service_key == 's3':
                         service_cost = self._calculate_s3_costs(
                             ce_client, service_data.get('resources', []),
-                            start_date, ce_end_date, account_id
+                            start_date, ce_end_date, account_id, breakdown
                         )
                     elif service_key == 'dynamodb':
                         service_cost = self._calculate_dynamodb_costs(
                             ce_client, service_data.get('resources', []),
-                            start_date, ce_end_date, account_id
+                            start_date, ce_end_date, account_id, breakdown
                         )
                     
                     if service_cost > 0:
@@ -144,11 +174,181 @@ class EnhancedSSOCostCalculator:
         
         return costs
     
+    def calculate_org_costs(self, session: boto3.Session, accounts: List[Dict],
+                            discoveries: List[Dict], start_date: str = None,
+                            end_date: str = None) -> Optional[List[Dict]]:
+        """Calculate costs for many linked accounts from the management (payer) account
+        
+        Issues one paginated query grouped by LINKED_ACCOUNT and SERVICE instead of
+        assuming a role in every account. Returns None if the query is not possible
+        (e.g. the session is not the management account) so callers can fall back.
+        discoveries[i] must be the discovery of accounts[i].
+        """
+        if len(accounts) != len(discoveries):
+            raise ValueError("calculate_org_costs needs one discovery per account")
+        start_date_resolved, _, ce_end_date = self._resolve_period(start_date, end_date)
+        ce_client = CachedCostExplorerClient(
+            metered_ce_client(session),
+            session=session
+        )
+        
+        account_ids = [account['accountId'] for account in accounts]
+        breakdowns = self._get_org_cost_breakdowns(
+            ce_client, start_date_resolved, ce_end_date, account_ids
+        )
+        if breakdowns is None:
+            return None
+        
+        all_costs = []
+        for account, discovered in zip(accounts, discoveries):
+            account_name = account.get('accountName', account['accountId'])
+            breakdown = breakdowns.get(account['accountId'], {'services': {}, 'usage_types': {}})
+            all_costs.append(self.calculate_costs_for_resources(
+                None, account_name, discovered, start_date, end_date,
+                breakdown=breakdown
+            ))
+        
+        return all_costs
+    
+    def get_historical_costs(self, start_date: str, end_date: str, group_by: List[str] = None,
+                             account_ids: List[str] = None) -> List[Dict]:
+        """Answer a date range from the local cost warehouse without calling AWS
+        
+        end_date is inclusive, as everywhere else in the calculators and the
+        web interface. Only days already ingested (COST_INGESTION_MODE=incremental)
+        are included.
+        """
+        start_date, _, ce_end_date = self._resolve_period(start_date, end_date)
+        return get_default_warehouse().query_costs(
+            start_date, ce_end_date, group_by=group_by or ['account_id', 'service'],
+            account_ids=account_ids
+        )
+    
+    def _resolve_period(self, start_date: str = None, end_date: str = None) -> Tuple[str, str, str]:
+        """Return (start, display end, Cost Explorer end) for a requested period"""
+        # Use provided dates or default to current month
+        if not start_date or not end_date:
+            today = datetime.now()
+            start_date = today.replace(day=1).strftime('%Y-%m-%d')
+            display_end_date = today.strftime('%Y-%m-%d')
+            ce_end_date = (today + timedelta(days=1)).strftime('%Y-%m-%d')
+        else:
+            # AWS Cost Explorer needs the day after the end date
+            display_end_date = end_date
+            end_date_obj = datetime.strptime(end_date, '%Y-%m-%d')
+            ce_end_date = (end_date_obj + timedelta(days=1)).strftime('%Y-%m-%d')
+        
+        return start_date, display_end_date, ce_end_date
+    
+    def _get_account_cost_breakdown(self, ce_client, start_date: str, end_date: str,
+                                    account_id: str) -> Optional[Dict]:
+        """Fetch all service and usage type costs for an account in one grouped query"""
+        breakdown = {
+            'services': {},
+            'usage_types': {}
+        }
+        
+        request = account_breakdown_request(account_id)
+        request['TimePeriod'] = {'Start': start_date, 'End': end_date}
+        request['Granularity'] = 'MONTHLY'
+        
+        try:
+            if self.use_incremental_ingestion:
+                ingestor = IncrementalCostIngestor(ce_client, account_id)
+                grouped_costs = ingestor.get_totals(request, start_date, end_date).items()
+            else:
+                grouped_costs = (
+                    (keys, amount)
+                    for _, keys, amount in iter_cost_groups(ce_client.get_cost_and_usage, **request)
+                )
+            
+            for keys, amount in grouped_costs:
+                service_name, usage_type = keys
+                
+                services = breakdown['services']
+                services[service_name] = services.get(service_name, Decimal('0')) + amount
+                
+                usage_types = breakdown['usage_types'].setdefault(service_name, {})
+                usage_types[usage_type] = usage_types.get(usage_type, Decimal('0')) + amount
+            
+            return breakdown
+            
+        except QueryBudgetExceeded as e:
+            return self._get_stored_cost_breakdown(start_date, end_date, account_id, e)
+        except Exception as e:
+            console.print(f"[yellow]Warning: Could not get grouped costs, falling back to per-service queries: {str(e)}[/yellow]")
+            return None
+    
+    def _get_stored_cost_breakdown(self, start_date: str, end_date: str, account_id: str,
+                                   reason: Exception) -> Optional[Dict]:
+        """Build an account breakdown from whatever daily costs the warehouse already holds"""
+        rows = get_default_warehouse().query_costs(
+            start_date, end_date, group_by=['service', 'usage_type'], account_ids=[account_id]
+        )
+        if not rows:
+            console.print(f"[yellow]Warning: {reason}; no stored costs available for {account_id}[/yellow]")
+            return None
+        
+        console.print(f"[yellow]Warning: {reason}; using stored daily costs for {account_id}[/yellow]")
+        breakdown = {'services': {}, 'usage_types': {}}
+        for row in rows:
+            services = breakdown['services']
+            services[row['service']] = services.get(row['service'], Decimal('0')) + row['amount']
+            breakdown['usage_types'].setdefault(row['service'], {})[row['usage_type']] = row['amount']
+        return breakdown
+    
+    def _get_org_cost_breakdowns(self, ce_client, start_date: str, end_date: str,
+                                 account_ids: List[str]) -> Optional[Dict[str, Dict]]:
+        """Fetch service costs for many linked accounts, split locally by account"""
+        breakdowns = {
+            account_id: {'services': {}, 'usage_types': {}}
+            for account_id in account_ids
+        }
+        
+        # Cost Explorer allows two GroupBy keys, so USAGE_TYPE detail is not
+        # available here; S3 falls back to its estimate
+        request = {
+            'TimePeriod': {'Start': start_date, 'End': end_date},
+            'Granularity': 'MONTHLY',
+            'Metrics': ['UnblendedCost'],
+            'Filter': {'Dimensions': {'Key': 'LINKED_ACCOUNT', 'Values': account_ids}},
+            'GroupBy': [
+                {'Type': 'DIMENSION', 'Key': 'LINKED_ACCOUNT'},
+                {'Type': 'DIMENSION', 'Key': 'SERVICE'}
+            ]
+        }
+        
+        try:
+            for _, keys, amount in iter_cost_groups(ce_client.get_cost_and_usage, **request):
+                account_id, service_name = keys
+                if account_id not in breakdowns:
+                    continue
+                
+                services = breakdowns[account_id]['services']
+                services[service_name] = services.get(service_name, Decimal('0')) + amount
+            
+            return breakdowns
+            
+        except Exception as e:
+            console.print(f"[yellow]Warning: Could not get organization costs from management account: {str(e)}[/yellow]")
+            return None
+    
+    def _get_service_total(self, ce_client, service_name: str, start_date: str, end_date: str,
+                           account_id: str, breakdown: Optional[Dict] = None) -> Decimal:
+        """Get a service's total cost from the account breakdown, or query it directly"""
+        if breakdown is not None:
+            return breakdown['services'].get(service_name, Decimal('0'))
+        
+        return self._calculate_ai_service_costs(
+            ce_client, service_name, start_date, end_date, account_id
+        )
+    
     def _calculate_ai_service_costs(self, ce_client, service_name: str,
                                   start_date: str, end_date: str, account_id: str) -> Decimal:
         """Calculate costs for a specific AI service"""
         try:
-            response = ce_client.get_cost_and_usage(
+            return sum_total_cost(
+                ce_client.get_cost_and_usage,
                 TimePeriod={'Start': start_date, 'End': end_date},
                 Granularity='MONTHLY',
                 Metrics=['UnblendedCost'],
@@ -160,42 +360,23 @@ class EnhancedSSOCostCalculator:
                 }
             )
             
-            total_cost = Decimal('0')
-            for result in response.get('ResultsByTime', []):
-                amount = result['Total']['UnblendedCost']['Amount']
-                total_cost += Decimal(amount)
-            
-            return total_cost
-            
         except Exception as e:
             console.print(f"[yellow]Warning: Could not get costs for {service_name}: {str(e)}[/yellow]")
             return Decimal('0')
     
     def _calculate_lambda_costs(self, ce_client, lambda_functions: List[Dict],
-                              start_date: str, end_date: str, account_id: str) -> Decimal:
+                              start_date: str, end_date: str, account_id: str,
+                              breakdown: Optional[Dict] = None) -> Decimal:
         """Calculate costs for specific Lambda functions"""
         if not lambda_functions:
             return Decimal('0')
         
         try:
             # Get total Lambda costs for the account
-            response = ce_client.get_cost_and_usage(
-                TimePeriod={'Start': start_date, 'End': end_date},
-                Granularity='MONTHLY',
-                Metrics=['UnblendedCost'],
-                Filter={
-                    'And': [
-                        {'Dimensions': {'Key': 'SERVICE', 'Values': ['AWS Lambda']}},
-                        {'Dimensions': {'Key': 'LINKED_ACCOUNT', 'Values': [account_id]}}
-                    ]
-                }
+            total_lambda_cost = self._get_service_total(
+                ce_client, 'AWS Lambda', start_date, end_date, account_id, breakdown
             )
             
-            total_lambda_cost = Decimal('0')
-            for result in response.get('ResultsByTime', []):
-                amount = result['Total']['UnblendedCost']['Amount']
-                total_lambda_cost += Decimal(amount)
-            
             # For now, distribute costs evenly among AI functions
             # In production, you'd use CloudWatch metrics for more accurate attribution
             if total_lambda_cost > 0:
@@ -208,7 +389,8 @@ class EnhancedSSOCostCalculator:
             return Decimal('0')
     
     def _calculate_s3_costs(self, ce_client, s3_buckets: List[Dict],
-                          start_date: str, end_date: str, account_id: str) -> Decimal:
+                          start_date: str, end_date: str, account_id: str,
+                          breakdown: Optional[Dict] = None) -> Decimal:
         """Calculate costs for specific S3 buckets"""
         if not s3_buckets:
             return Decimal('0')
@@ -217,31 +399,11 @@ class EnhancedSSOCostCalculator:
             # Get S3 costs with bucket-level granularity
             bucket_names = [bucket['name'] for bucket in s3_buckets]
             
-            response = ce_client.get_cost_and_usage(
-                TimePeriod={'Start': start_date, 'End': end_date},
-                Granularity='MONTHLY',
-                Metrics=['UnblendedCost'],
-                Filter={
-                    'And': [
-                        {'Dimensions': {'Key': 'SERVICE', 'Values': ['Amazon Simple Storage Service']}},
-                        {'Dimensions': {'Key': 'LINKED_ACCOUNT', 'Values': [account_id]}}
-                    ]
-                },
-                GroupBy=[{'Type': 'DIMENSION', 'Key': 'USAGE_TYPE'}]
-            )
-            
-            total_cost = Decimal('0')
-            for result in response.get('ResultsByTime', []):
-                for group in result.get('Groups', []):
-                    # Filter for usage types that might be related to our buckets
-                    usage_type = group['Keys'][0]
-                    if any(bucket in usage_type for bucket in bucket_names):
-                        amount = group['Metrics']['UnblendedCost']['Amount']
-                        total_cost += Decimal(amount)
-            
-            # If no specific bucket costs found, estimate based on total S3 costs
-            if total_cost == 0:
-                total_s3_response = ce_client.get_cost_and_usage(
+            if breakdown is not None:
+                usage_type_costs = breakdown['usage_types'].get('Amazon Simple Storage Service', {})
+            else:
+                grouped_costs = sum_costs_by_group(
+                    ce_client.get_cost_and_usage,
                     TimePeriod={'Start': start_date, 'End': end_date},
                     Granularity='MONTHLY',
                     Metrics=['UnblendedCost'],
@@ -250,13 +412,25 @@ class EnhancedSSOCostCalculator:
                             {'Dimensions': {'Key': 'SERVICE', 'Values': ['Amazon Simple Storage Service']}},
                             {'Dimensions': {'Key': 'LINKED_ACCOUNT', 'Values': [account_id]}}
                         ]
-                    }
+                    },
+                    GroupBy=[{'Type': 'DIMENSION', 'Key': 'USAGE_TYPE'}]
                 )
-                
-                for result in total_s3_response.get('ResultsByTime', []):
-                    amount = result['Total']['UnblendedCost']['Amount']
-                    # Rough estimate: AI buckets are 10% of total S3 costs
-                    total_cost += Decimal(amount) * Decimal('0.1')
+                usage_type_costs = {keys[0]: amount for keys, amount in grouped_costs.items()}
+            
+            total_cost = Decimal('0')
+            for usage_type, amount in usage_type_costs.items():
+                # Filter for usage types that might be related to our buckets
+                if any(bucket in usage_type for bucket in bucket_names):
+                    total_cost += amount
+            
+            # If no specific bucket costs found, estimate based on total S3 costs
+            if total_cost == 0:
+                total_s3_cost = self._get_service_total(
+                    ce_client, 'Amazon Simple Storage Service',
+                    start_date, end_date, account_id, breakdown
+                )
+                # Rough estimate: AI buckets are 10% of total S3 costs
+                total_cost = total_s3_cost * Decimal('0.1')
             
             return total_cost
             
@@ -264,32 +438,20 @@ class EnhancedSSOCostCalculator:
             return Decimal('0')
     
     def _calculate_dynamodb_costs(self, ce_client, dynamodb_tables: List[Dict],
-                                start_date: str, end_date: str, account_id: str) -> Decimal:
+                                start_date: str, end_date: str, account_id: str,
+                                breakdown: Optional[Dict] = None) -> Decimal:
         """Calculate costs for specific DynamoDB tables"""
         if not dynamodb_tables:
             return Decimal('0')
         
         try:
             # Get DynamoDB costs
-            response = ce_client.get_cost_and_usage(
-                TimePeriod={'Start': start_date, 'End': end_date},
-                Granularity='MONTHLY',
-                Metrics=['UnblendedCost'],
-                Filter={
-                    'And': [
-                        {'Dimensions': {'Key': 'SERVICE', 'Values': ['Amazon DynamoDB']}},
-                        {'Dimensions': {'Key': 'LINKED_ACCOUNT', 'Values': [account_id]}}
-                    ]
-                }
+            total_dynamodb_cost = self._get_service_total(
+                ce_client, 'Amazon DynamoDB', start_date, end_date, account_id, breakdown
             )
             
-            total_cost = Decimal('0')
-            for result in response.get('ResultsByTime', []):
-                amount = result['Total']['UnblendedCost']['Amount']
-                # Rough estimate: AI tables are 20% of total DynamoDB costs
-                total_cost += Decimal(amount) * Decimal('0.2')
-            
-            return total_cost
+            # Rough estimate: AI tables are 20% of total DynamoDB costs
+            return total_dynamodb_cost * Decimal('0.2')
             
         except Exception as e:
             return Decimal('0')
@@ -477,4 +639,6 @@ class DecimalEncoder(json.JSONEncoder):
     def default(self, o):
         if isinstance(o, Decimal):
             return float(o)
+        if isinstance(o, ResourceRecord):
+            return o.to_dict()
         return super(DecimalEncoder, self).default(o)
\ No newline at end of file
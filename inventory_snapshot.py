@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Per-account resource inventory snapshots
+Remembers what discovery found in each account, region and service together with a change
+fingerprint, so later runs only fetch tags and details for new or changed resources and can
+report what was added, changed or removed since the last run.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+import boto3
+
+from client_pool import pooled_client
+from tag_index import credentials_key
+
+logger = logging.getLogger(__name__)
+
+INVENTORY_SNAPSHOTS = os.environ.get('INVENTORY_SNAPSHOTS', 'true').lower() not in ('0', 'false', 'no', 'off')
+
+INVENTORY_DIR = os.environ.get(
+    'INVENTORY_DIR',
+    os.path.join(
+        os.environ.get('COST_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cost-data')),
+        'inventory'
+    )
+)
+
+# Tags can change without touching a resource's fingerprint, so details are re-fetched after this long
+INVENTORY_REFRESH_HOURS = float(os.environ.get('INVENTORY_REFRESH_HOURS', '24'))
+
+_account_ids = {}
+_account_ids_lock = threading.Lock()
+
+_file_locks = {}
+_file_locks_lock = threading.Lock()
+
+_changes = {}
+_changes_lock = threading.Lock()
+
+
+def account_id_for(session: boto3.Session) -> Optional[str]:
+    """Account id of a session, looked up once per set of credentials"""
+    key = credentials_key(session)
+    with _account_ids_lock:
+        if key in _account_ids:
+            return _account_ids[key]
+    
+    try:
+        account_id = pooled_client(session, 'sts').get_caller_identity()['Account']
+    except Exception as e:
+        logger.warning(f"Could not identify account, inventory snapshots disabled for it: {e}")
+        account_id = None
+    
+    with _account_ids_lock:
+        _account_ids[key] = account_id
+    return account_id
+
+
+def _file_lock(path: str) -> threading.Lock:
+    with _file_locks_lock:
+        return _file_locks.setdefault(path, threading.Lock())
+
+
+def _read_snapshot_file(path: str) -> Dict:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def fingerprint(*values) -> str:
+    """Join the attributes that change when a resource changes"""
+    return '|'.join('' if value is None else str(value) for value in values)
+
+
+class InventorySnapshot:
+    """Previous inventory of one service in one account and region
+    
+    Call reuse() for every listed resource, record() for every resource
+    kept, keep() for a listed resource whose details could not be fetched,
+    and commit() once the listing completed; a partial or failed listing
+    must not be committed or the missing resources would show up as removed.
+    """
+    
+    def __init__(self, account_id: Optional[str], region: str, service_key: str):
+        self.account_id = account_id
+        self.region = region
+        self.service_key = service_key
+        self.section = f"{service_key}/{region}"
+        self.enabled = INVENTORY_SNAPSHOTS and account_id is not None
+        self.path = os.path.join(INVENTORY_DIR, f"{account_id}.json") if self.enabled else None
+        
+        self.previous = {}
+        if self.enabled:
+            with _file_lock(self.path):
+                section = _read_snapshot_file(self.path).get(self.section, {})
+            self.previous = section.get('resources', {})
+        self.current = {}
+        self.reused = 0
+    
+    def reuse(self, resource_id: str, resource_fingerprint: str) -> Optional[Tuple[Dict, Dict]]:
+        """(details, tags) stored for an unchanged resource, or None if it must be fetched"""
+        entry = self.previous.get(resource_id)
+        if not entry or entry.get('fingerprint') != resource_fingerprint:
+            return None
+        if time.time() - entry.get('fetched_at', 0) > INVENTORY_REFRESH_HOURS * 3600:
+            return None
+        self.current[resource_id] = entry
+        self.reused += 1
+        return dict(entry['details']), dict(entry.get('tags', {}))
+    
+    def record(self, resource_id: str, resource_fingerprint: str, details: Dict, tags: Dict):
+        """Remember a freshly fetched resource"""
+        if resource_id in self.current:
+            return
+        self.current[resource_id] = {
+            'fingerprint': resource_fingerprint,
+            'fetched_at': time.time(),
+            'details': details,
+            'tags': tags
+        }
+    
+    def keep(self, resource_id: str):
+        """Carry a resource's previous entry forward when it could not be fetched this time"""
+        entry = self.previous.get(resource_id)
+        if entry is not None and resource_id not in self.current:
+            self.current[resource_id] = entry
+    
+    def diff(self) -> Dict:
+        """Names of resources added, changed and removed since the previous snapshot"""
+        def name(resource_id: str, entry: Dict) -> str:
+            return entry.get('details', {}).get('name', resource_id)
+        
+        added, changed = [], []
+        for resource_id, entry in self.current.items():
+            before = self.previous.get(resource_id)
+            if before is None:
+                added.append(name(resource_id, entry))
+            elif before.get('fingerprint') != entry['fingerprint']:
+                changed.append(name(resource_id, entry))
+        removed = [name(resource_id, entry) for resource_id, entry in self.previous.items()
+                   if resource_id not in self.current]
+        
+        return {
+            'added': added,
+            'changed': changed,
+            'removed': removed,
+            'unchanged': len(self.current) - len(added) - len(changed),
+            'reused': self.reused
+        }
+    
+    def commit(self) -> Optional[Dict]:
+        """Store the current inventory and return the diff against the previous one"""
+        if not self.enabled:
+            return None
+        
+        diff = self.diff()
+        with _file_lock(self.path):
+            snapshot = _read_snapshot_file(self.path)
+            snapshot[self.section] = {'updated_at': time.time(), 'resources': self.current}
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                os.makedirs(INVENTORY_DIR, exist_ok=True)
+                with open(tmp_path, 'w') as f:
+                    json.dump(snapshot, f, default=str)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning(f"Could not write inventory snapshot: {e}")
+        
+        with _changes_lock:
+            _changes[(self.account_id, self.service_key, self.region)] = diff
+        return diff
+
+
+def open_snapshot(session: boto3.Session, service_key: str) -> InventorySnapshot:
+    """Load the previous inventory of a service for the session's account and region"""
+    account_id = account_id_for(session) if INVENTORY_SNAPSHOTS else None
+    return InventorySnapshot(account_id, session.region_name or 'us-east-1', service_key)
+
+
+def pop_changes(session: boto3.Session) -> Dict[str, Dict]:
+    """Per-service diffs committed for the session's account since the last call, regions merged"""
+    account_id = account_id_for(session) if INVENTORY_SNAPSHOTS else None
+    merged = {}
+    with _changes_lock:
+        keys = [key for key in _changes if key[0] == account_id]
+        for key in keys:
+            diff = _changes.pop(key)
+            service = merged.setdefault(key[1], {'added': [], 'changed': [], 'removed': [], 'unchanged': 0, 'reused': 0})
+            for field in ('added', 'changed', 'removed'):
+                service[field].extend(diff[field])
+            service['unchanged'] += diff['unchanged']
+            service['reused'] += diff['reused']
+    return merged
+
+
+def summarize_changes(changes: Dict[str, Dict]) -> Dict[str, int]:
+    """Totals of a pop_changes() result"""
+    totals = {'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 0, 'reused': 0}
+    for diff in changes.values():
+        for field in ('added', 'changed', 'removed'):
+            totals[field] += len(diff[field])
+        totals['unchanged'] += diff['unchanged']
+        totals['reused'] += diff['reused']
+    return totals
@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+"""
+Local Cost Explorer stand-in
+Answers get_cost_and_usage with Filter, GroupBy, granularity and pagination semantics from
+JSON fixtures (e.g. written by simple_cost_export.sh) or a deterministic synthetic generator,
+so the cost pipeline can be benchmarked and regression-tested without AWS.
+
+Select it with CE_BACKEND=local, or run it as an HTTP endpoint:
+    python local_cost_explorer.py --port 4599
+and point real boto3 clients at it with CE_ENDPOINT_URL=http://localhost:4599
+"""
+
+import os
+import glob
+import json
+import time
+import threading
+import random
+import hashlib
+import argparse
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional
+
+from botocore.exceptions import ClientError
+
+from cost_explorer_meter import get_meter
+
+DATE_FORMAT = '%Y-%m-%d'
+
+DEFAULT_ACCOUNT_ID = os.environ.get('LOCAL_CE_ACCOUNT_ID', '123456789012')
+PAGE_SIZE = int(os.environ.get('LOCAL_CE_PAGE_SIZE', '500'))
+LATENCY_MS = float(os.environ.get('LOCAL_CE_LATENCY_MS', '0'))
+
+COST_METRICS = ('UnblendedCost', 'BlendedCost', 'AmortizedCost', 'NetUnblendedCost', 'NetAmortizedCost')
+SUPPORTED_DIMENSIONS = ('SERVICE', 'LINKED_ACCOUNT', 'USAGE_TYPE', 'OPERATION', 'REGION')
+
+# Files written by simple_cost_export.sh hold one service each, filtered by name
+EXPORT_FILE_SERVICES = {
+    'bedrock_costs.json': 'Amazon Bedrock',
+    'lambda_costs.json': 'AWS Lambda',
+    'kendra_costs.json': 'Amazon Kendra',
+    's3_costs.json': 'Amazon Simple Storage Service',
+    'dynamodb_costs.json': 'Amazon DynamoDB'
+}
+
+
+def _parse_date(value: str) -> datetime:
+    return datetime.strptime(value, DATE_FORMAT)
+
+
+def _format_date(value: datetime) -> str:
+    return value.strftime(DATE_FORMAT)
+
+
+def _iter_days(start_date: str, end_date: str) -> Iterator[str]:
+    day = _parse_date(start_date)
+    end = _parse_date(end_date)
+    while day < end:
+        yield _format_date(day)
+        day += timedelta(days=1)
+
+
+def _validation_error(message: str, code: str = 'ValidationException') -> ClientError:
+    return ClientError(
+        {'Error': {'Code': code, 'Message': message}, 'ResponseMetadata': {'HTTPStatusCode': 400}},
+        'GetCostAndUsage'
+    )
+
+
+def _make_record(day: str, account_id: str, service: str, amount: Decimal, usage_type: str = '',
+                 operation: str = '', region: str = 'us-east-1', tags: Dict = None) -> Dict:
+    return {
+        'date': day,
+        'dimensions': {
+            'SERVICE': service,
+            'LINKED_ACCOUNT': account_id,
+            'USAGE_TYPE': usage_type,
+            'OPERATION': operation,
+            'REGION': region
+        },
+        'tags': tags or {},
+        'amount': amount
+    }
+
+
+class FixtureCostSource:
+    """Daily cost records loaded from JSON fixtures
+    
+    Accepts Cost Explorer responses as saved by the AWS CLI (GroupDefinitions
+    tell which dimension each group key is), files from simple_cost_export.sh
+    (service taken from the file name), and {"records": [...]} files.
+    Multi-day periods are spread evenly over their days.
+    """
+    
+    def __init__(self, paths: List[str], account_id: str = None):
+        self.account_id = account_id or DEFAULT_ACCOUNT_ID
+        self.records = []
+        self._load(paths)
+    
+    def _expand_paths(self, paths: List[str]) -> List[str]:
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(sorted(glob.glob(os.path.join(path, '*.json'))))
+            else:
+                files.extend(sorted(glob.glob(path)))
+        return files
+    
+    def _load(self, paths: List[str]):
+        grouped_services = set()
+        total_only = []
+        
+        for path in self._expand_paths(paths):
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            
+            if 'records' in data:
+                for record in data['records']:
+                    self.records.append(_make_record(
+                        record['date'], record.get('account_id', self.account_id), record['service'],
+                        Decimal(str(record['amount'])), record.get('usage_type', ''),
+                        record.get('operation', ''), record.get('region', 'us-east-1'), record.get('tags')
+                    ))
+            elif 'ResultsByTime' in data:
+                definitions = [d['Key'] if d.get('Type') != 'TAG' else f"TAG:{d['Key']}"
+                               for d in data.get('GroupDefinitions', [])]
+                if any(result.get('Groups') for result in data['ResultsByTime']):
+                    # Single-key groups without definitions are assumed to be services
+                    definitions = definitions or ['SERVICE']
+                    grouped_services.update(self._load_grouped(data, definitions))
+                else:
+                    total_only.append((path, data))
+        
+        # Per-service exports duplicate what a SERVICE-grouped export already covers
+        for path, data in total_only:
+            service = EXPORT_FILE_SERVICES.get(os.path.basename(path), os.path.splitext(os.path.basename(path))[0])
+            if service in grouped_services:
+                continue
+            for result in data['ResultsByTime']:
+                amount = Decimal(result.get('Total', {}).get('UnblendedCost', {}).get('Amount', '0'))
+                self._spread(result['TimePeriod'], amount, {'SERVICE': service}, {})
+    
+    def _load_grouped(self, data: Dict, definitions: List[str]) -> set:
+        services = set()
+        for result in data['ResultsByTime']:
+            for group in result.get('Groups', []):
+                dimensions, tags = {}, {}
+                for definition, key in zip(definitions, group['Keys']):
+                    if definition.startswith('TAG:'):
+                        tag_key = definition[4:]
+                        tags[tag_key] = key.split('$', 1)[1] if '$' in key else key
+                    else:
+                        dimensions[definition] = key
+                services.add(dimensions.get('SERVICE'))
+                amount = Decimal(group.get('Metrics', {}).get('UnblendedCost', {}).get('Amount', '0'))
+                self._spread(result['TimePeriod'], amount, dimensions, tags)
+        return services
+    
+    def _spread(self, time_period: Dict, amount: Decimal, dimensions: Dict, tags: Dict):
+        days = list(_iter_days(time_period['Start'], time_period['End']))
+        if not days:
+            return
+        daily_amount = amount / len(days)
+        for day in days:
+            self.records.append(_make_record(
+                day, dimensions.get('LINKED_ACCOUNT', self.account_id), dimensions.get('SERVICE', 'Unknown'),
+                daily_amount, dimensions.get('USAGE_TYPE', ''), dimensions.get('OPERATION', ''),
+                dimensions.get('REGION', 'us-east-1'), tags
+            ))
+    
+    def iter_records(self, start_date: str, end_date: str) -> Iterator[Dict]:
+        for record in self.records:
+            if start_date <= record['date'] < end_date:
+                yield record
+
+
+class SyntheticCostSource:
+    """Deterministic synthetic daily costs for any date range
+    
+    The same (seed, account, service, usage type, day) always yields the same
+    amount, so results are stable across runs and date windows.
+    """
+    
+    def __init__(self, accounts: List[str] = None, services: List[str] = None,
+                 projects: List[str] = None, usage_types_per_service: int = None, seed: str = None):
+        config = self._load_config()
+        account_count = int(os.environ.get('LOCAL_CE_ACCOUNTS', '2'))
+        self.accounts = accounts or [f"{100000000000 + i * 111111111:012d}" for i in range(1, account_count + 1)]
+        self.services = services or sorted(
+            {s['cost_explorer_name'] for s in config.get('ai_services', {}).values()} |
+            {'AWS Lambda', 'Amazon Simple Storage Service', 'Amazon DynamoDB'}
+        )
+        self.projects = projects if projects is not None else list(config.get('project_mappings', {}).keys())
+        self.usage_types_per_service = usage_types_per_service or int(os.environ.get('LOCAL_CE_USAGE_TYPES', '4'))
+        self.seed = seed or os.environ.get('LOCAL_CE_SEED', 'local-ce')
+    
+    def _load_config(self) -> Dict:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ai_services_config.json')
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _rng(self, *parts) -> random.Random:
+        digest = hashlib.sha256(':'.join((self.seed,) + parts).encode('utf-8')).hexdigest()
+        return random.Random(int(digest[:16], 16))
+    
+    def iter_records(self, start_date: str, end_date: str) -> Iterator[Dict]:
+        for account_id in self.accounts:
+            for service in self.services:
+                short_name = ''.join(word[0] for word in service.split() if word[0].isupper()) or service[:3]
+                for index in range(self.usage_types_per_service):
+                    usage_type = f"USE1-{short_name}-Usage{index + 1}"
+                    # Project tag is fixed per usage type; some spend stays untagged
+                    project_rng = self._rng(account_id, service, usage_type)
+                    project = project_rng.choice(self.projects + ['']) if self.projects else ''
+                    scale = project_rng.uniform(0.05, 25)
+                    for day in _iter_days(start_date, end_date):
+                        rng = self._rng(account_id, service, usage_type, day)
+                        amount = Decimal(str(round(scale * rng.uniform(0.5, 1.5), 6)))
+                        yield _make_record(
+                            day, account_id, service, amount, usage_type,
+                            f"{short_name}Operation{index % 2 + 1}", 'us-east-1',
+                            {'Project': project} if project else {}
+                        )
+
+
+class LocalCostExplorerClient:
+    """In-process stand-in for the boto3 'ce' client"""
+    
+    def __init__(self, source=None, page_size: int = None, latency_ms: float = None):
+        self.source = source or default_source()
+        self.page_size = page_size or PAGE_SIZE
+        self.latency_ms = LATENCY_MS if latency_ms is None else latency_ms
+        self.requests_served = 0
+        # Built results per request, so following NextPageToken does not rescan the source
+        self._results = OrderedDict()
+        self._results_lock = threading.Lock()
+    
+    # Filter evaluation
+    
+    def _matches(self, expression: Optional[Dict], record: Dict) -> bool:
+        if not expression:
+            return True
+        if 'And' in expression:
+            return all(self._matches(e, record) for e in expression['And'])
+        if 'Or' in expression:
+            return any(self._matches(e, record) for e in expression['Or'])
+        if 'Not' in expression:
+            return not self._matches(expression['Not'], record)
+        if 'Dimensions' in expression:
+            key = expression['Dimensions']['Key']
+            if key not in SUPPORTED_DIMENSIONS:
+                raise _validation_error(f"Dimension {key} is not supported by the local stand-in")
+            return record['dimensions'].get(key, '') in expression['Dimensions'].get('Values', [])
+        if 'Tags' in expression:
+            tag = expression['Tags']
+            value = record['tags'].get(tag['Key'], '')
+            if 'ABSENT' in tag.get('MatchOptions', []):
+                return value == ''
+            return value in tag.get('Values', [])
+        raise _validation_error(f"Unsupported filter expression: {list(expression)}")
+    
+    # Query
+    
+    def _buckets(self, start_date: str, end_date: str, granularity: str) -> List[Dict]:
+        if granularity == 'DAILY':
+            return [
+                {'Start': day, 'End': _format_date(_parse_date(day) + timedelta(days=1))}
+                for day in _iter_days(start_date, end_date)
+            ]
+        if granularity == 'MONTHLY':
+            buckets = []
+            current = _parse_date(start_date)
+            end = _parse_date(end_date)
+            while current < end:
+                next_month = (current.replace(day=1) + timedelta(days=32)).replace(day=1)
+                bucket_end = min(next_month, end)
+                buckets.append({'Start': _format_date(current), 'End': _format_date(bucket_end)})
+                current = bucket_end
+            return buckets
+        raise _validation_error(f"Granularity {granularity} is not supported by the local stand-in")
+    
+    def _group_key(self, group_by: List[Dict], record: Dict) -> tuple:
+        keys = []
+        for group in group_by:
+            if group['Type'] == 'TAG':
+                keys.append(f"{group['Key']}${record['tags'].get(group['Key'], '')}")
+            else:
+                keys.append(record['dimensions'].get(group['Key'], ''))
+        return tuple(keys)
+    
+    def _validate(self, kwargs: Dict):
+        period = kwargs.get('TimePeriod') or {}
+        if not period.get('Start') or not period.get('End'):
+            raise _validation_error('TimePeriod Start and End are required')
+        if period['Start'] >= period['End']:
+            raise _validation_error('TimePeriod Start must be before End')
+        if not kwargs.get('Metrics'):
+            raise _validation_error('At least one metric is required')
+        if not kwargs.get('Granularity'):
+            raise _validation_error('Granularity is required')
+        group_by = kwargs.get('GroupBy', [])
+        if len(group_by) > 2:
+            raise _validation_error('GroupBy supports at most two keys')
+        for group in group_by:
+            if group.get('Type') == 'DIMENSION' and group.get('Key') not in SUPPORTED_DIMENSIONS:
+                raise _validation_error(f"GroupBy dimension {group.get('Key')} is not supported")
+    
+    def _build_results(self, kwargs: Dict) -> List[Dict]:
+        period = kwargs['TimePeriod']
+        metrics = kwargs['Metrics']
+        group_by = kwargs.get('GroupBy', [])
+        buckets = self._buckets(period['Start'], period['End'], kwargs['Granularity'])
+        
+        # bucket index -> group key -> amount
+        totals = [dict() for _ in buckets]
+        bucket_starts = [bucket['Start'] for bucket in buckets]
+        for record in self.source.iter_records(period['Start'], period['End']):
+            if not self._matches(kwargs.get('Filter'), record):
+                continue
+            index = bisect_right(bucket_starts, record['date']) - 1
+            key = self._group_key(group_by, record) if group_by else ()
+            totals[index][key] = totals[index].get(key, Decimal('0')) + record['amount']
+        
+        def metric_values(amount: Decimal) -> Dict:
+            values = {}
+            for metric in metrics:
+                if metric == 'UsageQuantity':
+                    values[metric] = {'Amount': f"{amount * 100:.6f}", 'Unit': 'N/A'}
+                else:
+                    values[metric] = {'Amount': f"{amount:.10f}", 'Unit': 'USD'}
+            return values
+        
+        today = _format_date(datetime.now())
+        results = []
+        for bucket, groups in zip(buckets, totals):
+            result = {'TimePeriod': bucket, 'Estimated': bucket['End'] > today}
+            if group_by:
+                result['Total'] = {}
+                result['Groups'] = [
+                    {'Keys': list(key), 'Metrics': metric_values(amount)}
+                    for key, amount in sorted(groups.items())
+                ]
+            else:
+                result['Total'] = metric_values(groups.get((), Decimal('0')))
+                result['Groups'] = []
+            results.append(result)
+        return results
+    
+    def _get_results(self, kwargs: Dict) -> List[Dict]:
+        key = json.dumps({k: v for k, v in kwargs.items() if k != 'NextPageToken'}, sort_keys=True)
+        with self._results_lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+        
+        results = self._build_results(kwargs)
+        with self._results_lock:
+            self._results[key] = results
+            while len(self._results) > 16:
+                self._results.popitem(last=False)
+        return results
+    
+    def _paginate(self, results: List[Dict], token: Optional[str]) -> Dict:
+        """Split results into pages of at most page_size groups, like Cost Explorer"""
+        try:
+            offset = int(token) if token else 0
+        except ValueError:
+            raise _validation_error('Invalid NextPageToken', 'InvalidNextTokenException')
+        
+        page, position, remaining = [], 0, self.page_size
+        for result in results:
+            size = max(1, len(result['Groups']))
+            if position + size <= offset:
+                position += size
+                continue
+            if remaining <= 0:
+                return {'ResultsByTime': page, 'NextPageToken': str(position)}
+            
+            if not result['Groups']:
+                page.append(result)
+                position += 1
+                remaining -= 1
+                continue
+            
+            start = max(0, offset - position)
+            take = result['Groups'][start:start + remaining]
+            page.append(dict(result, Groups=take))
+            position += start + len(take)
+            remaining -= len(take)
+            if start + len(take) < len(result['Groups']):
+                return {'ResultsByTime': page, 'NextPageToken': str(position)}
+            position += len(result['Groups']) - start - len(take)
+        
+        return {'ResultsByTime': page}
+    
+    def get_cost_and_usage(self, **kwargs) -> Dict:
+        """Answer a get_cost_and_usage request from the local source"""
+        get_meter().reserve('GetCostAndUsage')
+        self._validate(kwargs)
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        
+        response = self._paginate(self._get_results(kwargs), kwargs.get('NextPageToken'))
+        if kwargs.get('GroupBy'):
+            response['GroupDefinitions'] = kwargs['GroupBy']
+        response['DimensionValueAttributes'] = []
+        response['ResponseMetadata'] = {'HTTPStatusCode': 200, 'RetryAttempts': 0}
+        self.requests_served += 1
+        return response
+
+
+def default_source():
+    """Fixtures from LOCAL_CE_FIXTURES when set, otherwise the synthetic generator"""
+    fixtures = os.environ.get('LOCAL_CE_FIXTURES')
+    if fixtures:
+        return FixtureCostSource([p.strip() for p in fixtures.split(',') if p.strip()])
+    return SyntheticCostSource()
+
+
+def is_local_backend() -> bool:
+    """Check whether CE_BACKEND selects the in-process stand-in"""
+    return os.environ.get('CE_BACKEND', 'aws').lower() == 'local'
+
+
+_shared_client = None
+
+
+def get_local_client() -> LocalCostExplorerClient:
+    """Return the process-wide stand-in client (fixtures are loaded once)"""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = LocalCostExplorerClient()
+    return _shared_client
+
+
+class _CostExplorerRequestHandler(BaseHTTPRequestHandler):
+    """Speaks the Cost Explorer JSON protocol so real boto3 clients can use endpoint_url"""
+    
+    client = None
+    
+    def _send(self, status: int, body: Dict):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/x-amz-json-1.1')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+    
+    def do_POST(self):
+        target = self.headers.get('X-Amz-Target', '')
+        length = int(self.headers.get('Content-Length', '0'))
+        try:
+            kwargs = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send(400, {'__type': 'SerializationException', 'message': 'Invalid JSON body'})
+            return
+        
+        if not target.endswith('.GetCostAndUsage'):
+            self._send(400, {'__type': 'UnknownOperationException', 'message': f"Unsupported operation {target}"})
+            return
+        
+        try:
+            response = self.client.get_cost_and_usage(**kwargs)
+        except ClientError as e:
+            error = e.response['Error']
+            self._send(400, {'__type': error['Code'], 'message': error['Message']})
+            return
+        
+        response.pop('ResponseMetadata', None)
+        self._send(200, response)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host: str = '127.0.0.1', port: int = 4599, client: LocalCostExplorerClient = None):
+    """Run the stand-in as an HTTP Cost Explorer endpoint"""
+    _CostExplorerRequestHandler.client = client or get_local_client()
+    server = ThreadingHTTPServer((host, port), _CostExplorerRequestHandler)
+    print(f"Local Cost Explorer listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Local Cost Explorer stand-in')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=4599)
+    args = parser.parse_args()
+    serve(args.host, args.port)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Streaming pagination for discovery listing calls
+Yields listed items page by page with a per-call item cap, so discovery sees every resource on
+large accounts without holding whole listings in memory, plus the time window job-style
+listings are limited to and the time budget a discovery scan may spend listing.
+"""
+
+import os
+import time
+import logging
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+from botocore.exceptions import ClientError
+from rate_limiter import is_retryable_error
+
+logger = logging.getLogger(__name__)
+
+# Most items taken from one listing call (0 = unlimited)
+DISCOVERY_MAX_ITEMS = int(os.environ.get('DISCOVERY_MAX_ITEMS', '10000'))
+
+# How far back job-style listings (e.g. training jobs) go when no reporting period is given
+DISCOVERY_LOOKBACK_DAYS = int(os.environ.get('DISCOVERY_LOOKBACK_DAYS', '90'))
+
+# Per-resource detail calls (describe, tags) running at once for one listing
+DISCOVERY_DETAIL_WORKERS = int(os.environ.get('DISCOVERY_DETAIL_WORKERS', '8'))
+
+# Seconds one service may spend listing in one region before it returns what it has (0 = no limit)
+DISCOVERY_SERVICE_DEADLINE = float(os.environ.get('DISCOVERY_SERVICE_DEADLINE', '60'))
+
+# Response keys that mean another page follows
+_MORE_PAGES_KEYS = ('NextToken', 'nextToken', 'NextMarker', 'NextContinuationToken', 'IsTruncated')
+
+_window_start = contextvars.ContextVar('listing_window_start', default=None)
+_budget = contextvars.ContextVar('listing_budget', default=None)
+
+
+def _to_datetime(value: Union[str, datetime]) -> datetime:
+    if isinstance(value, str):
+        value = datetime.strptime(value[:10], '%Y-%m-%d')
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+@contextmanager
+def listing_window(start: Union[str, datetime, None]):
+    """Limit job-style listings in this context to resources created on or after start"""
+    try:
+        start = _to_datetime(start) if start else None
+    except ValueError:
+        logger.warning(f"Ignoring invalid listing window start {start!r}")
+        start = None
+    token = _window_start.set(start)
+    try:
+        yield
+    finally:
+        _window_start.reset(token)
+
+
+def window_start() -> datetime:
+    """Start of the current listing window"""
+    start = _window_start.get()
+    if start is None:
+        start = datetime.now(timezone.utc) - timedelta(days=DISCOVERY_LOOKBACK_DAYS)
+    return start
+
+
+class ListingBudget:
+    """Deadline and problems of one discovery scan
+    
+    Listings stop paging once the deadline has passed and keep what they
+    already yielded; each stop, each listing cut off at DISCOVERY_MAX_ITEMS
+    and each failed listing is recorded as an issue so the scan can be
+    reported as partial.
+    """
+    
+    def __init__(self, seconds: float = None):
+        seconds = DISCOVERY_SERVICE_DEADLINE if seconds is None else seconds
+        self.seconds = seconds
+        self.deadline = time.monotonic() + seconds if seconds else None
+        self.issues = []
+    
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+    
+    def record(self, kind: str, operation: str, message: str, **fields):
+        self.issues.append(dict({'kind': kind, 'operation': operation, 'message': message}, **fields))
+
+
+@contextmanager
+def listing_budget(seconds: float = None):
+    """Give the listings in this context a shared deadline; yields the ListingBudget"""
+    budget = ListingBudget(seconds)
+    token = _budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _budget.reset(token)
+
+
+def record_listing_error(operation: str, error: Exception):
+    """Record a listing that failed in the current scan instead of dropping it silently"""
+    logger.debug(f"{operation} failed: {error}")
+    budget = _budget.get()
+    if budget is None:
+        return
+    code = error.response.get('Error', {}).get('Code') if isinstance(error, ClientError) else type(error).__name__
+    budget.record('error', operation, str(error), code=code, retryable=is_retryable_error(error))
+
+
+def listing_complete() -> bool:
+    """True unless a listing of the current scan failed or stopped at the deadline or the item cap"""
+    budget = _budget.get()
+    return budget is None or not budget.issues
+
+
+def _has_more(page: Dict) -> bool:
+    return any(page.get(key) for key in _MORE_PAGES_KEYS)
+
+
+def _token_key(client, operation: str) -> Optional[str]:
+    operation_model = client.meta.service_model.operation_model(client.meta.method_to_api_mapping[operation])
+    for key in ('NextToken', 'nextToken'):
+        if key in operation_model.input_shape.members:
+            return key
+    return None
+
+
+def _fetch_pages(client, operation: str, **kwargs) -> Iterator[Dict]:
+    if client.can_paginate(operation):
+        yield from client.get_paginator(operation).paginate(**kwargs)
+        return
+    
+    method = getattr(client, operation)
+    token_key = _token_key(client, operation)
+    params = dict(kwargs)
+    while True:
+        page = method(**params)
+        yield page
+        token = page.get(token_key) if token_key else None
+        if not token:
+            return
+        params[token_key] = token
+
+
+def iter_pages(client, operation: str, **kwargs) -> Iterator[Dict]:
+    """Yield every response page of a listing call, following tokens when botocore has no paginator
+    
+    Inside listing_budget() no further page is requested once the deadline
+    has passed, and the listing is recorded as partial.
+    """
+    budget = _budget.get()
+    pages_read = 0
+    if budget is not None and budget.expired():
+        budget.record('deadline', operation, f"skipped, {budget.seconds:g}s budget already spent",
+                      pages_read=0)
+        return
+    
+    for page in _fetch_pages(client, operation, **kwargs):
+        yield page
+        pages_read += 1
+        if budget is not None and budget.expired() and _has_more(page):
+            budget.record('deadline', operation, f"stopped after {pages_read} pages, {budget.seconds:g}s budget spent",
+                          pages_read=pages_read)
+            return
+
+
+def iter_items(client, operation: str, result_key: str, max_items: int = None, **kwargs) -> Iterator:
+    """Yield the items under result_key across all pages, stopping after max_items
+    
+    A listing cut off with items left is recorded as partial in the current scan.
+    """
+    max_items = DISCOVERY_MAX_ITEMS if max_items is None else max_items
+    count = 0
+    for page in iter_pages(client, operation, **kwargs):
+        items = page.get(result_key, [])
+        for position, item in enumerate(items, 1):
+            yield item
+            count += 1
+            if max_items and count >= max_items:
+                if position < len(items) or _has_more(page):
+                    logger.warning(f"{client.meta.service_model.service_name} {operation} stopped at {max_items} items")
+                    budget = _budget.get()
+                    if budget is not None:
+                        budget.record('truncated', operation, f"stopped at the {max_items} item limit",
+                                      items_read=count)
+                return
+
+
+def map_pipelined(func: Callable[[Any], Any], items: Iterable,
+                  max_workers: int = None) -> Iterator[Tuple[Any, Any, Optional[Exception]]]:
+    """Call func(item) on a bounded pool while items are still being listed
+    
+    Yields (item, result, error) in the order of items. Listing pauses once
+    2 x max_workers calls are waiting, so detail calls overlap with paging
+    without the whole listing being held in memory.
+    """
+    max_workers = DISCOVERY_DETAIL_WORKERS if max_workers is None else max_workers
+    
+    def settle(item, future) -> Tuple[Any, Any, Optional[Exception]]:
+        try:
+            return item, future.result(), None
+        except Exception as e:
+            return item, None, e
+    
+    if max_workers <= 1:
+        for item in items:
+            try:
+                yield item, func(item), None
+            except Exception as e:
+                yield item, None, e
+        return
+    
+    window = deque()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='detail') as executor:
+        for item in items:
+            window.append((item, executor.submit(contextvars.copy_context().run, func, item)))
+            if len(window) >= max_workers * 2:
+                yield settle(*window.popleft())
+        while window:
+            yield settle(*window.popleft())
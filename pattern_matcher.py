@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Precompiled resource name matcher
+Classifies names against an ordered list of re.match-style patterns in a single pass and
+reports which pattern matched first, or against ordered groups of re.search-style patterns
+reporting the first group that matches.
+"""
+
+import re
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple
+
+# Bodies of '.*literal.*' / 'literal.*' patterns that contain no regex syntax
+_LITERAL_BODY = re.compile(r'[A-Za-z0-9_\- ]+')
+
+
+def _literal_rule(pattern: str) -> Optional[Tuple[str, str]]:
+    """Return ('prefix' | 'substring', literal) for plain literal patterns, else None"""
+    body = pattern[:-2] if pattern.endswith('.*') else pattern
+    kind = 'prefix'
+    if body.startswith('.*'):
+        body = body[2:]
+        kind = 'substring'
+    if body and _LITERAL_BODY.fullmatch(body):
+        return kind, body
+    return None
+
+
+class PatternMatcher:
+    """Ordered re.match patterns compiled into one combined test
+    
+    Plain literal patterns become a prefix tuple and one substring
+    alternation; the rest are joined into a single regex. The per-pattern
+    regexes only run on names that already matched, to name the rule.
+    """
+    
+    def __init__(self, patterns: Sequence[str], lowercase: bool = True):
+        self.patterns = tuple(patterns)
+        self.lowercase = lowercase
+        self._compiled = [re.compile(pattern) for pattern in self.patterns]
+        
+        prefixes, substrings, others = [], [], []
+        for pattern in self.patterns:
+            rule = _literal_rule(pattern)
+            if rule is None:
+                others.append(pattern)
+            elif rule[0] == 'prefix':
+                prefixes.append(rule[1])
+            else:
+                substrings.append(rule[1])
+        
+        self._prefixes = tuple(prefixes)
+        self._substrings = re.compile('|'.join(re.escape(s) for s in substrings)) if substrings else None
+        self._others = re.compile('|'.join(f'(?:{p})' for p in others)) if others else None
+    
+    def matches(self, name: str) -> bool:
+        """True if any pattern matches the name"""
+        if self.lowercase:
+            name = name.lower()
+        return bool(
+            (self._prefixes and name.startswith(self._prefixes)) or
+            (self._substrings is not None and self._substrings.search(name)) or
+            (self._others is not None and self._others.match(name))
+        )
+    
+    def classify(self, name: str) -> Tuple[bool, Optional[str]]:
+        """(matched, first matching pattern in list order)"""
+        if not self.matches(name):
+            return False, None
+        if self.lowercase:
+            name = name.lower()
+        for pattern, compiled in zip(self.patterns, self._compiled):
+            if compiled.match(name):
+                return True, pattern
+        return False, None
+
+
+class GroupMatcher:
+    """Ordered groups of re.search patterns compiled into one regex
+    
+    Each group becomes a lookahead from the start of the text, tried in
+    group order, so the earliest group with any match wins wherever in
+    the text its pattern matches.
+    """
+    
+    def __init__(self, groups: Sequence[Sequence[str]]):
+        alternatives = []
+        for index, patterns in enumerate(groups):
+            if patterns:
+                body = '|'.join(f'(?:{pattern})' for pattern in patterns)
+                alternatives.append(rf'(?=[\s\S]*?(?:{body}))(?P<g{index}>)')
+        self._regex = re.compile('|'.join(alternatives)) if alternatives else None
+    
+    def first(self, text: str) -> Optional[int]:
+        """Index of the first group with a pattern found in text"""
+        if self._regex is None:
+            return None
+        match = self._regex.match(text)
+        return int(match.lastgroup[1:]) if match else None
+
+
+@lru_cache(maxsize=64)
+def _cached_matcher(patterns: Tuple[str, ...], lowercase: bool) -> PatternMatcher:
+    return PatternMatcher(patterns, lowercase)
+
+
+def get_matcher(patterns: Sequence[str], lowercase: bool = True) -> PatternMatcher:
+    """Return a shared compiled matcher for a pattern list"""
+    return _cached_matcher(tuple(patterns), lowercase)
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Shared adaptive rate limiter for AWS APIs
+One process-wide token bucket per API family (ce, lambda, s3, sso, bedrock-agent, ...).
+Buckets slow down when AWS throttles and recover gradually as calls succeed.
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectionError as BotocoreConnectionError
+
+from client_pool import pooled_client
+
+logger = logging.getLogger(__name__)
+
+# Sustained requests per second for each API family
+DEFAULT_RATES = {
+    'ce': 5.0,
+    'lambda': 10.0,
+    's3': 20.0,
+    'dynamodb': 20.0,
+    'sso': 10.0,
+    'bedrock-agent': 5.0
+}
+DEFAULT_RATE = 10.0
+
+# Services that share a bucket with another family
+FAMILY_ALIASES = {
+    'bedrock': 'bedrock-agent',
+    'sso-oidc': 'sso'
+}
+
+THROTTLING_ERROR_CODES = {
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'RequestThrottledException',
+    'TooManyRequestsException',
+    'ProvisionedThroughputExceededException',
+    'TransactionInProgressException',
+    'RequestLimitExceeded',
+    'BandwidthLimitExceeded',
+    'LimitExceededException',
+    'RequestThrottled',
+    'SlowDown',
+    'PriorRequestNotComplete',
+    'EC2ThrottledException'
+}
+
+TRANSIENT_ERROR_CODES = {
+    'RequestTimeout',
+    'RequestTimeoutException',
+    'InternalError',
+    'InternalFailure',
+    'InternalServerError',
+    'ServiceUnavailable',
+    'ServiceUnavailableException'
+}
+
+# botocore's own retries run before ours, using its jittered backoff
+BOTOCORE_MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', '5'))
+RETRY_CONFIG = Config(retries={'mode': 'standard', 'max_attempts': BOTOCORE_MAX_ATTEMPTS})
+
+
+def _family_rate(family: str) -> float:
+    """Get the configured rate for a family, honoring RATE_LIMIT_<FAMILY> overrides"""
+    env_name = f"RATE_LIMIT_{family.upper().replace('-', '_')}"
+    try:
+        return float(os.environ[env_name])
+    except (KeyError, ValueError):
+        return DEFAULT_RATES.get(family, DEFAULT_RATE)
+
+
+def family_for_service(service_name: str) -> str:
+    """Map a boto3 service name to its rate limiter family"""
+    return FAMILY_ALIASES.get(service_name, service_name)
+
+
+def _error_code(error: Exception) -> Optional[str]:
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code')
+    return None
+
+
+def is_throttling_error(error: Exception) -> bool:
+    """Check whether an exception is an AWS throttling error"""
+    return _error_code(error) in THROTTLING_ERROR_CODES
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Check whether an exception is worth retrying (throttling or transient)"""
+    if isinstance(error, BotocoreConnectionError):
+        return True
+    if not isinstance(error, ClientError):
+        return False
+    
+    code = _error_code(error)
+    if code in THROTTLING_ERROR_CODES or code in TRANSIENT_ERROR_CODES:
+        return True
+    status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+    return status >= 500
+
+
+def retry_after_seconds(response: Optional[Dict]) -> Optional[float]:
+    """Read a Retry-After header from a parsed response or error response"""
+    headers = (response or {}).get('ResponseMetadata', {}).get('HTTPHeaders', {})
+    value = headers.get('retry-after')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 20.0) -> float:
+    """Full-jitter exponential backoff delay for a retry attempt"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class AdaptiveRateLimiter:
+    """Token bucket that halves its rate on throttling and creeps back up on success"""
+    
+    def __init__(self, family: str, rate: float = None, min_rate: float = 0.2):
+        self.family = family
+        self.max_rate = rate if rate is not None else _family_rate(family)
+        self.min_rate = min(min_rate, self.max_rate)
+        self.rate = self.max_rate
+        self.capacity = max(1.0, self.max_rate)
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'throttles': 0,
+            'retries': 0,
+            'wait_seconds': 0.0
+        }
+    
+    def _refill(self, now: float):
+        elapsed = now - self.last_refill
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.last_refill = now
+    
+    def acquire(self):
+        """Block until a request may be sent"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    self.stats['requests'] += 1
+                    self.stats['wait_seconds'] += waited
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+            waited += wait
+    
+    def record_throttle(self, retry_after: float = None):
+        """Multiplicative decrease after AWS throttled a request"""
+        with self._lock:
+            self.stats['throttles'] += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+            if retry_after:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+        logger.debug(f"Throttled on {self.family}, rate now {self.rate:.2f}/s")
+    
+    def record_success(self):
+        """Additive increase back towards the configured rate"""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+    
+    def record_retries(self, count: int):
+        with self._lock:
+            self.stats['retries'] += count
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats['current_rate'] = round(self.rate, 3)
+            stats['max_rate'] = self.max_rate
+        stats['wait_seconds'] = round(stats['wait_seconds'], 3)
+        return stats
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(family: str) -> AdaptiveRateLimiter:
+    """Return the process-wide limiter for an API family"""
+    with _limiters_lock:
+        limiter = _limiters.get(family)
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(family)
+            _limiters[family] = limiter
+        return limiter
+
+
+def get_rate_limiter_stats() -> Dict[str, Dict]:
+    """Counters for every limiter created so far"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.family: limiter.get_stats() for limiter in limiters}
+
+
+def install_rate_limiter(client, family: str = None):
+    """Hook a boto3 client into its family's limiter
+    
+    Every HTTP attempt (including botocore retries and paginator pages)
+    takes a token, and every attempt AWS throttled halves the bucket's rate.
+    Retries of transient errors (5xx, dropped connections) are counted but
+    do not slow the bucket down.
+    """
+    if getattr(client, '_rate_limiter_installed', False):
+        return client
+    
+    family = family or family_for_service(client.meta.service_model.service_name)
+    limiter = get_rate_limiter(family)
+    
+    def before_send(**kwargs):
+        limiter.acquire()
+    
+    def after_attempt(response=None, **kwargs):
+        # Fires once per HTTP attempt, before botocore decides whether to retry
+        parsed = response[1] if response else {}
+        if parsed.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES:
+            limiter.record_throttle(retry_after_seconds(parsed))
+    
+    def after_call(parsed=None, **kwargs):
+        parsed = parsed or {}
+        retry_attempts = parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+        if retry_attempts:
+            limiter.record_retries(retry_attempts)
+        if parsed.get('Error', {}).get('Code') not in THROTTLING_ERROR_CODES:
+            limiter.record_success()
+    
+    client.meta.events.register('before-send', before_send)
+    client.meta.events.register('needs-retry', after_attempt)
+    client.meta.events.register('after-call', after_call)
+    client._rate_limiter_installed = True
+    return client
+
+
+def rate_limited_client(session, service_name: str, family: str = None, **kwargs):
+    """Return a pooled boto3 client that retries with botocore's standard mode and shares a limiter"""
+    kwargs.setdefault('config', RETRY_CONFIG)
+    client = pooled_client(session, service_name, **kwargs)
+    return install_rate_limiter(client, family)
+
+
+def call_with_backoff(func: Callable, max_retries: int = 3, family: str = None, **kwargs):
+    """Call func(**kwargs), retrying throttling and transient errors with jittered backoff
+    
+    Non-retryable errors are raised immediately; the last error is raised
+    once retries are exhausted. A Retry-After header takes precedence over
+    the computed delay. Clients from rate_limited_client() already retry and
+    report throttles, so wrap their calls with max_retries=1 (or not at all).
+    """
+    limiter = get_rate_limiter(family) if family else None
+    
+    for attempt in range(max_retries):
+        try:
+            return func(**kwargs)
+        except Exception as e:
+            if not is_retryable_error(e) or attempt == max_retries - 1:
+                raise
+            
+            retry_after = None
+            if isinstance(e, ClientError):
+                retry_after = retry_after_seconds(e.response)
+            if limiter is not None:
+                limiter.record_retries(1)
+                if is_throttling_error(e):
+                    limiter.record_throttle(retry_after)
+            
+            wait_time = retry_after if retry_after is not None else backoff_delay(attempt + 1)
+            logger.warning(f"API call failed, retrying in {wait_time:.1f} seconds... Error: {str(e)}")
+            time.sleep(wait_time)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Multi-region discovery fan-out
+Works out which regions are enabled for an account and which of them have an endpoint for
+each service, producing the region x service grid that discovery runs concurrently.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import boto3
+import botocore.session
+
+from client_pool import pooled_client
+from tag_index import credentials_key
+
+logger = logging.getLogger(__name__)
+
+# 'all' = every region enabled for the account, or a comma-separated list
+DISCOVERY_REGIONS = os.environ.get('DISCOVERY_REGIONS', 'all')
+
+# How long an account's enabled regions are remembered
+REGION_CACHE_TTL = int(os.environ.get('REGION_CACHE_TTL', '3600'))
+
+# Services whose listing already covers every region
+GLOBAL_SERVICES = {'s3'}
+
+# Endpoint names for discovery keys that differ from the boto3 service name
+ENDPOINT_SERVICES = {
+    'bedrock': 'bedrock',
+    'lex': 'lexv2-models',
+    'augmentedai': 'sagemaker'
+}
+
+_enabled_regions = {}
+_enabled_regions_lock = threading.Lock()
+
+_endpoint_regions = {}
+_endpoint_regions_lock = threading.Lock()
+_endpoint_session = None
+
+
+def _configured_regions() -> Optional[List[str]]:
+    if DISCOVERY_REGIONS.strip().lower() == 'all':
+        return None
+    return [region.strip() for region in DISCOVERY_REGIONS.split(',') if region.strip()]
+
+
+def enabled_regions(session: boto3.Session) -> List[str]:
+    """Regions enabled for the session's account, home region first
+    
+    Opt-in regions the account has not enabled are left out. Falls back
+    to the home region when ec2:DescribeRegions is not allowed.
+    """
+    home = session.region_name or 'us-east-1'
+    regions = _configured_regions()
+    if regions is None:
+        regions = _detect_enabled_regions(session, home)
+    
+    if home not in regions:
+        return list(regions)
+    return [home] + [region for region in regions if region != home]
+
+
+def _detect_enabled_regions(session: boto3.Session, home: str) -> List[str]:
+    key = credentials_key(session)
+    with _enabled_regions_lock:
+        cached = _enabled_regions.get(key)
+    if cached and time.monotonic() - cached[0] < REGION_CACHE_TTL:
+        return cached[1]
+    
+    try:
+        ec2 = pooled_client(session, 'ec2', region_name=home)
+        response = ec2.describe_regions(AllRegions=False)
+        regions = sorted(region['RegionName'] for region in response.get('Regions', []))
+    except Exception as e:
+        logger.warning(f"Could not list enabled regions, discovering {home} only: {e}")
+        regions = [home]
+    
+    with _enabled_regions_lock:
+        _enabled_regions[key] = (time.monotonic(), regions)
+    return regions
+
+
+def endpoint_regions(service_name: str) -> Optional[set]:
+    """Regions with an endpoint for a service, or None when botocore does not list them"""
+    global _endpoint_session
+    with _endpoint_regions_lock:
+        if service_name not in _endpoint_regions:
+            if _endpoint_session is None:
+                _endpoint_session = botocore.session.get_session()
+            try:
+                regions = set(_endpoint_session.get_available_regions(service_name))
+            except Exception:
+                regions = set()
+            _endpoint_regions[service_name] = regions or None
+        return _endpoint_regions[service_name]
+
+
+def service_regions(service_key: str, regions: Sequence[str]) -> List[str]:
+    """The subset of regions worth scanning for a discovery service"""
+    if service_key in GLOBAL_SERVICES:
+        return list(regions[:1])
+    available = endpoint_regions(ENDPOINT_SERVICES.get(service_key, service_key))
+    if available is None:
+        return list(regions)
+    return [region for region in regions if region in available]
+
+
+def discovery_grid(session: boto3.Session, service_keys: Sequence[str]) -> List[Tuple[str, str]]:
+    """(service_key, region) cells to scan, in service order then region order"""
+    regions = enabled_regions(session)
+    return [
+        (service_key, region)
+        for service_key in service_keys
+        for region in service_regions(service_key, regions)
+    ]
+
+
+def tag_with_region(resources: Optional[List[Dict]], region: str) -> Optional[List[Dict]]:
+    """Record the region a resource was found in unless the discovery method already did"""
+    for resource in resources or []:
+        resource.setdefault('region', region)
+    return resources
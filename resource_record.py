@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Compact discovered-resource records
+Stores each discovered resource in fixed slots with interned service, type, region, project and
+status strings instead of a per-resource dict. Records read like the dicts discovery used to
+return and are turned back into dicts only when serialized.
+"""
+
+import sys
+from collections.abc import Mapping
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional
+
+# Resource keys stored in slots, in the order they are serialized
+FIELDS = (
+    'type', 'name', 'arn', 'id', 'status', 'state', 'created', 'region', 'runtime', 'memory', 'timeout',
+    'last_modified', 'item_count', 'size_bytes', 'instance_type', 'language', 'domain',
+    'matched_pattern', 'project', 'tags'
+)
+_FIELD_SET = frozenset(FIELDS)
+
+# Low-cardinality values shared by many records
+INTERNED = frozenset(('type', 'status', 'state', 'region', 'runtime', 'instance_type', 'language',
+                      'domain', 'matched_pattern', 'project'))
+
+
+class ResourceRecord(Mapping):
+    """One discovered resource, readable as a read-only mapping
+    
+    Keys the resource does not have are left unset rather than stored as
+    None; uncommon keys go to a small overflow dict.
+    """
+    
+    __slots__ = FIELDS + ('service', '_extra')
+    
+    def __init__(self, service: str, values: Dict):
+        self.service = sys.intern(service)
+        extra = None
+        for key, value in values.items():
+            if key in _FIELD_SET:
+                if key in INTERNED and type(value) is str:
+                    value = sys.intern(value)
+                object.__setattr__(self, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        self._extra = extra
+    
+    def __getitem__(self, key: str):
+        if key in _FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+    
+    def __iter__(self) -> Iterator[str]:
+        for key in FIELDS:
+            if hasattr(self, key):
+                yield key
+        if self._extra:
+            yield from self._extra
+    
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+    
+    def __repr__(self) -> str:
+        return f"ResourceRecord({self.service!r}, {self.to_dict()!r})"
+    
+    def __getstate__(self):
+        return self.service, self.to_dict()
+    
+    def __setstate__(self, state):
+        self.__init__(*state)
+    
+    def to_dict(self) -> Dict:
+        """The resource as a plain dict, for JSON responses and exports"""
+        return {key: self[key] for key in self}
+
+
+def to_records(service: str, resources: Optional[List[Dict]]) -> Optional[List[ResourceRecord]]:
+    """Convert one discovery method's resource dicts to records"""
+    if resources is None:
+        return None
+    return [resource if isinstance(resource, ResourceRecord) else ResourceRecord(service, resource)
+            for resource in resources]
+
+
+def json_default(o):
+    """json.dumps default= hook that understands records and Decimals"""
+    if isinstance(o, ResourceRecord):
+        return o.to_dict()
+    if isinstance(o, Decimal):
+        return float(o)
+    return str(o)
@@ -16,7 +16,9 @@ import click
 from rich.console import Console
 from rich.prompt import Prompt, Confirm
 from rich.table import Table
-from rich.progress import track
+
+from rate_limiter import install_rate_limiter
+from account_executor import run_for_accounts
 
 console = Console()
 
@@ -86,7 +88,7 @@ class SSOAuthenticator:
         
         # Initialize SSO clients
         self.sso_oidc_client = boto3.client('sso-oidc', region_name=sso_region)
-        self.sso_client = boto3.client('sso', region_name=sso_region)
+        self.sso_client = install_rate_limiter(boto3.client('sso', region_name=sso_region))
         
         try:
             # Start device authorization
@@ -265,29 +267,32 @@ class SSOAuthenticator:
         selected_accounts = self.select_accounts(accounts)
         
         # Get credentials for each account
-        sessions = []
         console.print("\n[bold]Getting credentials for selected accounts...[/bold]")
         
-        for account in track(selected_accounts, description="Processing accounts"):
+        def create_session(account):
             creds = self.get_role_credentials(
                 auth_info['access_token'],
                 account['accountId']
             )
+            if not creds:
+                return None
             
-            if creds:
-                # Create boto3 session
-                session = boto3.Session(
-                    aws_access_key_id=creds['AccessKeyId'],
-                    aws_secret_access_key=creds['SecretAccessKey'],
-                    aws_session_token=creds['SessionToken'],
-                    region_name='us-east-1'  # Cost Explorer requires us-east-1
-                )
-                
-                account_name = account.get('accountName', account['accountId'])
-                sessions.append((account_name, session))
+            # Create boto3 session
+            return boto3.Session(
+                aws_access_key_id=creds['AccessKeyId'],
+                aws_secret_access_key=creds['SecretAccessKey'],
+                aws_session_token=creds['SessionToken'],
+                region_name='us-east-1'  # Cost Explorer requires us-east-1
+            )
+        
+        sessions = []
+        for outcome in run_for_accounts(selected_accounts, create_session, description='Getting credentials'):
+            account_name = outcome['account'].get('accountName', outcome['account']['accountId'])
+            if outcome['result'] is not None:
+                sessions.append((account_name, outcome['result']))
                 console.print(f"  [green]✓[/green] {account_name}")
             else:
-                console.print(f"  [red]✗[/red] Failed to get credentials for {account.get('accountName', account['accountId'])}")
+                console.print(f"  [red]✗[/red] Failed to get credentials for {account_name}")
         
         return sessions
 
@@ -19,6 +19,10 @@ from rich.columns import Columns
 
 from sso_auth import SSOAuthenticator
 from ai_service_discovery import AIServiceDiscovery
+from cost_explorer_fetcher import sum_total_cost
+from cost_explorer_meter import metered_ce_client, metering_scope, get_meter
+from account_executor import live_progress_enabled, run_for_accounts
+from client_pool import pooled_client
 
 console = Console()
 
@@ -33,7 +37,7 @@ class SSOCostCalculator:
                                     discovered: Dict, start_date: str = None, end_date: str = None,
                                     additional_services: List[str] = None) -> Dict:
         """Calculate costs for discovered AI resources"""
-        ce_client = session.client('ce', region_name='us-east-1')
+        ce_client = metered_ce_client(session)
         
         # Use provided dates or default to current month
         if not start_date or not end_date:
@@ -57,7 +61,7 @@ class SSOCostCalculator:
         
         # Get account ID from session
         try:
-            sts = session.client('sts')
+            sts = pooled_client(session, 'sts')
             account_id = sts.get_caller_identity()['Account']
         except:
             console.print(f"[yellow]Warning: Could not get account ID for {account_name}[/yellow]")
@@ -67,7 +71,8 @@ class SSOCostCalculator:
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
-            console=console
+            console=console,
+            disable=not live_progress_enabled()
         ) as progress:
             
             # Lambda costs
@@ -163,7 +168,8 @@ class SSOCostCalculator:
         
         try:
             # Get total Lambda costs
-            response = ce_client.get_cost_and_usage(
+            total_cost = sum_total_cost(
+                ce_client.get_cost_and_usage,
                 TimePeriod={'Start': start_date, 'End': end_date},
                 Granularity='MONTHLY',
                 Metrics=['UnblendedCost'],
@@ -175,11 +181,6 @@ class SSOCostCalculator:
                 }
             )
             
-            total_cost = Decimal('0')
-            for result in response.get('ResultsByTime', []):
-                amount = result['Total']['UnblendedCost']['Amount']
-                total_cost += Decimal(amount)
-            
             # For now, return full Lambda cost if we have AI functions
             # In production, you'd want to use CloudWatch metrics for more accuracy
             return total_cost
@@ -207,7 +208,8 @@ class SSOCostCalculator:
                     for tag_key, tag_value in bucket['tags'].items():
                         if tag_key in ['Project', 'project']:
                             try:
-                                response = ce_client.get_cost_and_usage(
+                                total_cost += sum_total_cost(
+                                    ce_client.get_cost_and_usage,
                                     TimePeriod={'Start': start_date, 'End': end_date},
                                     Granularity='MONTHLY',
                                     Metrics=['UnblendedCost'],
@@ -219,17 +221,14 @@ class SSOCostCalculator:
                                         ]
                                     }
                                 )
-                                
-                                for result in response.get('ResultsByTime', []):
-                                    amount = result['Total']['UnblendedCost']['Amount']
-                                    total_cost += Decimal(amount)
                                 break
                             except:
                                 pass
             
             # If no tag-based costs found, estimate based on total S3 costs
             if total_cost == 0:
-                response = ce_client.get_cost_and_usage(
+                total_s3_cost = sum_total_cost(
+                    ce_client.get_cost_and_usage,
                     TimePeriod={'Start': start_date, 'End': end_date},
                     Granularity='MONTHLY',
                     Metrics=['UnblendedCost'],
@@ -241,11 +240,6 @@ class SSOCostCalculator:
                     }
                 )
                 
-                total_s3_cost = Decimal('0')
-                for result in response.get('ResultsByTime', []):
-                    amount = result['Total']['UnblendedCost']['Amount']
-                    total_s3_cost += Decimal(amount)
-                
                 # Estimate AI portion (you can adjust this percentage)
                 total_cost = total_s3_cost * Decimal('0.3')  # Assume 30% for AI
             
@@ -263,7 +257,8 @@ class SSOCostCalculator:
         
         try:
             # Similar approach to S3
-            response = ce_client.get_cost_and_usage(
+            total_cost = sum_total_cost(
+                ce_client.get_cost_and_usage,
                 TimePeriod={'Start': start_date, 'End': end_date},
                 Granularity='MONTHLY',
                 Metrics=['UnblendedCost'],
@@ -275,11 +270,6 @@ class SSOCostCalculator:
                 }
             )
             
-            total_cost = Decimal('0')
-            for result in response.get('ResultsByTime', []):
-                amount = result['Total']['UnblendedCost']['Amount']
-                total_cost += Decimal(amount)
-            
             # Return full cost if we have AI tables
             return total_cost
             
@@ -291,7 +281,8 @@ class SSOCostCalculator:
                                start_date: str, end_date: str, account_id: str) -> Decimal:
         """Calculate costs for a specific AWS service"""
         try:
-            response = ce_client.get_cost_and_usage(
+            total_cost = sum_total_cost(
+                ce_client.get_cost_and_usage,
                 TimePeriod={'Start': start_date, 'End': end_date},
                 Granularity='MONTHLY',
                 Metrics=['UnblendedCost'],
@@ -303,11 +294,6 @@ class SSOCostCalculator:
                 }
             )
             
-            total_cost = Decimal('0')
-            for result in response.get('ResultsByTime', []):
-                amount = result['Total']['UnblendedCost']['Amount']
-                total_cost += Decimal(amount)
-            
             return total_cost
             
         except Exception as e:
@@ -440,30 +426,47 @@ class SSOCostCalculator:
                 console.print("[red]No authenticated sessions available[/red]")
                 return
             
-            # Discover resources in each account
-            console.print("\n[bold]Discovering AI Resources...[/bold]\n")
-            discoveries = []
+            # Discover resources and calculate costs for every account concurrently
+            console.print("\n[bold]Discovering AI Resources and Calculating Costs...[/bold]\n")
             
-            for account_name, session in sessions:
+            def process_account(account):
+                account_name, session = account
                 discovery = self.discovery.discover_all_services(session, account_name)
-                discoveries.append(discovery)
-                self.discovered_resources.append(discovery)
+                return discovery, self.calculate_costs_for_resources(session, account_name, discovery)
             
-            # Print discovery summary
-            self.discovery.print_discovery_summary(discoveries)
+            def report(outcome):
+                account_name = outcome['account'][0]
+                if outcome['error']:
+                    console.print(f"  [red]✗[/red] {account_name}: {outcome['error']}")
+                else:
+                    console.print(f"  [green]✓[/green] {account_name}")
             
-            # Calculate costs
-            console.print("\n[bold]Calculating Costs...[/bold]\n")
-            all_costs = []
+            with metering_scope(route='sso_cost_calculator') as scope:
+                outcomes = run_for_accounts(sessions, process_account, on_done=report)
             
-            for (account_name, session), discovery in zip(sessions, discoveries):
-                costs = self.calculate_costs_for_resources(session, account_name, discovery)
+            # Failed accounts are reported above and left out of the results
+            discoveries = []
+            all_costs = []
+            for outcome in outcomes:
+                if outcome['error']:
+                    continue
+                account_name = outcome['account'][0]
+                discovery, costs = outcome['result']
+                discoveries.append(discovery)
+                self.discovered_resources.append(discovery)
                 all_costs.append(costs)
                 self.cost_data[account_name] = costs
             
+            # Print discovery summary
+            self.discovery.print_discovery_summary(discoveries)
+            
             # Print cost summary
             self.print_cost_summary(all_costs)
             
+            ce_usage = get_meter().get_stats(scope)['run']
+            console.print(f"[dim]Cost Explorer requests this run: {ce_usage['requests']} "
+                          f"(~${ce_usage['estimated_cost']:.2f})[/dim]")
+            
             # Export results
             self.export_results(all_costs, discoveries)
             
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Bulk resource tag prefetch
+Pulls the tags of every tagged resource in an account and region with a few paginated
+tag:GetResources calls and indexes them by ARN, replacing one tag call per resource.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+import boto3
+
+from rate_limiter import rate_limited_client
+
+logger = logging.getLogger(__name__)
+
+# How long a prefetched index is reused for the same account and region
+TAG_INDEX_TTL = int(os.environ.get('TAG_INDEX_TTL', '300'))
+
+# Largest page tag:GetResources allows
+RESOURCES_PER_PAGE = 100
+
+
+def tag_list_to_dict(tags: List[Dict]) -> Dict[str, str]:
+    """Convert [{'Key': k, 'Value': v}] to {k: v}"""
+    return {tag['Key']: tag['Value'] for tag in tags or []}
+
+
+def _arn_region(arn: str) -> str:
+    parts = (arn or '').split(':')
+    return parts[3] if len(parts) > 3 else ''
+
+
+class TagIndex:
+    """Tags for every tagged resource in one account and region, keyed by ARN"""
+    
+    def __init__(self, region: str, tags_by_arn: Dict[str, Dict[str, str]] = None, complete: bool = False):
+        self.region = region
+        self.tags_by_arn = tags_by_arn or {}
+        # False when the prefetch failed (e.g. no tag:GetResources permission)
+        self.complete = complete
+        self.created = time.monotonic()
+        self.fallback_lookups = 0
+    
+    @classmethod
+    def prefetch(cls, session: boto3.Session, region: str = None) -> 'TagIndex':
+        """Fetch all tags in a region with paginated tag:GetResources calls"""
+        region = region or session.region_name or 'us-east-1'
+        tags_by_arn = {}
+        try:
+            client = rate_limited_client(session, 'resourcegroupstaggingapi', region_name=region)
+            paginator = client.get_paginator('get_resources')
+            for page in paginator.paginate(ResourcesPerPage=RESOURCES_PER_PAGE):
+                for mapping in page.get('ResourceTagMappingList', []):
+                    tags_by_arn[mapping['ResourceARN']] = tag_list_to_dict(mapping.get('Tags', []))
+        except Exception as e:
+            logger.warning(f"Tag prefetch failed in {region}, using per-resource tag calls: {e}")
+            return cls(region, tags_by_arn, complete=False)
+        
+        logger.debug(f"Prefetched tags for {len(tags_by_arn)} resources in {region}")
+        return cls(region, tags_by_arn, complete=True)
+    
+    def lookup(self, arn: Optional[str], fallback: Callable[[], Dict[str, str]] = None,
+               region: str = None) -> Dict[str, str]:
+        """Tags for a resource; fallback() is only called when the index cannot answer
+        
+        A complete index holds every tagged resource in its region, so a
+        missing ARN from that region means the resource has no tags. S3
+        bucket ARNs carry no region, so pass the bucket's region explicitly.
+        """
+        if arn and arn in self.tags_by_arn:
+            return dict(self.tags_by_arn[arn])
+        
+        if self.complete and arn and (region or _arn_region(arn)) == self.region:
+            return {}
+        
+        if fallback is None:
+            return {}
+        self.fallback_lookups += 1
+        try:
+            return fallback() or {}
+        except Exception:
+            return {}
+    
+    def is_expired(self) -> bool:
+        return time.monotonic() - self.created > TAG_INDEX_TTL
+
+
+_indexes = {}
+_index_locks = {}
+_indexes_lock = threading.Lock()
+
+
+def credentials_key(session: boto3.Session) -> Optional[str]:
+    """Identify the account a session acts as by its access key"""
+    credentials = session.get_credentials()
+    if credentials is None:
+        return None
+    return credentials.get_frozen_credentials().access_key
+
+
+def get_tag_index(session: boto3.Session, region: str = None) -> TagIndex:
+    """Return the tag index for the session's account and region, prefetching it once
+    
+    Concurrent discovery workers for the same account share one prefetch.
+    """
+    region = region or session.region_name or 'us-east-1'
+    key = (credentials_key(session), region)
+    
+    with _indexes_lock:
+        lock = _index_locks.setdefault(key, threading.Lock())
+    
+    with lock:
+        index = _indexes.get(key)
+        if index is None or index.is_expired():
+            index = TagIndex.prefetch(session, region)
+            with _indexes_lock:
+                _indexes[key] = index
+        return index
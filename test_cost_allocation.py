@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test the fixed-point cost allocation
+Both allocation paths must give identical shares, and every allocated column must add up
+exactly to its amount, including credits (negative amounts), unused columns and ties.
+"""
+
+import random
+
+import pytest
+
+import cost_allocation
+from cost_allocation import _allocate_python, allocate, from_units, to_units
+
+
+def random_matrix(rng: random.Random):
+    """Counts and amounts with zero columns, credits and tied counts mixed in"""
+    rows = rng.randint(1, 8)
+    columns = rng.randint(1, 6)
+    counts = [[rng.choice((0, 0, 1, 1, 2, 3, rng.randint(0, 50))) for _ in range(columns)] for _ in range(rows)]
+    # Leave one column without counts when there is room for it
+    if columns > 1:
+        for row in counts:
+            row[0] = 0
+    amounts = [rng.choice((0, 1, -1, rng.randint(-10 ** 8, 10 ** 8))) for _ in range(columns)]
+    return counts, amounts
+
+
+def assert_exact(counts, amounts, shares):
+    for column, amount in enumerate(amounts):
+        allocated = [row[column] for row in shares]
+        if sum(row[column] for row in counts) > 0:
+            assert sum(allocated) == amount
+        else:
+            assert allocated == [0] * len(counts)
+
+
+def test_columns_sum_exactly():
+    rng = random.Random(25)
+    for _ in range(300):
+        counts, amounts = random_matrix(rng)
+        assert_exact(counts, amounts, allocate(counts, amounts))
+
+
+def test_ties_go_to_earlier_rows():
+    assert _allocate_python([[1], [1], [1]], [2]) == [[1], [1], [0]]
+    assert _allocate_python([[1], [1], [1]], [-2]) == [[0], [-1], [-1]]
+
+
+def test_units_round_trip():
+    assert to_units('12.3456785') == 12345678
+    assert from_units(to_units('-0.000001')) == from_units(-1)
+
+
+def test_numpy_matches_python():
+    pytest.importorskip('numpy')
+    rng = random.Random(2025)
+    for _ in range(300):
+        counts, amounts = random_matrix(rng)
+        shares = cost_allocation._allocate_numpy(counts, amounts)
+        assert shares == _allocate_python(counts, amounts)
+        assert_exact(counts, amounts, shares)
+
+
+def test_numpy_ties_and_credits():
+    pytest.importorskip('numpy')
+    counts = [[1, 0, 2], [1, 0, 2], [1, 0, 2]]
+    amounts = [2, 7, -5]
+    assert cost_allocation._allocate_numpy(counts, amounts) == _allocate_python(counts, amounts) == \
+        [[1, 0, -1], [1, 0, -2], [0, 0, -2]]
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Offline regression tests for the Cost Explorer pipeline
+Runs the fetcher, incremental ingestion and query budgets against the local Cost Explorer
+stand-in, so none of them need AWS.
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from cost_explorer_cache import CachedCostExplorerClient, CostExplorerCache
+from cost_explorer_fetcher import iter_cost_pages, sum_costs_by_group, sum_total_cost
+from cost_explorer_meter import QueryBudgetExceeded, get_meter, metering_scope
+from cost_ingestion import IncrementalCostIngestor, account_breakdown_request
+from cost_warehouse import CostWarehouse
+from local_cost_explorer import LocalCostExplorerClient, SyntheticCostSource
+
+ACCOUNT_A = '111111111111'
+ACCOUNT_B = '222222222222'
+PERIOD = {'Start': '2025-06-01', 'End': '2025-06-21'}
+
+
+@pytest.fixture
+def source():
+    return SyntheticCostSource(
+        accounts=[ACCOUNT_A, ACCOUNT_B], services=['AWS Lambda', 'Amazon Bedrock'],
+        projects=['alpha', 'beta'], usage_types_per_service=3, seed='offline-tests'
+    )
+
+
+def expected_totals(source, start_date, end_date, key, keep=lambda record: True):
+    """Fold the source's records directly, as Cost Explorer would"""
+    totals = {}
+    for record in source.iter_records(start_date, end_date):
+        if keep(record):
+            group = key(record)
+            totals[group] = totals.get(group, Decimal('0')) + record['amount']
+    return totals
+
+
+def test_filter_and_group_by(source):
+    client = LocalCostExplorerClient(source, page_size=1000)
+    totals = sum_costs_by_group(
+        client.get_cost_and_usage,
+        TimePeriod=PERIOD, Granularity='MONTHLY', Metrics=['UnblendedCost'],
+        Filter={'And': [
+            {'Dimensions': {'Key': 'LINKED_ACCOUNT', 'Values': [ACCOUNT_A]}},
+            {'Not': {'Dimensions': {'Key': 'SERVICE', 'Values': ['Amazon Bedrock']}}}
+        ]},
+        GroupBy=[{'Type': 'DIMENSION', 'Key': 'SERVICE'}, {'Type': 'TAG', 'Key': 'Project'}]
+    )
+    
+    expected = expected_totals(
+        source, PERIOD['Start'], PERIOD['End'],
+        key=lambda record: (record['dimensions']['SERVICE'], f"Project${record['tags'].get('Project', '')}"),
+        keep=lambda record: record['dimensions']['LINKED_ACCOUNT'] == ACCOUNT_A and
+        record['dimensions']['SERVICE'] != 'Amazon Bedrock'
+    )
+    assert totals == expected
+    assert {service for service, _ in totals} == {'AWS Lambda'}
+
+
+def test_tag_filter(source):
+    client = LocalCostExplorerClient(source, page_size=1000)
+    totals = sum_costs_by_group(
+        client.get_cost_and_usage,
+        TimePeriod=PERIOD, Granularity='DAILY', Metrics=['UnblendedCost'],
+        Filter={'Tags': {'Key': 'Project', 'Values': ['alpha']}},
+        GroupBy=[{'Type': 'TAG', 'Key': 'Project'}]
+    )
+    expected = sum(
+        record['amount'] for record in source.iter_records(PERIOD['Start'], PERIOD['End'])
+        if record['tags'].get('Project') == 'alpha'
+    )
+    assert totals == {('Project$alpha',): expected}
+
+
+def test_next_page_token_covers_every_group_once(source):
+    request = dict(
+        TimePeriod=PERIOD, Granularity='DAILY', Metrics=['UnblendedCost'],
+        GroupBy=[{'Type': 'DIMENSION', 'Key': 'SERVICE'}, {'Type': 'DIMENSION', 'Key': 'USAGE_TYPE'}]
+    )
+    paged = LocalCostExplorerClient(source, page_size=7)
+    unpaged = LocalCostExplorerClient(source, page_size=100000)
+    
+    def flatten(pages):
+        return [(result['TimePeriod']['Start'], tuple(group['Keys']))
+                for page in pages for result in page['ResultsByTime'] for group in result['Groups']]
+    
+    pages = list(iter_cost_pages(paged.get_cost_and_usage, **request))
+    assert len(pages) > 1
+    assert all(page.get('NextPageToken') for page in pages[:-1])
+    assert 'NextPageToken' not in pages[-1]
+    assert all(sum(len(result['Groups']) for result in page['ResultsByTime']) <= 7 for page in pages)
+    
+    unpaged_pages = list(iter_cost_pages(unpaged.get_cost_and_usage, **request))
+    assert len(unpaged_pages) == 1
+    assert flatten(pages) == flatten(unpaged_pages)
+
+
+def test_invalid_page_token_is_rejected(source):
+    client = LocalCostExplorerClient(source)
+    with pytest.raises(Exception) as error:
+        client.get_cost_and_usage(TimePeriod=PERIOD, Granularity='DAILY', Metrics=['UnblendedCost'],
+                                  NextPageToken='not-a-token')
+    assert error.value.response['Error']['Code'] == 'InvalidNextTokenException'
+
+
+def test_paged_totals_match_unpaged(source):
+    paged = LocalCostExplorerClient(source, page_size=3)
+    unpaged = LocalCostExplorerClient(source, page_size=100000)
+    grouped = dict(
+        TimePeriod=PERIOD, Granularity='DAILY', Metrics=['UnblendedCost'],
+        GroupBy=[{'Type': 'DIMENSION', 'Key': 'LINKED_ACCOUNT'}, {'Type': 'DIMENSION', 'Key': 'SERVICE'}]
+    )
+    ungrouped = dict(TimePeriod=PERIOD, Granularity='DAILY', Metrics=['UnblendedCost'])
+    
+    assert sum_costs_by_group(paged.get_cost_and_usage, **grouped) == \
+        sum_costs_by_group(unpaged.get_cost_and_usage, **grouped)
+    assert sum_total_cost(paged.get_cost_and_usage, **ungrouped) == \
+        sum_total_cost(unpaged.get_cost_and_usage, **ungrouped) == \
+        sum(record['amount'] for record in source.iter_records(PERIOD['Start'], PERIOD['End']))
+    assert paged.requests_served > unpaged.requests_served
+
+
+def test_ingestor_rerun_fetches_only_unsettled_days(source):
+    client = LocalCostExplorerClient(source, page_size=100000)
+    today = datetime(2025, 6, 20)
+    request = account_breakdown_request(ACCOUNT_A)
+    ingestor = IncrementalCostIngestor(client, ACCOUNT_A, store=CostWarehouse(':memory:'), resettle_days=3)
+    
+    first = ingestor.get_totals(request, PERIOD['Start'], PERIOD['End'], today=today)
+    first_run_queries = ingestor.queries_made
+    second = ingestor.get_totals(request, PERIOD['Start'], PERIOD['End'], today=today)
+    
+    assert ingestor.queries_made - first_run_queries == 1
+    assert first == second == expected_totals(
+        source, PERIOD['Start'], PERIOD['End'],
+        key=lambda record: (record['dimensions']['SERVICE'], record['dimensions']['USAGE_TYPE']),
+        keep=lambda record: record['dimensions']['LINKED_ACCOUNT'] == ACCOUNT_A
+    )
+
+
+def test_budget_exceeded_serves_stale_cache(source, tmp_path):
+    # An open-month period, so cached entries are expired as soon as they are written
+    today = datetime.now()
+    request = dict(
+        TimePeriod={'Start': today.replace(day=1).strftime('%Y-%m-%d'),
+                    'End': (today + timedelta(days=1)).strftime('%Y-%m-%d')},
+        Granularity='MONTHLY', Metrics=['UnblendedCost']
+    )
+    client = CachedCostExplorerClient(
+        LocalCostExplorerClient(source), cache=CostExplorerCache(str(tmp_path), ttl_seconds=-1),
+        account_id=ACCOUNT_A
+    )
+    
+    with metering_scope(run_budget=1) as scope:
+        fresh = client.get_cost_and_usage(**request)
+        stale = client.get_cost_and_usage(**request)
+        assert stale['ResultsByTime'] == fresh['ResultsByTime']
+        
+        # Nothing cached for another query, so the spent budget surfaces
+        with pytest.raises(QueryBudgetExceeded):
+            client.get_cost_and_usage(**dict(request, Metrics=['BlendedCost']))
+        
+        usage = get_meter().get_stats(scope)['run']
+    
+    assert usage['requests'] == 1
+    assert usage['served_stale'] == 1
+    assert usage['denied'] == 2
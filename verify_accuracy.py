@@ -9,13 +9,16 @@ from datetime import datetime, timedelta
 from decimal import Decimal
 import json
 
+from cost_explorer_fetcher import sum_total_cost
+from cost_explorer_meter import metered_ce_client
+
 def verify_costs():
     """Compare calculator costs with direct AWS API calls"""
     print("🔍 Verifying Cost Accuracy\n")
     
     # Initialize boto3 session
     session = boto3.Session(profile_name='sa-sandbox')
-    ce_client = session.client('ce', region_name='us-east-1')
+    ce_client = metered_ce_client(session)
     
     # Date range - last 30 days
     end_date = datetime.now().date()
@@ -57,7 +60,8 @@ def verify_costs():
     for service in services_to_verify:
         try:
             # Get cost from AWS Cost Explorer
-            response = ce_client.get_cost_and_usage(
+            service_cost = sum_total_cost(
+                ce_client.get_cost_and_usage,
                 TimePeriod={
                     'Start': start_date.strftime('%Y-%m-%d'),
                     'End': end_date.strftime('%Y-%m-%d')
@@ -72,12 +76,6 @@ def verify_costs():
                 }
             )
             
-            # Calculate total cost for service
-            service_cost = Decimal('0')
-            for result in response['ResultsByTime']:
-                amount = Decimal(result['Total']['UnblendedCost']['Amount'])
-                service_cost += amount
-            
             # Calculate AI portion
             ai_cost = service_cost * Decimal(str(service['ai_percentage'] / 100))
             
@@ -7,10 +7,14 @@ Provides web interface for the SSO cost calculator
 import os
 import sys
 import json
+import queue
 import logging
+import threading
+import contextvars
 from datetime import datetime
 from decimal import Decimal
-from flask import Flask, render_template, jsonify, request, session, redirect, url_for
+from flask import Flask, Response, render_template, jsonify, request, session, redirect, url_for, g, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from botocore.exceptions import ClientError
 import secrets
@@ -25,10 +29,18 @@ from sso_wrapper import WebSSOAuthenticator
 # Import from parent directory
 sys.path.insert(0, parent_dir)
 
+from cost_explorer_meter import metering_scope, get_meter
+from account_executor import run_for_accounts
+from discovery_cache import get_discovery_cache
+from resource_record import ResourceRecord, json_default
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Discovery events buffered per streaming request before discovery waits for the client
+DISCOVERY_STREAM_BUFFER = int(os.environ.get('DISCOVERY_STREAM_BUFFER', '256'))
+
 # Use enhanced modules
 try:
     from enhanced_ai_discovery import EnhancedAIDiscovery as AIServiceDiscovery
@@ -50,16 +62,28 @@ except ImportError as e:
     OptimizationEngine = None
 
 class DecimalEncoder(json.JSONEncoder):
-    """Custom JSON encoder for Decimal objects"""
+    """Custom JSON encoder for Decimal objects and resource records"""
     def default(self, o):
         if isinstance(o, Decimal):
             return float(o)
+        if isinstance(o, ResourceRecord):
+            return o.to_dict()
         return super(DecimalEncoder, self).default(o)
 
+class DecimalJSONProvider(DefaultJSONProvider):
+    """jsonify support for Decimal objects and resource records"""
+    @staticmethod
+    def default(o):
+        if isinstance(o, (Decimal, ResourceRecord)):
+            return json_default(o)
+        return DefaultJSONProvider.default(o)
+
 def convert_decimals(obj):
-    """Recursively convert Decimal objects to float in dictionaries"""
+    """Recursively convert Decimal objects to float and resource records to dicts"""
     if isinstance(obj, Decimal):
         return float(obj)
+    elif isinstance(obj, ResourceRecord):
+        return convert_decimals(obj.to_dict())
     elif isinstance(obj, dict):
         return {k: convert_decimals(v) for k, v in obj.items()}
     elif isinstance(obj, list):
@@ -71,6 +95,7 @@ app.config['TEMPLATES_AUTO_RELOAD'] = True
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
 app.secret_key = secrets.token_hex(32)
 app.json_encoder = DecimalEncoder
+app.json = DecimalJSONProvider(app)
 # Enable CORS with credentials support
 CORS(app, resources={r"/api/*": {
     "origins": ["http://localhost:5000", "http://127.0.0.1:5000", "http://10.0.0.64:5000"],
@@ -82,6 +107,20 @@ CORS(app, resources={r"/api/*": {
 # Store calculator instances in session
 calculators = {}
 
+@app.before_request
+def start_ce_metering():
+    """Attribute Cost Explorer requests made while serving an API call to its route and session"""
+    if request.path.startswith('/api/'):
+        g.ce_metering = metering_scope(route=request.endpoint, session=session.get('session_id'))
+        g.ce_scope = g.ce_metering.__enter__()
+
+@app.teardown_request
+def stop_ce_metering(exc=None):
+    """Close the Cost Explorer metering scope opened for this request"""
+    metering = g.pop('ce_metering', None)
+    if metering is not None:
+        metering.__exit__(None, None, None)
+
 @app.route('/')
 def index():
     """Serve the main web interface"""
@@ -96,6 +135,36 @@ def test_api():
         'timestamp': datetime.now().isoformat()
     })
 
+@app.route('/api/rate-limits', methods=['GET'])
+def get_rate_limits():
+    """Get AWS API rate limiter counters per API family"""
+    from rate_limiter import get_rate_limiter_stats
+    return jsonify({
+        'status': 'ok',
+        'limiters': get_rate_limiter_stats()
+    })
+
+@app.route('/api/attribution-cache', methods=['GET'])
+def get_attribution_cache_stats():
+    """Get project attribution cache hit/miss counters"""
+    from attribution_cache import get_attribution_cache
+    return jsonify({
+        'status': 'ok',
+        'cache': get_attribution_cache().get_stats()
+    })
+
+@app.route('/api/ce-usage', methods=['GET'])
+def get_ce_usage():
+    """Get Cost Explorer request counts and estimated spend of the calculator itself
+    
+    ?recent=N lists the N most recent runs and sessions (default CE_METER_RECENT_RUNS).
+    """
+    recent = request.args.get('recent', type=int)
+    return jsonify({
+        'status': 'ok',
+        'usage': get_meter().get_stats(recent=max(recent, 0) if recent is not None else None)
+    })
+
 @app.route('/api/ai-services', methods=['GET'])
 def get_ai_services():
     """Get available AI services configuration"""
@@ -281,19 +350,8 @@ def select_accounts():
         'selected_count': len(selected_account_ids)
     })
 
-@app.route('/api/discover', methods=['POST'])
-def discover_resources():
-    """Discover AI resources in selected accounts"""
-    session_id = session.get('session_id')
-    if not session_id or session_id not in calculators:
-        return jsonify({'error': 'Not authenticated'}), 401
-    
-    calc_data = calculators[session_id]
-    authenticator = calc_data['authenticator']
-    discovery = calc_data['discovery']
-    
-    # Get parameters from request
-    data = request.json or {}
+def _discovery_accounts(calc_data, data):
+    """Store the discovery parameters and return (selected accounts, error response)"""
     start_date = data.get('start_date')
     end_date = data.get('end_date')
     additional_services = data.get('additional_services', [])
@@ -304,85 +362,256 @@ def discover_resources():
     calc_data['end_date'] = end_date
     calc_data['additional_services'] = additional_services
     calc_data['account_filter'] = account_filter
+    # refresh=true rescans instead of reusing a discovery shared by another session
+    calc_data['refresh_discovery'] = bool(data.get('refresh', False))
     
-    try:
-        # Get sessions for selected accounts
-        all_accounts = authenticator.list_accounts(calc_data['auth_info']['access_token'])
-        selected_account_ids = calc_data.get('selected_accounts', [])
+    # Get sessions for selected accounts
+    all_accounts = calc_data['authenticator'].list_accounts(calc_data['auth_info']['access_token'])
+    selected_account_ids = calc_data.get('selected_accounts', [])
+    
+    if not selected_account_ids:
+        return None, (jsonify({'error': 'No accounts selected. Please select at least one account.'}), 400)
         
-        if not selected_account_ids:
-            return jsonify({'error': 'No accounts selected. Please select at least one account.'}), 400
-            
-        selected_accounts = [acc for acc in all_accounts if acc['accountId'] in selected_account_ids]
+    selected_accounts = [acc for acc in all_accounts if acc['accountId'] in selected_account_ids]
+    
+    if not selected_accounts:
+        return None, (jsonify({'error': 'None of the selected accounts could be found.'}), 404)
         
-        if not selected_accounts:
-            return jsonify({'error': 'None of the selected accounts could be found.'}), 404
+    logger.info(f"Processing {len(selected_accounts)} selected accounts out of {len(all_accounts)} total accounts")
+    logger.info(f"Selected accounts: {[acc.get('accountName', acc['accountId']) for acc in selected_accounts]}")
+    
+    # Apply account filter
+    if account_filter != 'all':
+        filtered_accounts = [
+            acc for acc in selected_accounts 
+            if account_filter.lower() in acc.get('accountName', '').lower()
+        ]
+        logger.info(f"After applying filter '{account_filter}': {len(filtered_accounts)} accounts remain")
+        selected_accounts = filtered_accounts
+    
+    return selected_accounts, None
+
+def _account_boto_session(calc_data, account):
+    """boto3 session for an SSO account, or None when no credentials were issued"""
+    creds = calc_data['authenticator'].get_role_credentials(calc_data['auth_info']['access_token'], account['accountId'])
+    if not creds:
+        return None
+    
+    import boto3
+    return boto3.Session(
+        aws_access_key_id=creds['AccessKeyId'],
+        aws_secret_access_key=creds['SecretAccessKey'],
+        aws_session_token=creds['SessionToken'],
+        region_name='us-east-1'
+    )
+
+def _store_discoveries(calc_data, outcomes):
+    """Keep successful discoveries, keyed by account id so later steps never pair them by position"""
+    calc_data['discoveries_by_account'] = {
+        outcome['account']['accountId']: outcome['result']
+        for outcome in outcomes if outcome['result'] is not None
+    }
+    calc_data['discoveries'] = list(calc_data['discoveries_by_account'].values())
+    return calc_data['discoveries']
+
+def _accounts_with_discoveries(calc_data, accounts):
+    """(account, discovery) pairs for the accounts that were discovered, and the ones that were not"""
+    by_account = calc_data.get('discoveries_by_account', {})
+    paired = [(account, by_account[account['accountId']]) for account in accounts if account['accountId'] in by_account]
+    missing = [account for account in accounts if account['accountId'] not in by_account]
+    return paired, missing
+
+def _failed_accounts(outcomes):
+    return [
+        {'account': outcome['account'].get('accountName', outcome['account']['accountId']),
+         'error': outcome['error']}
+        for outcome in outcomes if outcome['error']
+    ]
+
+@app.route('/api/discover', methods=['POST'])
+def discover_resources():
+    """Discover AI resources in selected accounts"""
+    session_id = session.get('session_id')
+    if not session_id or session_id not in calculators:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    calc_data = calculators[session_id]
+    discovery = calc_data['discovery']
+    
+    try:
+        selected_accounts, error_response = _discovery_accounts(calc_data, request.json or {})
+        if error_response:
+            return error_response
+        start_date = calc_data['start_date']
+        additional_services = calc_data['additional_services']
+        use_cache = not calc_data['refresh_discovery']
+        
+        def discover_account(account):
+            boto_session = _account_boto_session(calc_data, account)
+            if boto_session is None:
+                return None
             
-        logger.info(f"Processing {len(selected_accounts)} selected accounts out of {len(all_accounts)} total accounts")
-        logger.info(f"Selected accounts: {[acc.get('accountName', acc['accountId']) for acc in selected_accounts]}")
-        
-        # Apply account filter
-        if account_filter != 'all':
-            filtered_accounts = [
-                acc for acc in selected_accounts 
-                if account_filter.lower() in acc.get('accountName', '').lower()
-            ]
-            logger.info(f"After applying filter '{account_filter}': {len(filtered_accounts)} accounts remain")
-            selected_accounts = filtered_accounts
-        
-        discoveries = []
-        for account in selected_accounts:
-            # Get credentials
-            creds = authenticator.get_role_credentials(
-                calc_data['auth_info']['access_token'],
-                account['accountId']
-            )
+            # Discover resources with additional services
+            account_name = account.get('accountName', account['accountId'])
+            logger.info(f"Discovering resources in account: {account_name} ({account['accountId']})")
             
-            if creds:
-                # Create boto3 session
-                import boto3
-                boto_session = boto3.Session(
-                    aws_access_key_id=creds['AccessKeyId'],
-                    aws_secret_access_key=creds['SecretAccessKey'],
-                    aws_session_token=creds['SessionToken'],
-                    region_name='us-east-1'
+            # Use enhanced discovery if available
+            if hasattr(discovery, 'discover_all_ai_resources'):
+                return discovery.discover_all_ai_resources(
+                    boto_session, 
+                    account_name,
+                    additional_services=additional_services,
+                    since=start_date,
+                    use_cache=use_cache
                 )
-                
-                # Discover resources with additional services
-                account_name = account.get('accountName', account['accountId'])
-                logger.info(f"Discovering resources in account: {account_name} ({account['accountId']})")
-                
-                # Use enhanced discovery if available
-                logger.info(f"Discovery class: {discovery.__class__.__name__}")
-                logger.info(f"Has discover_all_ai_resources: {hasattr(discovery, 'discover_all_ai_resources')}")
-                
-                if hasattr(discovery, 'discover_all_ai_resources'):
-                    logger.info("✅ Using ENHANCED discover_all_ai_resources method")
-                    discovery_result = discovery.discover_all_ai_resources(
-                        boto_session, 
-                        account_name,
-                        additional_services=additional_services
-                    )
-                else:
-                    logger.warning("⚠️  Using ORIGINAL discover_all_services method")
-                    discovery_result = discovery.discover_all_services(
-                        boto_session, 
-                        account_name,
-                        additional_services=additional_services
-                    )
-                discoveries.append(discovery_result)
+            logger.warning("⚠️  Using ORIGINAL discover_all_services method")
+            return discovery.discover_all_services(
+                boto_session, 
+                account_name,
+                additional_services=additional_services,
+                use_cache=use_cache
+            )
+        
+        logger.info(f"Discovery class: {discovery.__class__.__name__}")
+        outcomes = run_for_accounts(selected_accounts, discover_account, description='Discovery')
         
         # Store discoveries
-        calc_data['discoveries'] = discoveries
+        discoveries = _store_discoveries(calc_data, outcomes)
         
         return jsonify({
             'status': 'discovery_complete',
-            'discoveries': discoveries
+            'discoveries': discoveries,
+            'failed_accounts': _failed_accounts(outcomes)
         })
     except Exception as e:
         logger.error(f"Discovery error: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/discover/stream', methods=['POST'])
+def discover_resources_stream():
+    """Discover AI resources and stream them as newline-delimited JSON events
+    
+    Sends each discovery event as it is found, an 'account_complete' event
+    per account, and a final 'complete' event with the same payload as
+    /api/discover.
+    """
+    session_id = session.get('session_id')
+    if not session_id or session_id not in calculators:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    calc_data = calculators[session_id]
+    discovery = calc_data['discovery']
+    if not hasattr(discovery, 'iter_ai_resources'):
+        return discover_resources()
+    
+    try:
+        selected_accounts, error_response = _discovery_accounts(calc_data, request.json or {})
+        if error_response:
+            return error_response
+    except Exception as e:
+        logger.error(f"Discovery error: {e}")
+        return jsonify({'error': str(e)}), 500
+    start_date = calc_data['start_date']
+    additional_services = calc_data['additional_services']
+    use_cache = not calc_data['refresh_discovery']
+    # Bounded, so a slow client holds back discovery instead of buffering every event
+    events = queue.Queue(maxsize=DISCOVERY_STREAM_BUFFER)
+    # Set once the client has gone away, so the discovery thread stops
+    cancelled = threading.Event()
+    
+    def publish(event) -> bool:
+        while not cancelled.is_set():
+            try:
+                events.put(event, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def discover_account(account):
+        if cancelled.is_set():
+            return None
+        boto_session = _account_boto_session(calc_data, account)
+        if boto_session is None:
+            return None
+        account_name = account.get('accountName', account['accountId'])
+        
+        def forward():
+            found = discovery.iter_ai_resources(boto_session, account_name,
+                                                additional_services=additional_services, since=start_date,
+                                                use_cache=use_cache)
+            try:
+                for event in found:
+                    if not publish(event):
+                        return
+                    yield event
+            finally:
+                # Closing the discovery cancels its pending region scans
+                found.close()
+        return discovery.collect_discovery_events(forward(), account_name)
+    
+    completed = []
+    
+    def account_done(outcome):
+        completed.append(outcome)
+        publish({
+            'event': 'account_complete',
+            'account': outcome['account'].get('accountName', outcome['account']['accountId']),
+            'error': outcome['error'],
+            'completed': len(completed),
+            'total': len(selected_accounts)
+        })
+    
+    def run():
+        outcomes = []
+        try:
+            outcomes = run_for_accounts(selected_accounts, discover_account, description='Discovery',
+                                        on_done=account_done)
+        finally:
+            publish(outcomes)
+    
+    # The request's metering scope carries over to the discovery thread
+    threading.Thread(target=contextvars.copy_context().run, args=(run,), daemon=True).start()
+    
+    def generate():
+        try:
+            while True:
+                event = events.get()
+                if isinstance(event, list):
+                    outcomes = event
+                    break
+                yield json.dumps(event, default=json_default) + '\n'
+        finally:
+            # Also runs with GeneratorExit when the client disconnects mid-stream
+            cancelled.set()
+        
+        discoveries = _store_discoveries(calc_data, outcomes)
+        yield json.dumps({
+            'event': 'complete',
+            'status': 'discovery_complete',
+            'discoveries': discoveries,
+            'failed_accounts': _failed_accounts(outcomes)
+        }, default=json_default) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/discover/invalidate', methods=['POST'])
+def invalidate_discoveries():
+    """Drop shared discovery results for the given accounts, or for all accounts"""
+    session_id = session.get('session_id')
+    if not session_id or session_id not in calculators:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    cache = get_discovery_cache()
+    account_ids = (request.json or {}).get('account_ids')
+    if account_ids:
+        for account_id in account_ids:
+            cache.invalidate(account_id)
+    else:
+        cache.invalidate()
+    
+    return jsonify({'status': 'invalidated', 'account_ids': account_ids or 'all'})
+
 @app.route('/api/costs/calculate', methods=['POST'])
 def calculate_costs():
     """Calculate costs for discovered resources"""
@@ -417,15 +646,58 @@ def calculate_costs():
             
         logger.info(f"Calculating costs for {len(selected_accounts)} selected accounts")
         
-        all_costs = []
-        for account, discovery in zip(selected_accounts, calc_data.get('discoveries', [])):
-            # Get credentials
-            creds = authenticator.get_role_credentials(
-                calc_data['auth_info']['access_token'],
-                account['accountId']
-            )
+        # Discoveries are matched to accounts by id; accounts whose discovery failed are reported
+        accounts_with_discoveries, undiscovered_accounts = _accounts_with_discoveries(calc_data, selected_accounts)
+        failed_accounts = [
+            {'account': account.get('accountName', account['accountId']), 'error': 'No discovery results for this account'}
+            for account in undiscovered_accounts
+        ]
+        
+        # Management-account fast path: one grouped query for all linked accounts,
+        # no role assumption per account
+        all_costs = None
+        management_account_id = data.get('management_account_id') or os.environ.get('AWS_MANAGEMENT_ACCOUNT_ID')
+        if management_account_id and hasattr(calculator, 'calculate_org_costs'):
+            try:
+                creds = authenticator.get_role_credentials(
+                    calc_data['auth_info']['access_token'],
+                    management_account_id
+                )
+            except Exception as e:
+                logger.warning(f"Could not get management account credentials: {e}")
+                creds = None
             
             if creds:
+                import boto3
+                boto_session = boto3.Session(
+                    aws_access_key_id=creds['AccessKeyId'],
+                    aws_secret_access_key=creds['SecretAccessKey'],
+                    aws_session_token=creds['SessionToken'],
+                    region_name='us-east-1'
+                )
+                
+                logger.info(f"Calculating costs for {len(accounts_with_discoveries)} accounts via management account {management_account_id}")
+                all_costs = calculator.calculate_org_costs(
+                    boto_session,
+                    [account for account, _ in accounts_with_discoveries],
+                    [discovery for _, discovery in accounts_with_discoveries],
+                    start_date, end_date
+                )
+                
+                if all_costs is None:
+                    logger.warning("Management account cost query failed, falling back to per-account queries")
+        
+        if all_costs is None:
+            access_token = calc_data['auth_info']['access_token']
+            additional_services = calc_data.get('additional_services', [])
+            
+            def calculate_account(account_and_discovery):
+                account, discovery = account_and_discovery
+                # Get credentials
+                creds = authenticator.get_role_credentials(access_token, account['accountId'])
+                if not creds:
+                    return None
+                
                 # Create boto3 session
                 import boto3
                 boto_session = boto3.Session(
@@ -438,11 +710,21 @@ def calculate_costs():
                 # Calculate costs with additional services
                 account_name = account.get('accountName', account['accountId'])
                 logger.info(f"Calculating costs for account: {account_name} ({account['accountId']})")
-                costs = calculator.calculate_costs_for_resources(
+                return calculator.calculate_costs_for_resources(
                     boto_session, account_name, discovery, start_date, end_date,
-                    additional_services=calc_data.get('additional_services', [])
+                    additional_services=additional_services
                 )
-                all_costs.append(costs)
+            
+            outcomes = run_for_accounts(
+                accounts_with_discoveries,
+                calculate_account, description='Cost calculation'
+            )
+            all_costs = [outcome['result'] for outcome in outcomes if outcome['result'] is not None]
+            failed_accounts += [
+                {'account': outcome['account'][0].get('accountName', outcome['account'][0]['accountId']),
+                 'error': outcome['error']}
+                for outcome in outcomes if outcome['error']
+            ]
         
         # Convert all Decimal values in costs to float
         all_costs = convert_decimals(all_costs)
@@ -505,9 +787,13 @@ def calculate_costs():
             'daily_average': daily_avg,
             'projection_57_schools': projection_57_schools,
             'period': f"{start_date} to {end_date}",
-            'project_breakdown': project_breakdown
+            'project_breakdown': project_breakdown,
+            'failed_accounts': failed_accounts
         }
         
+        # Report what this calculation cost in Cost Explorer requests
+        result['ce_usage'] = get_meter().get_stats(g.ce_scope)
+        
         # Store results
         calc_data['results'] = result
         
@@ -519,6 +805,43 @@ def calculate_costs():
         logger.error(f"Cost calculation error: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/costs/history', methods=['GET'])
+def get_cost_history():
+    """Answer any date range from the local cost warehouse without calling AWS"""
+    session_id = session.get('session_id')
+    if not session_id or session_id not in calculators:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    calc_data = calculators[session_id]
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    if not start_date or not end_date:
+        return jsonify({'error': 'start_date and end_date are required'}), 400
+    
+    group_by = [g for g in request.args.get('group_by', 'account_id,service').split(',') if g]
+    account_ids = request.args.get('account_ids')
+    account_ids = account_ids.split(',') if account_ids else calc_data.get('selected_accounts') or None
+    
+    try:
+        from cost_warehouse import get_default_warehouse
+        from datetime import timedelta
+        
+        warehouse = get_default_warehouse()
+        # Dates are inclusive in the UI; the warehouse uses Cost Explorer's exclusive end
+        ce_end_date = (datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+        rows = warehouse.query_costs(start_date, ce_end_date, group_by=group_by, account_ids=account_ids)
+        
+        return jsonify(convert_decimals({
+            'period': f"{start_date} to {end_date}",
+            'group_by': group_by,
+            'rows': rows,
+            'total': sum(row['amount'] for row in rows),
+            'coverage': warehouse.get_coverage()
+        }))
+    except Exception as e:
+        logger.error(f"Cost history error: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/costs/detailed-report', methods=['GET'])
 def get_detailed_report():
     """Get detailed AI services cost report"""
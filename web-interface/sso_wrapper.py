@@ -17,6 +17,8 @@ from botocore.exceptions import ClientError
 # Add the SSO calculator to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'aws-ai-cost-calculator-sso'))
 
+from rate_limiter import install_rate_limiter
+
 class WebSSOAuthenticator:
     """Simplified SSO authenticator for web use"""
     
@@ -41,7 +43,7 @@ class WebSSOAuthenticator:
         
         # Initialize SSO clients
         self.sso_oidc_client = boto3.client('sso-oidc', region_name=sso_region)
-        self.sso_client = boto3.client('sso', region_name=sso_region)
+        self.sso_client = install_rate_limiter(boto3.client('sso', region_name=sso_region))
         
         # Register client
         client_creds = self.sso_oidc_client.register_client(